@@ -0,0 +1,271 @@
+"""
+Fast actionable-vs-note classifier for parser_1.check_actionable.
+
+check_actionable's rules need a spaCy parse of every step. This module
+hashes a step's word unigrams, bigrams and character 4-grams into a fixed
+feature vector and scores it with a logistic regression model, which takes
+microseconds. The model is trained on the library's own steps, labeled by
+the parse rules, and saved to src/library/models/actionable.npz (or to the
+models/ directory of the library given with --library).
+
+classify() returns True/False only when the model is confident (probability
+outside RECIPE_ACTIONABLE_CONFIDENCE, default 0.9, either way); otherwise,
+or when no model has been trained, it returns None and check_actionable uses
+the parse rules. Set RECIPE_ACTIONABLE=parse to always use the rules.
+
+Usage:
+    python3 src/actionable_classifier.py train                    # label the library's steps, train, save
+    python3 src/actionable_classifier.py evaluate                 # agreement and speedup on held-out steps
+    python3 src/actionable_classifier.py "Be careful not to overmix."
+"""
+import os
+import re
+import sys
+import math
+import time
+import zlib
+import hashlib
+import argparse
+import itertools
+import numpy as np
+import recipe_store
+
+MODEL_DIR = os.path.join(recipe_store.LIBRARY_DIR, "models")
+MODEL_FILE = os.path.join(MODEL_DIR, "actionable.npz")
+DIM = 1 << 18
+CONFIDENCE = float(os.environ.get("RECIPE_ACTIONABLE_CONFIDENCE", "0.9"))
+EPOCHS = 8
+LEARNING_RATE = 0.5
+L2 = 1e-6
+
+_WORD = re.compile(r"[a-z0-9]+(?:['’][a-z]+)?")
+_MIX = np.uint32(2654435761)
+_SHIFT = np.uint32(8)
+_MASK = np.uint32(DIM - 1)
+
+
+def features(text: str) -> np.ndarray:
+    """Hashed feature indices of a step (a repeated n-gram appears more than once)."""
+    lower = " ".join(text.lower().split())
+    if not lower:
+        return np.empty(0, dtype=np.uint32)
+    words = _WORD.findall(lower)
+    grams = ["w:" + w for w in words]
+    grams += ["b:" + a + " " + b for a, b in zip(words, words[1:])]
+    if words:
+        grams.append("first:" + words[0])
+    word_hashes = np.array([zlib.crc32(g.encode("utf-8")) for g in grams], dtype=np.uint32)
+    # character 4-grams (catch "careful" inside "carefully"): every 4 bytes read as one uint32, then mixed
+    data = f" {lower} ".encode("utf-8")
+    char_grams = np.concatenate([np.frombuffer(data, dtype="<u4", count=(len(data) - k) // 4, offset=k)
+                                 for k in range(4)])
+    return np.concatenate([word_hashes, (char_grams * _MIX) >> _SHIFT]) & _MASK
+
+
+def _sigmoid(score):
+    return 1.0 / (1.0 + math.exp(-max(min(score, 30.0), -30.0)))
+
+
+class ActionableClassifier:
+    def __init__(self, weights=None, bias=0.0):
+        self.weights = np.zeros(DIM, dtype=np.float32) if weights is None else weights
+        self.bias = float(bias)
+
+    def probability(self, text: str) -> float:
+        """P(actionable) for a step."""
+        return _sigmoid(self.bias + float(self.weights[features(text)].sum()))
+
+    def predict(self, text: str, confidence=CONFIDENCE):
+        """True/False when the model is confident, None when the parse rules should decide."""
+        p = self.probability(text)
+        if p >= confidence:
+            return True
+        if p <= 1.0 - confidence:
+            return False
+        return None
+
+    def fit(self, texts, labels, epochs=EPOCHS, seed=0):
+        """Logistic regression by AdaGrad SGD; classes are weighted so the rare notes still count."""
+        X = [features(t) for t in texts]
+        y = np.asarray(labels, dtype=np.float32)
+        positives = max(float(y.sum()), 1.0)
+        negatives = max(float(len(y) - y.sum()), 1.0)
+        class_weight = {1.0: len(y) / (2 * positives), 0.0: len(y) / (2 * negatives)}
+        squared = np.full(DIM, 1e-8, dtype=np.float32)
+        bias_squared = 1e-8
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            for i in rng.permutation(len(X)):
+                idx = X[i]
+                p = _sigmoid(self.bias + float(self.weights[idx].sum()))
+                g = (p - y[i]) * class_weight[float(y[i])]
+                grad = g + L2 * self.weights[idx]
+                squared[idx] += grad * grad
+                self.weights[idx] -= LEARNING_RATE * grad / np.sqrt(squared[idx])
+                bias_squared += g * g
+                self.bias -= LEARNING_RATE * g / np.sqrt(bias_squared)
+        return self
+
+    def save(self, path=None):
+        path = path or MODEL_FILE
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        nonzero = np.flatnonzero(self.weights).astype(np.uint32)
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, index=nonzero, weights=self.weights[nonzero], bias=np.float32(self.bias))
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=None):
+        saved = np.load(path or MODEL_FILE)
+        weights = np.zeros(DIM, dtype=np.float32)
+        weights[saved["index"]] = saved["weights"]
+        return cls(weights, float(saved["bias"]))
+
+
+_model = ("none", None)  # (model_version() it was loaded at, classifier)
+_hashes = {}             # (mtime, size) of MODEL_FILE -> its hash
+
+
+def get_classifier():
+    """
+    The trained model from MODEL_FILE, or None if none has been trained;
+    reloaded when the file changes (e.g. retrained while reprocess.py runs).
+    """
+    global _model
+    version = model_version()
+    if _model[0] != version:
+        _model = (version, ActionableClassifier.load(MODEL_FILE) if version != "none" else None)
+    return _model[1]
+
+
+def classify(step: str):
+    """Actionable (True), note (False), or None when there is no confident answer."""
+    model = get_classifier()
+    return model.predict(step) if model is not None else None
+
+
+def model_version() -> str:
+    """Hash of the saved model, for recipe_parser.parser_version ("none" when untrained)."""
+    try:
+        stat = os.stat(MODEL_FILE)
+    except FileNotFoundError:
+        return "none"
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    version = _hashes.get(stamp)
+    if version is None:
+        with open(MODEL_FILE, "rb") as f:
+            version = _hashes[stamp] = hashlib.sha256(f.read()).hexdigest()[:16]
+    return version
+
+
+# ------------------------------------------------------------
+# Training and evaluation
+# ------------------------------------------------------------
+def model_file(library_dir=recipe_store.LIBRARY_DIR) -> str:
+    """Where the model trained on a library is saved."""
+    return os.path.join(library_dir, os.path.basename(MODEL_DIR), os.path.basename(MODEL_FILE))
+
+
+def library_steps(library_dir=recipe_store.LIBRARY_DIR) -> list:
+    """Every distinct step text in src/recipe.json (if there is one) and the library's recipe records."""
+    store = recipe_store.open_store(library_dir)
+    try:
+        legacy = [store.get_record(recipe_store.LEGACY_ID)]
+    except KeyError:
+        legacy = []
+    recipes = itertools.chain(legacy, (recipe for _, recipe in store.records()))
+    steps = {}
+    for recipe in recipes:
+        for step in recipe.get("steps", []):
+            for sub in step.get("substeps", []):
+                steps.setdefault(sub["text"].strip(), None)
+    return list(steps)
+
+
+def rule_labels(steps) -> list:
+    """The parse rules' decision for each step (the training target)."""
+    import nlp_pool
+    import parser_1
+    return [parser_1.check_actionable_rules(step, nlp_pool.parse(step.strip())) for step in steps]
+
+
+def _held_out(text) -> bool:
+    return zlib.crc32(text.encode("utf-8")) % 5 == 0
+
+
+def train(library_dir=recipe_store.LIBRARY_DIR):
+    steps = library_steps(library_dir)
+    labels = rule_labels(steps)
+    start = time.perf_counter()
+    model = ActionableClassifier().fit(steps, labels)
+    path = model_file(library_dir)
+    model.save(path)
+    print(f"trained on {len(steps)} steps ({labels.count(False)} notes) in {time.perf_counter() - start:.1f}s; "
+          f"saved {path}")
+
+
+def evaluate(library_dir=recipe_store.LIBRARY_DIR):
+    import nlp_pool
+    import parser_1
+    steps = library_steps(library_dir)
+    labels = rule_labels(steps)
+    train_set = [(s, l) for s, l in zip(steps, labels) if not _held_out(s)]
+    test_set = [(s, l) for s, l in zip(steps, labels) if _held_out(s)]
+    if not train_set or not test_set:
+        sys.exit(f"need more steps to evaluate ({len(steps)} in the library)")
+    model = ActionableClassifier().fit([s for s, _ in train_set], [l for _, l in train_set])
+
+    confident = agree = 0
+    start = time.perf_counter()
+    for step, label in test_set:
+        decision = model.predict(step)
+        if decision is None:
+            decision = parser_1.check_actionable_rules(step, nlp_pool.parse(step.strip()))
+        else:
+            confident += 1
+        agree += decision == label
+    switched = time.perf_counter() - start
+    start = time.perf_counter()
+    for step, _ in test_set:
+        parser_1.check_actionable_rules(step, nlp_pool.parse(step.strip()))
+    rules = time.perf_counter() - start
+    start = time.perf_counter()
+    for step, _ in test_set:
+        model.probability(step)
+    scoring = time.perf_counter() - start
+
+    n = len(test_set)
+    print(f"trained on {len(train_set)} steps, tested on {n} held-out steps "
+          f"({sum(not l for _, l in test_set)} notes)")
+    print(f"confident: {confident / n:.1%} (rest use the parse rules); agreement with the rules: {agree / n:.2%}")
+    print(f"parse rules: {rules / n * 1e6:9.1f} us per step")
+    print(f"classifier:  {scoring / n * 1e6:9.1f} us per step")
+    print(f"switched:    {switched / n * 1e6:9.1f} us per step (classifier, rules when unsure) "
+          f"-> {rules / switched:.1f}x faster")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Train and check the actionable-step classifier")
+    arg_parser.add_argument("command", help="train, evaluate, or a step to classify")
+    arg_parser.add_argument("--library", default=recipe_store.LIBRARY_DIR)
+    args = arg_parser.parse_args()
+
+    if args.command == "train":
+        train(args.library)
+    elif args.command == "evaluate":
+        evaluate(args.library)
+    else:
+        path = model_file(args.library)
+        if os.path.abspath(path) == MODEL_FILE:
+            model = get_classifier()
+        else:
+            model = ActionableClassifier.load(path) if os.path.exists(path) else None
+        if model is None:
+            sys.exit(f"no model at {path}; run 'train' first")
+        decision = model.predict(args.command)
+        verdict = {True: "actionable", False: "note", None: "unsure (parse rules decide)"}[decision]
+        print(f"{verdict}  p(actionable)={model.probability(args.command):.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Answer cache for the query handlers.
+
+Users ask the same things over and over ("how much of that", "what is the
+temperature for oven", "what is skillet"). Most handlers' answers depend
+only on the query and where the session is in which recipe, so
+main.route_query keeps them in LRU caches. `routes` remembers which handler
+answered a query, so a cached answer is found without trying the handlers;
+on a miss they are tried in order again, since in another context an
+earlier handler may claim the query. Each handler declares the scope its
+answer depends on:
+
+    "global"   query only (dictionary / tool definitions)   shared by all sessions
+    "recipe"   query + recipe                               shared
+    "step"     query + recipe + step                        shared
+    "session"  query + recipe + step + the session's recent ingredient
+               mentions (vague "it/that" questions)          per session
+    None       not cached (navigation, step search, timers move or change state)
+
+Recipe keys include the store entry's generation, so a re-parsed recipe
+never serves answers computed from its old steps; RecipeStore.put,
+invalidate and a reload after another process re-parsed the recipe also
+drop its shared entries right away. Set RECIPE_ANSWER_CACHE
+to the per-cache size (0 disables caching).
+
+Usage:
+    python3 src/answer_cache.py     # replay the fixture conversations and print hit rates
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = int(os.environ.get("RECIPE_ANSWER_CACHE", "4096"))
+SESSION_CACHE_SIZE = min(CACHE_SIZE, 128)
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACES.sub(" ", query.strip().lower())
+
+
+class AnswerCache:
+    """Thread-safe LRU map with hit/miss counters."""
+
+    def __init__(self, name, size=CACHE_SIZE):
+        self.name = name
+        self.size = size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def drop_recipe(self, recipe_id):
+        """Remove every entry whose key names this recipe (recipe keys are (query, speech, recipe_id, ...))."""
+        with self._lock:
+            for key in [k for k in self._entries if len(k) > 2 and k[2] == recipe_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def __len__(self):
+        return len(self._entries)
+
+
+routes = AnswerCache("routes")            # normalized query -> intent
+definitions = AnswerCache("definitions")  # "global" answers
+answers = AnswerCache("answers")          # "recipe" and "step" answers
+sessions = AnswerCache("sessions", size=0)  # holds nothing; totals of all per-session caches
+
+
+def lookup(scope, query, session, speech):
+    """Return (cache, key) holding the answer for this query in this scope, or (None, None)."""
+    if scope is None or CACHE_SIZE <= 0:
+        return None, None
+    if scope == "global":
+        return definitions, (query, speech)
+    entry = session.entry
+    if scope == "recipe":
+        return answers, (query, speech, entry.recipe_id, entry.generation)
+    key = (query, speech, entry.recipe_id, entry.generation, session.idx)
+    if scope == "step":
+        return answers, key
+    return session.answers, key + (tuple(session.context.recent),)
+
+
+def get(cache, key):
+    """cache.get(key), also counted in the per-session totals for session caches."""
+    value = cache.get(key)
+    if cache.name == "session":
+        with sessions._lock:
+            if value is None:
+                sessions.misses += 1
+            else:
+                sessions.hits += 1
+    return value
+
+
+def invalidate_recipe(recipe_id):
+    """Forget shared answers for a recipe that was re-parsed or re-scraped."""
+    answers.drop_recipe(recipe_id)
+
+
+def clear():
+    for cache in (routes, definitions, answers, sessions):
+        cache.clear()
+
+
+def stats() -> dict:
+    """Hit/miss counts and hit rate of each shared cache, plus all per-session caches together."""
+    return {cache.name: cache.stats() for cache in (routes, definitions, answers, sessions)}
+
+
+def format_stats() -> str:
+    lines = [f"{'cache':12s} {'entries':>8s} {'hits':>8s} {'misses':>8s} {'hit rate':>9s}"]
+    for name, s in stats().items():
+        lines.append(f"{name:12s} {s['entries'] if name != 'sessions' else '-':>8} {s['hits']:8d} "
+                     f"{s['misses']:8d} {s['hit_rate']:9.1%}")
+    return "\n".join(lines)
+
+
+def main():
+    import json
+    import time
+    import recipe_store
+    import timers
+    import answer_cache  # the module route_query fills, not this __main__ copy
+    import event_log
+    from session import Session
+    from main import route_query
+
+    event_log.configure(None)
+    store = recipe_store.get_store()
+    with open(os.path.join(recipe_store.SRC_DIR, "fixtures", "conversations.json"), "r", encoding="utf-8") as f:
+        conversations = [c for c in json.load(f) if c["recipe_id"] in store]
+
+    for label in ("first pass", "second pass"):
+        start = time.perf_counter()
+        count = 0
+        for conv in conversations:
+            for session_no in range(20):  # many cooks asking the same scripted questions
+                session = Session(conv["recipe_id"], store)
+                session.notify = lambda message: None
+                for query in conv["queries"]:
+                    route_query(query, session, False)
+                    count += 1
+                timers.get_timer_manager().cancel_all(session.session_id)
+        print(f"{label}: {count} queries, {(time.perf_counter() - start) / count * 1e3:.3f} ms per query")
+    print(answer_cache.format_stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+"""
+Resolves vague references ("it", "that", "this", "them") for a session.
+
+Each step's candidate referents (primary ingredient, action phrase, verb,
+tool, time and temperature phrases) are computed once per recipe and
+cached on the recipe store entry. A per-session ContextTracker remembers
+which recipe ingredients the user named in recent turns, so resolving a
+reference is a dict/deque lookup instead of rewriting the query.
+"""
+import re
+from collections import deque
+from parser_1 import normalize_ingredient
+
+VAGUE_TERMS = ["it", "that", "this", "them"]
+VAGUE_PATTERN = re.compile(r"\b(it|that|this|them)\b", re.I)
+RECENT_TURNS = 5
+
+# Words too generic to identify an ingredient on their own
+_GENERIC_WORDS = {"and", "or", "to", "of", "the", "a", "taste", "ground", "fresh", "shredded",
+                  "chopped", "dried", "whole", "large", "small", "package", "can", "cup", "cups"}
+_WORD = re.compile(r"[a-z]+")
+
+
+# ------------------------------------------------------------
+# Per-step referents
+# ------------------------------------------------------------
+def get_replacement_phrase(step):
+    """Return the most relevant description for vague-noun replacement."""
+
+    # Prefer an ingredient-targeting phrase
+    if step.get("actions"):
+        action = step["actions"][0]
+        verb = action.get("verb")
+        ingredients = action.get("ingredients", [])
+
+        if verb and ingredients:
+            ing_phrase = ", ".join(ingredients)
+            return f"{verb} the {ing_phrase}"
+        if verb:
+            return verb
+
+    # Fallback to step description
+    return step.get("description", "the current step")
+
+
+def get_primary_ingredient(step):
+    if not step or not hasattr(step, "get"):
+        return None
+    if step.get("actions"):
+        ingredients = step["actions"][0].get("ingredients", [])
+        return ingredients[0] if ingredients else None
+    return None
+
+
+def get_step_time_phrase(step):
+    t = step.get("time", {})
+    if not t:
+        return None
+
+    if "duration" in t:
+        return t["duration"]
+
+    if "min" in t and "max" in t:
+        return f"{t['min']} to {t['max']} minutes"
+
+    if "min" in t:
+        return f"{t['min']} minutes"
+
+    return None
+
+
+def get_step_temp_phrase(step):
+    temp = step.get("temperature", {})
+    if not temp:
+        return None
+
+    if "fahrenheit" in temp:
+        return f"{temp['fahrenheit']}°F"
+    if "celsius" in temp:
+        return f"{temp['celsius']}°C"
+
+    return None
+
+
+def build_step_context(step) -> dict:
+    actions = step.get("actions", [])
+    ingredients = []
+    for action in actions:
+        for name in action.get("ingredients", []):
+            if name not in ingredients:
+                ingredients.append(name)
+    tool = next((a["tool"] for a in actions if a.get("tool")), None)
+    return {
+        "primary_ingredient": get_primary_ingredient(step),
+        "ingredients": ingredients,
+        "verb": actions[0].get("verb") if actions else None,
+        "tool": tool,
+        "phrase": get_replacement_phrase(step),
+        "time": get_step_time_phrase(step),
+        "temperature": get_step_temp_phrase(step),
+    }
+
+
+def build_ingredient_lookup(recipe) -> dict:
+    """
+    Map query words to recipe ingredient names (normalized the way the
+    parser names them). Words shared by several ingredients, like "cheese",
+    are left out so they never resolve to the wrong one.
+    """
+    owners = {}
+    for item in recipe.get("ingredients", []):
+        name = normalize_ingredient(item["name"])
+        for word in set(_WORD.findall(name)) - _GENERIC_WORDS:
+            for form in {word, word.rstrip("s")}:
+                owners.setdefault(form, set()).add(name)
+    return {word: names.pop() for word, names in owners.items() if len(names) == 1}
+
+
+def get_recipe_context(entry) -> dict:
+    """Per-recipe referents, computed once and cached on the store entry."""
+    context = entry.derived.get("context")
+    if context is None:
+        context = {
+            "steps": [build_step_context(step) for step in entry.steps],
+            "ingredients": build_ingredient_lookup(entry.recipe),
+        }
+        entry.derived["context"] = context
+    return context
+
+
+# ------------------------------------------------------------
+# Per-session tracker
+# ------------------------------------------------------------
+class ContextTracker:
+    def __init__(self, session):
+        self.session = session
+        self.recent = deque(maxlen=RECENT_TURNS)  # (step idx, ingredient name)
+
+    @property
+    def recipe_context(self):
+        return get_recipe_context(self.session.entry)
+
+    def step_context(self) -> dict:
+        return self.recipe_context["steps"][self.session.idx - 1]
+
+    def observe(self, query: str):
+        """Remember the recipe ingredients named in a user turn."""
+        lookup = self.recipe_context["ingredients"]
+        for word in _WORD.findall(query.lower()):
+            name = lookup.get(word)
+            if name:
+                self.recent.append((self.session.idx, name))
+
+    def resolve_ingredient(self):
+        """
+        The ingredient "it/that/them" most likely refers to: one the user
+        named at this step, else this step's primary ingredient, else the
+        last one the user named.
+        """
+        idx = self.session.idx
+        for step_idx, name in reversed(self.recent):
+            if step_idx == idx:
+                return name
+        primary = self.step_context()["primary_ingredient"]
+        if primary:
+            return primary
+        return self.recent[-1][1] if self.recent else None
+
+    def resolve(self, kind):
+        """Return the current step's referent of the given kind (verb, tool, phrase, time, temperature)."""
+        if kind == "ingredient":
+            return self.resolve_ingredient()
+        return self.step_context()[kind]
@@ -0,0 +1,281 @@
+"""
+Structured query event log.
+
+main.route_query emits one event per query: time, session, recipe, the
+step before and after, the intent (handler) that answered, whether the
+answer came from answer_cache, latency and the query and output text.
+emit() only appends the event to a bounded in-memory queue. A background
+thread batches events and appends them to the log, so the query path never
+waits on disk. If the writer falls behind and the queue fills up, events
+are dropped and counted rather than blocking a cook.
+
+Logging is off unless RECIPE_EVENT_LOG is set, since the log keeps users'
+raw queries. "1" logs to src/logs/events.jsonl; any other value is the log
+path (relative paths are taken from src/). The log is JSON lines (*.jsonl)
+or SQLite (*.db / *.sqlite), chosen by the extension.
+
+Usage:
+    python3 src/event_log.py sessions                     # sessions in the log
+    python3 src/event_log.py timeline SESSION_ID          # one session's queries in order
+    python3 src/event_log.py stats                        # latency percentiles per intent, slowest queries
+    python3 src/event_log.py bench                        # cost of emit() on the query path
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import sqlite3
+import argparse
+import threading
+from collections import deque
+import numpy as np
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PATH = os.path.join(SRC_DIR, "logs", "events.jsonl")
+
+
+def _log_path(value):
+    """RECIPE_EVENT_LOG value -> log path, or "" when logging is off."""
+    if value in ("", "0"):
+        return ""
+    return DEFAULT_PATH if value == "1" else os.path.join(SRC_DIR, value)
+
+
+LOG_PATH = _log_path(os.environ.get("RECIPE_EVENT_LOG", ""))
+BATCH_SIZE = 1024     # wake the writer early once this many events are waiting
+FLUSH_INTERVAL = 0.5  # seconds an event may wait before it is written
+MAX_PENDING = 50000
+FIELDS = ["ts", "session", "recipe", "step", "step_after", "intent", "cached", "latency_ms", "query", "output"]
+
+class EventLog:
+    def __init__(self, path):
+        self.path = path
+        self.sqlite = path.endswith((".db", ".sqlite"))
+        self.written = 0
+        self.dropped = 0
+        self._pending = deque()  # append/popleft are atomic, so emit() takes no lock
+        self._wake = threading.Event()
+        self._closing = False
+        self._thread = threading.Thread(target=self._writer, name="event-log", daemon=True)
+        self._thread.start()
+
+    def emit(self, event: dict):
+        if len(self._pending) >= MAX_PENDING:
+            self.dropped += 1
+            return
+        self._pending.append(event)
+        if len(self._pending) >= BATCH_SIZE:
+            self._wake.set()
+
+    def close(self, timeout=5.0):
+        """Write everything still queued and stop the writer."""
+        if self._thread.is_alive():
+            self._closing = True
+            self._wake.set()
+            self._thread.join(timeout)
+
+    # ---------------- writer thread ----------------
+    def _writer(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.sqlite:
+            db = sqlite3.connect(self.path)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"CREATE TABLE IF NOT EXISTS events ({', '.join(FIELDS)})")
+            db.execute("CREATE INDEX IF NOT EXISTS events_session ON events (session, ts)")
+            write = lambda batch: self._write_sqlite(db, batch)
+        else:
+            out = open(self.path, "a", encoding="utf-8")
+            write = lambda batch: self._write_jsonl(out, batch)
+
+        while True:
+            self._wake.wait(FLUSH_INTERVAL)
+            self._wake.clear()
+            closing = self._closing
+            batch = []
+            while self._pending:
+                batch.append(self._pending.popleft())
+            if batch:
+                try:
+                    write(batch)
+                    self.written += len(batch)
+                except (OSError, sqlite3.Error) as e:
+                    self.dropped += len(batch)
+                    print(f"event log: could not write {len(batch)} events: {e}", file=sys.stderr)
+            if closing:
+                break
+        (db if self.sqlite else out).close()
+
+    @staticmethod
+    def _write_jsonl(out, batch):
+        out.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch))
+        out.flush()
+
+    @staticmethod
+    def _write_sqlite(db, batch):
+        with db:
+            db.executemany(f"INSERT INTO events VALUES ({', '.join('?' * len(FIELDS))})",
+                           [[e.get(f) for f in FIELDS] for e in batch])
+
+
+_log = None
+_log_lock = threading.Lock()
+
+
+def configure(path):
+    """Log to this path from now on (None or "" turns logging off)."""
+    global _log, LOG_PATH
+    with _log_lock:
+        if _log is not None:
+            _log.close()
+            _log = None
+        LOG_PATH = path or ""
+
+
+def get_log():
+    """The process-wide event log, started on first use; None when logging is off."""
+    global _log
+    if _log is None and LOG_PATH not in ("", "0"):
+        with _log_lock:
+            if _log is None:
+                _log = EventLog(LOG_PATH)
+                atexit.register(_log.close)
+    return _log
+
+
+def record_query(session, query, intent, output, latency, step, cached=False):
+    """Emit the event for one answered query."""
+    log = get_log()
+    if log is None:
+        return
+    log.emit({
+        "ts": round(time.time(), 3),
+        "session": session.session_id,
+        "recipe": session.recipe_id,
+        "step": step,
+        "step_after": session.idx,
+        "intent": intent,
+        "cached": cached,
+        "latency_ms": round(latency * 1000, 3),
+        "query": query,
+        "output": output,
+    })
+
+
+# ------------------------------------------------------------
+# Offline tools
+# ------------------------------------------------------------
+def read_events(path, session=None):
+    """Events from a log file, in the order they were written."""
+    if not os.path.exists(path):
+        return
+    if path.endswith((".db", ".sqlite")):
+        db = sqlite3.connect(path)
+        db.row_factory = sqlite3.Row
+        sql, args = "SELECT * FROM events", ()
+        if session:
+            sql, args = sql + " WHERE session = ?", (session,)
+        for row in db.execute(sql + " ORDER BY rowid", args):
+            yield dict(row)
+        db.close()
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                event = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by a crash
+            if session is None or event["session"] == session:
+                yield event
+
+
+def print_sessions(path):
+    sessions = {}
+    for e in read_events(path):
+        s = sessions.setdefault(e["session"], {"recipe": e["recipe"], "first": e["ts"], "last": e["ts"], "queries": 0})
+        s["last"] = e["ts"]
+        s["queries"] += 1
+    print(f"{'session':14s} {'recipe':22s} {'queries':>8s} {'started':20s} {'minutes':>8s}")
+    for sid, s in sorted(sessions.items(), key=lambda kv: kv[1]["first"]):
+        started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(s["first"]))
+        print(f"{sid:14s} {s['recipe']:22s} {s['queries']:8d} {started:20s} {(s['last'] - s['first']) / 60:8.1f}")
+
+
+def print_timeline(path, session, width=70):
+    events = list(read_events(path, session))
+    if not events:
+        sys.exit(f"no events for session {session}")
+    start = events[0]["ts"]
+    print(f"session {session}, recipe {events[0]['recipe']}, {len(events)} queries")
+    for e in events:
+        step = f"{e['step']}" if e["step"] == e["step_after"] else f"{e['step']}->{e['step_after']}"
+        output = " | ".join(str(e["output"]).splitlines())
+        flag = "c" if e["cached"] else " "
+        print(f"+{e['ts'] - start:7.1f}s  step {step:6s} {e['intent']:12s} {e['latency_ms']:8.2f} ms {flag}  "
+              f"{e['query']!r}\n{'':12s}-> {output[:width]}")
+
+
+def print_stats(path, slowest=10):
+    latencies = {}
+    cached = {}
+    events = []
+    for e in read_events(path):
+        latencies.setdefault(e["intent"], []).append(e["latency_ms"])
+        cached[e["intent"]] = cached.get(e["intent"], 0) + bool(e["cached"])
+        events.append((e["latency_ms"], e["session"], e["step"], e["intent"], e["query"]))
+    if not events:
+        sys.exit(f"no events in {path}")
+    print(f"{'intent':14s} {'count':>8s} {'cached':>7s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    everything = [ms for lat in latencies.values() for ms in lat]
+    rows = sorted(latencies.items(), key=lambda kv: -len(kv[1])) + [("all", everything)]
+    for intent, lat in rows:
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+        hit = sum(cached.values()) if intent == "all" else cached[intent]
+        print(f"{intent:14s} {len(lat):8d} {hit / len(lat):7.0%} {p50:9.2f} {p95:9.2f} {p99:9.2f} {max(lat):9.2f}")
+    print(f"\nslowest {slowest}:")
+    for ms, session, step, intent, query in sorted(events, reverse=True)[:slowest]:
+        print(f"  {ms:9.2f} ms  {session} step {step} {intent:12s} {query!r}")
+
+
+def bench(n=100000):
+    import tempfile
+    from types import SimpleNamespace
+    session = SimpleNamespace(session_id="bench", recipe_id="current", idx=3)
+    for suffix in (".jsonl", ".db"):
+        with tempfile.TemporaryDirectory() as tmp:
+            configure(os.path.join(tmp, "events" + suffix))
+            start = time.perf_counter()
+            for i in range(n):
+                record_query(session, "how much of that", "vague", "You need 2 cups of flour.", 0.0004, 3)
+            emitted = time.perf_counter() - start
+            log = _log
+            configure(None)  # flushes
+            print(f"{suffix:7s} emit: {emitted / n * 1e6:.2f} us per event on the query path; "
+                  f"all {log.written} written {time.perf_counter() - start:.2f}s after the first, {log.dropped} dropped")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Inspect the query event log")
+    arg_parser.add_argument("command", choices=["sessions", "timeline", "stats", "bench"])
+    arg_parser.add_argument("session", nargs="?", help="session id for timeline")
+    arg_parser.add_argument("--log", default=LOG_PATH or DEFAULT_PATH)
+    args = arg_parser.parse_args()
+
+    if args.command == "bench":
+        bench()
+    elif args.command == "sessions":
+        print_sessions(args.log)
+    elif args.command == "timeline":
+        if not args.session:
+            arg_parser.error("timeline needs a session id")
+        print_timeline(args.log, args.session)
+    else:
+        print_stats(args.log)
+
+
+if __name__ == "__main__":
+    main()
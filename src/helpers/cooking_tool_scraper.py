@@ -1,15 +1,12 @@
 import requests
 from bs4 import BeautifulSoup
 
-def scrape_cooking_tools():
-    """
-    Scrape all utensil names and their full description from the Land O’Lakes equipment guide,
-    and save as 'item : definition' pairs, one per line, in a plain text file.
-    """
-    url = "https://www.landolakes.com/kitchen-reference/equipment-guide/"
-    resp = requests.get(url)
-    resp.raise_for_status()
-    soup = BeautifulSoup(resp.text, "html.parser")
+TOOLS_URL = "https://www.landolakes.com/kitchen-reference/equipment-guide/"
+
+
+def parse_cooking_tools(html: str) -> list:
+    """Return "item : definition" lines from the equipment guide page html."""
+    soup = BeautifulSoup(html, "html.parser")
 
     tools = []
     for section in soup.select("div.sectionRepeat"):
@@ -33,12 +30,23 @@ def scrape_cooking_tools():
         if name and desc:
             desc = " ".join(desc.split())
             tools.append(f"{name} : {desc}")
+    return tools
+
+
+def scrape_cooking_tools(url=TOOLS_URL, output_path="cooking_tools_withdesc.txt", session=None):
+    """
+    Scrape all utensil names and their full description from the Land O’Lakes equipment guide,
+    and save as 'item : definition' pairs, one per line, in a plain text file.
+    """
+    resp = (session or requests).get(url, timeout=20)
+    resp.raise_for_status()
+    tools = parse_cooking_tools(resp.text)
 
-    with open("cooking_tools_withdesc.txt", "w", encoding="utf-8") as f:
+    with open(output_path, "w", encoding="utf-8") as f:
         for line in tools:
             f.write(line + "\n")
 
-    print(f"✅ Wrote {len(tools)} tools with descriptions to cooking_tools_withdesc.txt")
+    print(f"✅ Wrote {len(tools)} tools with descriptions to {output_path}")
 
 if __name__ == "__main__":
     scrape_cooking_tools()
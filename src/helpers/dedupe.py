@@ -1,19 +1,24 @@
+def dedupe_lines(lines):
+    """Yield (name, definition) from "name : definition" lines, first definition per name."""
+    seen = set()
+    for line in lines:
+        line = line.rstrip()
+        if not line or ':' not in line:
+            continue
+        name, definition = line.split(':', 1)
+        name = name.strip()
+        definition = definition.strip()
+        # Only keep the first encountered definition per unique item name
+        if name and name not in seen:
+            seen.add(name)
+            yield name, definition
+
 def dedupe_items(input_path, output_path):
-    seen = {}
     with open(input_path, 'r', encoding='utf-8') as infile:
-        for line in infile:
-            line = line.rstrip()
-            if not line or ':' not in line:
-                continue
-            name, definition = line.split(':', 1)
-            name = name.strip()
-            definition = definition.strip()
-            # Only keep the first encountered definition per unique item name
-            if name and name not in seen:
-                seen[name] = definition
+        items = list(dedupe_lines(infile))
 
     with open(output_path, 'w', encoding='utf-8') as outfile:
-        for name, definition in seen.items():
+        for name, definition in items:
             outfile.write(f"{name} : {definition}\n")
 
 if __name__ == "__main__":
@@ -2,18 +2,23 @@ import re
 
 pattern = re.compile(r"^(.*?)(?=\s*[:])")
 
-results = []
 
-with open("common_cooking_tools.txt", "r", encoding="utf-8") as f:
-    for line in f:
+def extract_tool_names(lines):
+    """Yield the item name (left of the colon) of each "item : definition" line."""
+    for line in lines:
         line = line.strip()
         match = pattern.match(line)
         if match:
             left_side = match.group(1).strip()
             if left_side:
-                results.append(left_side)
+                yield left_side
 
-# Write results to tools.txt
-with open("tools.txt", "w", encoding="utf-8") as out:
-    for item in results:
-        out.write(item + "\n")
+
+if __name__ == "__main__":
+    with open("common_cooking_tools.txt", "r", encoding="utf-8") as f:
+        results = list(extract_tool_names(f))
+
+    # Write results to tools.txt
+    with open("tools.txt", "w", encoding="utf-8") as out:
+        for item in results:
+            out.write(item + "\n")
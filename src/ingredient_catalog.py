@@ -0,0 +1,332 @@
+"""
+Ingredient catalog: one integer id per canonical ingredient, shared by
+every recipe in the library.
+
+A raw ingredient name ("1 (16 ounce) package lasagna noodles", "garlic,
+chopped", "shredded Parmesan cheese") is reduced to a canonical key
+(lowercase, no quantities, packages, preparation words, trailing ", chopped"
+notes or plurals). A new key that is a near-spelling of a known one
+("mozarella cheese") resolves to the known id; a key that differs by a
+word ("salted butter" / "unsalted butter") never does. Anything else gets
+a fresh id. Raw names, keys and ids are remembered, so each distinct string
+is normalized and fuzzy-scored once.
+
+Ids are handed out under a file lock and appended to
+src/library/catalog/names.jsonl (line n is the key of id n), so the crawler
+and main.py running at the same time never give two ingredients one id.
+The raw-name and key lookups are saved to
+src/library/catalog/ingredients.json, merged with what other processes
+saved, so batch ingestion picks up where the last run stopped.
+
+Substitution lookups and the library index ("which recipes use ricotta")
+then compare ids instead of strings.
+
+Usage:
+    python3 src/ingredient_catalog.py                  # catalog every stored recipe, save, print stats
+    python3 src/ingredient_catalog.py --find ricotta   # recipes that use an ingredient
+    python3 src/ingredient_catalog.py --benchmark 100000
+"""
+import os
+import re
+import sys
+import json
+import time
+import fcntl
+import argparse
+import threading
+import functools
+from rapidfuzz import process, fuzz
+import recipe_store
+from parser_1 import normalize_ingredient
+
+CATALOG_DIR = os.path.join(recipe_store.LIBRARY_DIR, "catalog")
+CATALOG_FILE = os.path.join(CATALOG_DIR, "ingredients.json")
+FUZZY_THRESHOLD = 92  # fuzz.ratio between keys; catches misspellings, not "garlic" vs "garlic powder"
+WORD_THRESHOLD = 80   # fuzz.ratio between two words that may be the same word misspelled
+MIN_TYPO_LENGTH = 5   # shorter words must match exactly ("rice" / "ice")
+NEGATIONS = ("un", "non")
+
+PREP_WORDS = {"chopped", "diced", "minced", "sliced", "shredded", "grated", "crushed", "cubed", "softened",
+              "melted", "beaten", "peeled", "fresh", "freshly", "lean", "extra", "finely", "coarsely",
+              "thinly", "large", "medium", "small", "optional", "divided"}
+PACKAGE_WORDS = {"package", "packages", "can", "cans", "jar", "jars", "container", "containers", "box",
+                 "boxes", "bag", "bags", "bottle", "bottles", "envelope", "envelopes"}
+
+_QUANTITY = re.compile(r"^[\d\s/.½⅓⅔¼¾⅛-]+")
+_TASTE = re.compile(r"\b(or )?to taste\b")
+
+
+def _singular(word: str) -> str:
+    if word.endswith("oes") or word.endswith("ches"):
+        return word[:-2]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+@functools.lru_cache(maxsize=16384)
+def canonical_key(name: str) -> str:
+    """ "1 (16 ounce) package lasagna noodles" -> "lasagna noodle", "garlic, chopped" -> "garlic"."""
+    name = name.split(",")[0].split(":")[0]
+    name = _TASTE.sub("", normalize_ingredient(name)).replace("-", " ")
+    name = _QUANTITY.sub("", name)
+    words = [_singular(w) for w in name.split() if w not in PREP_WORDS and w not in PACKAGE_WORDS]
+    return " ".join(words)
+
+
+def _same_word(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    if any(a == p + b or b == p + a for p in NEGATIONS):
+        return False
+    return min(len(a), len(b)) >= MIN_TYPO_LENGTH and fuzz.ratio(a, b) >= WORD_THRESHOLD
+
+
+def same_words(a: str, b: str) -> bool:
+    """Whether two keys have the same words, allowing typos inside a word ("mozarella" / "mozzarella")."""
+    left, right = a.split(), b.split()
+    if len(left) != len(right):
+        return False
+    for word in left:
+        match = next((other for other in right if _same_word(word, other)), None)
+        if match is None:
+            return False
+        right.remove(match)
+    return True
+
+
+class _FileLock:
+    """Exclusive lock on a file, held across processes."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a")
+        fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+
+
+class IngredientCatalog:
+    def __init__(self, path=CATALOG_FILE):
+        self.path = path
+        self.names = []      # id -> canonical key it was created for
+        self.ids = {}        # canonical key (or a near-spelling of one) -> id
+        self._aliases = {}   # raw name -> id
+        self._by_table = {}  # id(mapping) -> (mapping, {ingredient id: value})
+        self._lock = threading.Lock()
+        self._names_read = 0  # bytes of names.jsonl already read
+        self.fuzzy_lookups = 0
+        self.dirty = False
+        if path:
+            self.names_path = os.path.join(os.path.dirname(path), "names.jsonl")
+            self.lock_path = os.path.join(os.path.dirname(path), ".lock")
+            self._read_names()
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                self.ids.update(saved["ids"])
+                self._aliases = saved["aliases"]
+
+    def _read_names(self):
+        """Add the ids other processes appended to names.jsonl since the last read."""
+        if not os.path.exists(self.names_path):
+            return
+        with open(self.names_path, "rb") as f:
+            f.seek(self._names_read)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # only whole lines; a writer holds the lock while it appends
+        for line in data[:end].splitlines():
+            key = json.loads(line)
+            self.ids.setdefault(key, len(self.names))
+            self.names.append(key)
+        self._names_read += end
+
+    def _new_id(self, key) -> int:
+        """Id for a key no known key matches, allocated once across processes."""
+        if not self.path:
+            self.names.append(key)
+            return len(self.names) - 1
+        with _FileLock(self.lock_path):
+            self._read_names()
+            ing_id = self._match(key)  # another process may have added it (or a near-spelling) meanwhile
+            if ing_id is None:
+                with open(self.names_path, "ab") as f:
+                    f.write(json.dumps(key, ensure_ascii=False).encode("utf-8") + b"\n")
+                self._names_read = os.path.getsize(self.names_path)
+                ing_id = len(self.names)
+                self.names.append(key)
+        return ing_id
+
+    def resolve(self, name: str) -> int:
+        """Id of an ingredient name, adding it to the catalog if it's new."""
+        ing_id = self._aliases.get(name)
+        if ing_id is not None:
+            return ing_id
+        with self._lock:
+            key = canonical_key(name) or normalize_ingredient(name)
+            ing_id = self._match(key)
+            if ing_id is None:
+                ing_id = self._new_id(key)
+            self.ids[key] = ing_id
+            self._aliases[name] = ing_id
+            self.dirty = True
+        return ing_id
+
+    def find(self, name: str):
+        """Id of an ingredient name, or None if the catalog doesn't know it (nothing is added)."""
+        ing_id = self._aliases.get(name)
+        if ing_id is None:
+            with self._lock:
+                ing_id = self._match(canonical_key(name) or normalize_ingredient(name))
+        return ing_id
+
+    def _match(self, key):
+        if not key:
+            return None
+        ing_id = self.ids.get(key)
+        if ing_id is None and self.names:
+            self.fuzzy_lookups += 1
+            for _, _, candidate in process.extract(key, self.names, scorer=fuzz.ratio,
+                                                   score_cutoff=FUZZY_THRESHOLD, limit=5):
+                if same_words(key, self.names[candidate]):
+                    return candidate
+        return ing_id
+
+    def search(self, text: str) -> list:
+        """Ids of every catalog ingredient whose key contains all the words of text ("mozzarella")."""
+        ing_id = self.find(text)
+        if ing_id is not None:
+            return [ing_id]
+        words = set((canonical_key(text) or normalize_ingredient(text)).split())
+        return [i for i, key in enumerate(self.names) if words and words <= set(key.split())]
+
+    def resolve_all(self, names) -> list:
+        return [self.resolve(name) for name in names]
+
+    def name(self, ing_id: int) -> str:
+        return self.names[ing_id]
+
+    def keyed_by_id(self, mapping: dict) -> dict:
+        """{ingredient id: value} for an {ingredient name: value} table, built once per table."""
+        cached = self._by_table.get(id(mapping))
+        if cached is not None and cached[0] is mapping:
+            return cached[1]
+        by_id = {}
+        for name, value in mapping.items():
+            by_id.setdefault(self.resolve(name), value)
+        self._by_table[id(mapping)] = (mapping, by_id)
+        return by_id
+
+    def save(self):
+        """Write the lookups, merged with what other processes saved (theirs win on a clash)."""
+        if not self.path or not self.dirty:
+            return
+        with self._lock, _FileLock(self.lock_path):
+            if os.path.exists(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                self.ids.update(saved["ids"])
+                self._aliases.update(saved["aliases"])
+            recipe_store._write_json(self.path, {"ids": self.ids, "aliases": self._aliases})
+            self.dirty = False
+
+    def __len__(self):
+        return len(self.names)
+
+
+_catalog = None
+
+
+def get_catalog() -> IngredientCatalog:
+    """Process-wide catalog, loaded from CATALOG_FILE."""
+    global _catalog
+    if _catalog is None:
+        _catalog = IngredientCatalog()
+    return _catalog
+
+
+def recipe_ingredient_ids(entry) -> tuple:
+    """Catalog ids of a store entry's ingredient list, in order; cached on the entry."""
+    ids = entry.derived.get("ingredient_ids")
+    if ids is None:
+        ids = tuple(get_catalog().resolve_all(item["name"] for item in entry.recipe.get("ingredients", [])))
+        entry.derived["ingredient_ids"] = ids
+    return ids
+
+
+def find_substitution(substitutions: dict, name: str):
+    """The substitution-table value for an ingredient name, matched by catalog id, or None."""
+    catalog = get_catalog()
+    by_id = catalog.keyed_by_id(substitutions)  # puts the table's names in the catalog first
+    ing_id = catalog.find(name)
+    return by_id.get(ing_id) if ing_id is not None else None
+
+
+def index_library(store=None, catalog=None) -> dict:
+    """{ingredient id: [recipe ids]} over every recipe record in the store's library."""
+    store = store or recipe_store.get_store()
+    catalog = catalog or get_catalog()
+    index = {}
+    for recipe_id, recipe in store.records():
+        for ing_id in set(catalog.resolve_all(item["name"] for item in recipe.get("ingredients", []))):
+            index.setdefault(ing_id, []).append(recipe_id)
+    return index
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Build the ingredient catalog from the recipe library")
+    arg_parser.add_argument("--library", default=recipe_store.LIBRARY_DIR)
+    arg_parser.add_argument("--find", metavar="INGREDIENT", help="list the recipes that use an ingredient")
+    arg_parser.add_argument("--benchmark", type=int, metavar="N",
+                            help="resolve N ingredient lines (cycling through the library) with and without the catalog")
+    args = arg_parser.parse_args()
+
+    catalog = get_catalog()
+    store = recipe_store.open_store(args.library)
+    index = index_library(store, catalog)
+    if not index:
+        recipe = store.get_record(recipe_store.LEGACY_ID)
+        index = {i: [recipe_store.LEGACY_ID] for i in catalog.resolve_all(x["name"] for x in recipe["ingredients"])}
+
+    if args.find:
+        found = catalog.search(args.find)
+        if not found:
+            sys.exit(f"'{args.find}' is not in the catalog")
+        for ing_id in found:
+            recipes = index.get(ing_id, [])
+            print(f"{catalog.name(ing_id)} (id {ing_id}): {len(recipes)} recipes")
+            for recipe_id in recipes:
+                print(f"  {recipe_id}")
+        return
+
+    if args.benchmark:
+        raw = list(catalog._aliases)
+        lines = [raw[i % len(raw)] for i in range(args.benchmark)]
+        start = time.perf_counter()
+        for line in lines[:min(len(lines), 20000)]:
+            key = canonical_key.__wrapped__(line)
+            process.extractOne(key, catalog.names, scorer=fuzz.ratio, score_cutoff=FUZZY_THRESHOLD)
+        per_line = (time.perf_counter() - start) / min(len(lines), 20000)
+        print(f"normalize + fuzzy per line: {per_line * 1e6:.1f} us -> {per_line * len(lines):.2f}s for {len(lines)} lines")
+        start = time.perf_counter()
+        catalog.resolve_all(lines)
+        print(f"catalog.resolve:            {time.perf_counter() - start:.2f}s for {len(lines)} lines")
+        return
+
+    catalog.save()
+    print(f"{len(catalog)} ingredients, {len(catalog._aliases)} raw names, "
+          f"{catalog.fuzzy_lookups} fuzzy lookups this run; saved {catalog.path}")
+    for ing_id, recipes in sorted(index.items(), key=lambda kv: -len(kv[1]))[:10]:
+        print(f"  {ing_id:5d} {catalog.name(ing_id):30s} {len(recipes)} recipes")
+
+
+if __name__ == "__main__":
+    main()
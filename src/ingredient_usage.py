@@ -0,0 +1,209 @@
+"""
+Ingredient <-> step usage index for quantity questions.
+
+For each recipe: which steps use each ingredient, and which ingredients
+(with the recipe's quantities) each step uses. Ingredients are keyed by
+their ingredient_catalog id, so "eggs", "egg" and "the eggs" are one
+ingredient, and the recipe's ingredient list is read once instead of per
+step. The index is built the first time a recipe is asked about and cached
+on the store entry; after that "how many eggs do I need", "how much is left
+to add" and "where else is ricotta used" are dict lookups.
+
+Usage:
+    python3 src/ingredient_usage.py [recipe_id]     # print the index of a stored recipe
+"""
+import re
+import sys
+import ingredient_catalog
+from ingredient_catalog import canonical_key
+from parser_1 import normalize_ingredient
+
+_FILLER = re.compile(r"^(the|a|an|some|of|my|our)\s+|\s+(do|will|should|would)\s+(i|we|you)\s+(need|use|add)\b.*$|"
+                     r"\s+(is|are)\s+(needed|used|left|remaining)\b.*$|\s+(in|for)\s+(this|the)\s+(recipe|dish)\b.*$|"
+                     r"\s+(in\s+)?total$|\s+altogether$")
+
+
+def ingredient_phrase(text) -> str:
+    """ "how many eggs do I need" leaves "eggs do i need" -> "eggs" """
+    phrase = text.lower().strip(" ?.!")
+    while True:
+        shorter = _FILLER.sub("", phrase).strip()
+        if shorter == phrase:
+            return phrase
+        phrase = shorter
+
+
+def format_quantity(item) -> str:
+    """ {"qty": "2", "unit": "cups", "name": "shredded mozzarella cheese"} -> "2 cups" """
+    return " ".join(part for part in (str(item.get("qty", "")).strip(), str(item.get("unit", "")).strip()) if part)
+
+
+def describe_amount(item) -> str:
+    """ "2 cups of shredded mozzarella cheese", "2 eggs" (no unit), "salt and pepper to taste" (no quantity)."""
+    qty, unit, name = str(item.get("qty", "")).strip(), str(item.get("unit", "")).strip(), item["name"]
+    if qty and unit:
+        return f"{qty} {unit} of {name}"
+    return f"{qty} {name}" if qty else name
+
+
+def join_steps(numbers) -> str:
+    """[7] -> "step 7", [3, 7, 9] -> "steps 3, 7 and 9" """
+    numbers = [str(n) for n in numbers]
+    if len(numbers) == 1:
+        return "step " + numbers[0]
+    return "steps " + ", ".join(numbers[:-1]) + " and " + numbers[-1]
+
+
+class UsageIndex:
+    def __init__(self, recipe, steps, ingredient_ids):
+        self.items = {}          # ingredient id -> [recipe ingredient dicts] (a "divided" ingredient can be listed twice)
+        for item, ing_id in zip(recipe.get("ingredients", []), ingredient_ids):
+            self.items.setdefault(ing_id, []).append(item)
+        self.keys = {ing_id: canonical_key(items[0]["name"]) or normalize_ingredient(items[0]["name"])
+                     for ing_id, items in self.items.items()}
+        self.step_numbers = [step["step_number"] for step in steps]
+        self.by_step = []        # step position -> ingredient ids, in the order the step names them
+        self.by_ingredient = {}  # ingredient id -> step positions (0-based) that use it
+        self._found = {}         # query text -> ingredient ids it names
+        for pos, step in enumerate(steps):
+            ids = []
+            names = [item["name"] for item in step.get("ingredients", [])]
+            names += [name for action in step.get("actions", []) for name in action.get("ingredients", [])]
+            for name in names:
+                found = self.find(name)
+                if len(found) == 1 and found[0] not in ids:
+                    ids.append(found[0])
+            self.by_step.append(ids)
+            for ing_id in ids:
+                self.by_ingredient.setdefault(ing_id, []).append(pos)
+
+    def find(self, text) -> list:
+        """Ids of the recipe ingredients text names: exactly one, several if ambiguous ("cheese"), or none."""
+        found = self._found.get(text)
+        if found is not None:
+            return found
+        phrase = ingredient_phrase(text)
+        key = canonical_key(phrase) or normalize_ingredient(phrase)
+        ing_id = ingredient_catalog.get_catalog().find(phrase) if key else None
+        if ing_id in self.items:
+            found = [ing_id]
+        else:
+            found = [i for i, k in self.keys.items() if k == key]
+            if not found and key:
+                words = set(key.split())
+                found = [i for i, k in self.keys.items() if words <= set(k.split())]
+        self._found[text] = found
+        return found
+
+    def name(self, ing_id) -> str:
+        return self.items[ing_id][0]["name"]
+
+    def amount(self, ing_id) -> str:
+        """ "2 cups of shredded mozzarella cheese", or "1 cup of butter and 2 tablespoons of butter" if listed twice."""
+        return " and ".join(describe_amount(item) for item in self.items[ing_id])
+
+    def quantity(self, ing_id) -> str:
+        return " + ".join(q for q in (format_quantity(item) for item in self.items[ing_id]) if q)
+
+    def steps_using(self, ing_id) -> list:
+        """Step numbers that use an ingredient."""
+        return [self.step_numbers[pos] for pos in self.by_ingredient.get(ing_id, [])]
+
+    def steps_from(self, ing_id, idx) -> list:
+        """Step numbers from session step idx (1-based) on that use an ingredient."""
+        return [self.step_numbers[pos] for pos in self.by_ingredient.get(ing_id, []) if pos >= idx - 1]
+
+    def step_ingredients(self, idx) -> list:
+        """Ingredient ids used at session step idx (1-based)."""
+        return self.by_step[idx - 1] if 0 < idx <= len(self.by_step) else []
+
+    def remaining(self, idx) -> list:
+        """(ingredient id, step numbers) for every ingredient still to be added from step idx on, in step order."""
+        seen = {}
+        for pos in range(max(idx - 1, 0), len(self.by_step)):
+            for ing_id in self.by_step[pos]:
+                seen.setdefault(ing_id, []).append(self.step_numbers[pos])
+        return list(seen.items())
+
+
+def get_usage_index(entry) -> UsageIndex:
+    """Per-recipe usage index, built once and cached on the store entry."""
+    index = entry.derived.get("ingredient_usage")
+    if index is None:
+        index = UsageIndex(entry.recipe, entry.steps, ingredient_catalog.recipe_ingredient_ids(entry))
+        entry.derived["ingredient_usage"] = index
+    return index
+
+
+# ------------------------------------------------------------
+# Answers
+# ------------------------------------------------------------
+def _which_one(index, found) -> str:
+    names = [index.name(i) for i in found]
+    return "Which one do you mean: " + ", ".join(names[:-1]) + " or " + names[-1] + "?"
+
+
+def how_much(index, text) -> str:
+    """ "how many eggs do I need" """
+    found = index.find(text)
+    if not found:
+        return f"Sorry, I don't know how much {ingredient_phrase(text)} you need."
+    if len(found) > 1:
+        return _which_one(index, found)
+    ing_id = found[0]
+    steps = index.steps_using(ing_id)
+    where = f" ({join_steps(steps)})" if steps else ""
+    return f"You need {index.amount(ing_id)}{where}."
+
+
+def how_much_left(index, idx, text=None) -> str:
+    """ "how much mozzarella is left", or with no ingredient, everything still to add from step idx on."""
+    if not text:
+        remaining = index.remaining(idx)
+        if not remaining:
+            return "You've already added everything. No ingredients are left to add."
+        return "Still to add:\n" + "\n".join(f"- {index.amount(i)} ({join_steps(steps)})" for i, steps in remaining)
+    found = index.find(text)
+    if not found:
+        return f"This recipe doesn't use {ingredient_phrase(text)}."
+    if len(found) > 1:
+        return _which_one(index, found)
+    ing_id = found[0]
+    later = index.steps_from(ing_id, idx)
+    if not later:
+        return f"You've already used all the {index.name(ing_id)}."
+    return f"You still add {index.name(ing_id)} in {join_steps(later)} ({index.quantity(ing_id) or index.amount(ing_id)} in all)."
+
+
+def where_else(index, idx, text) -> str:
+    """ "where else is ricotta used" (besides step idx)"""
+    found = index.find(text)
+    if not found:
+        return f"This recipe doesn't use {ingredient_phrase(text)}."
+    if len(found) > 1:
+        return _which_one(index, found)
+    ing_id = found[0]
+    current = index.step_numbers[idx - 1] if 0 < idx <= len(index.step_numbers) else None
+    others = [n for n in index.steps_using(ing_id) if n != current]
+    if not others:
+        if current in index.steps_using(ing_id):
+            return f"{index.name(ing_id).capitalize()} is only used in this step."
+        return f"{index.name(ing_id).capitalize()} is in the ingredient list, but no step mentions it."
+    also = " also" if current in index.steps_using(ing_id) else ""
+    return f"{index.name(ing_id).capitalize()} is{also} used in {join_steps(others)}."
+
+
+def main():
+    import recipe_store
+    recipe_id = sys.argv[1] if len(sys.argv) > 1 else recipe_store.LEGACY_ID
+    index = get_usage_index(recipe_store.get_store().get(recipe_id))
+    for ing_id in index.items:
+        steps = index.steps_using(ing_id)
+        print(f"{index.amount(ing_id):55s} {join_steps(steps) if steps else '(no step)'}")
+    print()
+    for pos, ids in enumerate(index.by_step):
+        print(f"step {index.step_numbers[pos]:3d}: " + "; ".join(index.amount(i) for i in ids))
+
+
+if __name__ == "__main__":
+    main()
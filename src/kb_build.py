@@ -0,0 +1,280 @@
+"""
+Build the knowledge base (glossary, cooking tools, tool list) in one step.
+
+    sources                         artifacts (src/kb/<name>-<digest>.json)
+    glossary_curated (local json) -+
+    glossary         (web page)   -+->  glossary -> dictionary_index
+    tools_curated    (local txt)  -+
+    tools_guide      (web page)   -+->  cooking_tools -> tool_index
+    tools_list       (local txt)  --->  + cooking_tools -> tools
+
+Web sources are fetched in parallel over one pooled session with
+conditional requests (ETag / Last-Modified), or read from a snapshot
+directory (--snapshots, e.g. in tests). Fetched pages are kept in
+src/kb/sources so a 304 or an offline run reuses them. The manifest records
+the digest of every source and of each artifact's inputs and builder code;
+only artifacts whose inputs changed are rebuilt, and an artifact whose
+source is unavailable keeps its last built version. resources.py and
+recipe_parser.py load the current artifacts listed in the manifest and fall
+back to the hand-made files in src/ when no knowledge base has been built.
+
+Usage:
+    python3 src/kb_build.py                      # fetch and rebuild what changed
+    python3 src/kb_build.py --snapshots src/fixtures/kb_snapshots
+    python3 src/kb_build.py --offline            # only use cached/local sources
+"""
+import os
+import sys
+import json
+import time
+import inspect
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+from helpers.culinary_term_scraper import GLOSSARY_URL, parse_glossary
+from helpers.cooking_tool_scraper import TOOLS_URL, parse_cooking_tools
+from helpers.dedupe import dedupe_lines
+from helpers.temp_tool_extractor import extract_tool_names
+import recipe_store
+
+KB_DIR = os.path.join(recipe_store.SRC_DIR, "kb")
+SOURCES_DIR = os.path.join(KB_DIR, "sources")
+MANIFEST_FILE = os.path.join(KB_DIR, "manifest.json")
+
+WEB_SOURCES = {"glossary": GLOSSARY_URL, "tools_guide": TOOLS_URL}
+LOCAL_SOURCES = {name: os.path.join(recipe_store.SRC_DIR, filename) for name, filename in
+                 [("glossary_curated", "culinary_dictionary.json"), ("tools_curated", "common_cooking_tools.txt"),
+                  ("tools_list", "tools.txt")]}
+
+
+# ------------------------------------------------------------
+# Builders: inputs (source text or earlier artifacts) -> artifact data
+# ------------------------------------------------------------
+def build_glossary(glossary_curated, glossary):
+    """The curated dictionary, updated with the glossary page's entries."""
+    terms = json.loads(glossary_curated)
+    terms.update(parse_glossary(glossary))
+    return terms
+
+
+def build_dictionary_index(glossary):
+    """Lowercase term -> definition, the form the query handlers look up."""
+    index = {}
+    for term, definition in glossary.items():
+        index.setdefault(term.lower(), definition)
+    return index
+
+
+def build_cooking_tools(tools_curated, tools_guide):
+    """Curated list first, then the equipment guide, streamed through dedupe."""
+    lines = tools_curated.splitlines() + parse_cooking_tools(tools_guide)
+    return dict(dedupe_lines(lines))
+
+
+def build_tool_index(cooking_tools):
+    return {name.lower(): desc for name, desc in cooking_tools.items()}
+
+
+def build_tools(tools_list, cooking_tools):
+    """
+    The parser's tool list: tools.txt, then any other tool the guide names,
+    lowercased like parser_1.load_list_from_file.
+    """
+    names = [line for line in tools_list.splitlines() if line.strip()]
+    names += extract_tool_names(f"{name} : {desc}" for name, desc in cooking_tools.items())
+    return list(dict.fromkeys(name.strip().lower() for name in names))
+
+
+# name -> (builder, input names); inputs are sources or artifacts listed earlier
+ARTIFACTS = {
+    "glossary": (build_glossary, ["glossary_curated", "glossary"]),
+    "dictionary_index": (build_dictionary_index, ["glossary"]),
+    "cooking_tools": (build_cooking_tools, ["tools_curated", "tools_guide"]),
+    "tool_index": (build_tool_index, ["cooking_tools"]),
+    "tools": (build_tools, ["tools_list", "cooking_tools"]),
+}
+
+
+def _digest(data) -> str:
+    if not isinstance(data, (str, bytes)):
+        data = json.dumps(data, sort_keys=True, ensure_ascii=False)
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _code_digest(builder) -> str:
+    """Changes when the builder or the helper it calls changes."""
+    parts = [inspect.getsource(builder)]
+    for name in builder.__code__.co_names:
+        fn = globals().get(name)
+        if callable(fn) and hasattr(fn, "__code__"):
+            parts.append(inspect.getsource(fn))
+    return _digest("".join(parts))
+
+
+# ------------------------------------------------------------
+# Sources
+# ------------------------------------------------------------
+def _cached_source_path(name):
+    return os.path.join(SOURCES_DIR, name + ".html")
+
+
+def _read(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def _write_text(path, text):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+def fetch_sources(previous, snapshots=None, offline=False):
+    """Return ({source: text, or None if unavailable}, {source: manifest info})."""
+    texts, info = {}, {}
+    for name, path in LOCAL_SOURCES.items():
+        texts[name] = _read(path)
+        info[name] = {"path": os.path.relpath(path, recipe_store.SRC_DIR)}
+
+    if snapshots:
+        for name in WEB_SOURCES:
+            path = os.path.join(snapshots, name + ".html")
+            texts[name] = _read(path) if os.path.exists(path) else None
+            info[name] = {"snapshot": path}
+    else:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=len(WEB_SOURCES), pool_maxsize=len(WEB_SOURCES)))
+
+        def fetch(name):
+            return name, _fetch_one(session, name, previous.get(name, {}), offline)
+
+        with ThreadPoolExecutor(max_workers=len(WEB_SOURCES)) as pool:
+            for name, (text, meta) in pool.map(fetch, WEB_SOURCES):
+                texts[name] = text
+                info[name] = meta
+
+    for name, text in texts.items():
+        info[name]["digest"] = _digest(text) if text is not None else None
+    return texts, info
+
+
+def _fetch_one(session, name, prev, offline):
+    cached = _cached_source_path(name)
+    have_cache = os.path.exists(cached)
+    if offline:
+        if not have_cache:
+            print(f"  {name}: no cached copy, skipped", file=sys.stderr)
+        return (_read(cached) if have_cache else None), dict(prev, status="offline")
+
+    headers = {}
+    if have_cache and prev.get("etag"):
+        headers["If-None-Match"] = prev["etag"]
+    if have_cache and prev.get("last_modified"):
+        headers["If-Modified-Since"] = prev["last_modified"]
+    try:
+        resp = session.get(WEB_SOURCES[name], headers=headers, timeout=20)
+        if resp.status_code == 304:
+            return _read(cached), dict(prev, status="not modified")
+        resp.raise_for_status()
+    except requests.RequestException as e:
+        print(f"  {name}: fetch failed ({e}), using cached copy" if have_cache else f"  {name}: fetch failed ({e})",
+              file=sys.stderr)
+        return (_read(cached) if have_cache else None), dict(prev, status="failed")
+
+    os.makedirs(SOURCES_DIR, exist_ok=True)
+    _write_text(cached, resp.text)
+    return resp.text, {"url": WEB_SOURCES[name], "etag": resp.headers.get("ETag"),
+                       "last_modified": resp.headers.get("Last-Modified"), "status": "fetched"}
+
+
+# ------------------------------------------------------------
+# Build
+# ------------------------------------------------------------
+def load_manifest():
+    if os.path.exists(MANIFEST_FILE):
+        with open(MANIFEST_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {"version": 0, "sources": {}, "artifacts": {}}
+
+
+def build(snapshots=None, offline=False, force=False):
+    os.makedirs(KB_DIR, exist_ok=True)
+    manifest = load_manifest()
+    texts, sources = fetch_sources(manifest["sources"], snapshots, offline)
+
+    values = dict(texts)              # input name -> data
+    digests = {name: meta["digest"] for name, meta in sources.items()}
+    artifacts = {}
+    rebuilt = []
+    for name, (builder, inputs) in ARTIFACTS.items():
+        old = manifest["artifacts"].get(name)
+        path = os.path.join(KB_DIR, old["file"]) if old else None
+        old_usable = old is not None and os.path.exists(path)
+        if any(digests.get(i) is None for i in inputs):
+            # an input is unavailable: keep the last build, or leave the artifact out
+            values[name] = digests[name] = None
+            if old_usable:
+                artifacts[name] = old
+                with open(path, "r", encoding="utf-8") as f:
+                    values[name] = json.load(f)
+                digests[name] = old["digest"]
+            continue
+
+        key = _digest([digests[i] for i in inputs] + [_code_digest(builder)])
+        if old_usable and old["inputs"] == key and not force:
+            artifacts[name] = old
+            with open(path, "r", encoding="utf-8") as f:
+                values[name] = json.load(f)
+        else:
+            values[name] = builder(*(values[i] for i in inputs))
+            content_digest = _digest(values[name])
+            filename = f"{name}-{content_digest}.json"
+            recipe_store._write_json(os.path.join(KB_DIR, filename), values[name])
+            artifacts[name] = {"file": filename, "inputs": key, "digest": content_digest, "count": len(values[name])}
+            rebuilt.append(name)
+        digests[name] = artifacts[name]["digest"]
+
+    changed = [n for n in rebuilt if manifest["artifacts"].get(n, {}).get("digest") != artifacts[n]["digest"]]
+    new_manifest = {
+        "version": manifest["version"] + (1 if changed else 0),
+        "built_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "sources": sources,
+        "artifacts": artifacts,
+        "previous": ({n: a["file"] for n, a in manifest["artifacts"].items()} if changed
+                     else manifest.get("previous", {})),
+    }
+    recipe_store._write_json(MANIFEST_FILE, new_manifest)
+    _prune(new_manifest)
+    return new_manifest, rebuilt
+
+
+def _prune(manifest):
+    """Remove artifact files that are neither current nor from the previous version."""
+    keep = {a["file"] for a in manifest["artifacts"].values()} | set(manifest["previous"].values())
+    for name in os.listdir(KB_DIR):
+        if name.endswith(".json") and name != os.path.basename(MANIFEST_FILE) and name not in keep:
+            os.remove(os.path.join(KB_DIR, name))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Build the glossary / cooking tool knowledge base")
+    arg_parser.add_argument("--snapshots", help="read web sources from <dir>/<source>.html instead of fetching")
+    arg_parser.add_argument("--offline", action="store_true", help="don't fetch; use cached sources")
+    arg_parser.add_argument("--force", action="store_true", help="rebuild every artifact")
+    args = arg_parser.parse_args()
+
+    start = time.perf_counter()
+    manifest, rebuilt = build(args.snapshots, args.offline, args.force)
+    print(f"knowledge base v{manifest['version']} in {time.perf_counter() - start:.2f}s; "
+          f"rebuilt: {', '.join(rebuilt) or 'nothing'}")
+    for name, artifact in manifest["artifacts"].items():
+        print(f"  {name:17s} {artifact['count']:5d} entries  {artifact['file']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Load generator: replays scripted cooking conversations through the query
+handlers (main.route_query) with many simulated cooks at once, and reports
+latency percentiles per intent and overall throughput.
+
+Each simulated cook gets its own Session and asks a conversation's queries
+in order, pausing --think seconds between them. Cooks either arrive at a
+fixed average rate (--rate, Poisson arrivals; open loop) or, without
+--rate, --concurrency cooks repeat conversations back to back (closed loop).
+No microphone, text-to-speech or network is involved: queries are plain
+text and timer alerts go to a silent sink.
+
+Usage:
+    python3 src/loadgen.py --concurrency 200 --duration 30
+    python3 src/loadgen.py --rate 20 --duration 60 --think 0.5 --conversations my_log.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import recipe_store
+import timers
+import answer_cache
+import event_log
+from session import Session
+from main import route_query
+
+CONVERSATIONS_FILE = os.path.join(recipe_store.SRC_DIR, "fixtures", "conversations.json")
+
+
+def load_conversations(path, store):
+    """[{name, recipe_id, queries}] whose recipes are available in the store."""
+    with open(path, "r", encoding="utf-8") as f:
+        conversations = json.load(f)
+    usable = []
+    for conv in conversations:
+        if conv["recipe_id"] in store:
+            usable.append(conv)
+        else:
+            print(f"  skipping {conv['name']}: recipe {conv['recipe_id']} not in the store", file=sys.stderr)
+    return usable
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}          # intent -> [seconds]
+        self.errors = 0
+        self.conversations = 0
+        self._lock = threading.Lock()
+
+    def add(self, intent, seconds):
+        with self._lock:
+            self.latencies.setdefault(intent, []).append(seconds)
+
+    def error(self):
+        with self._lock:
+            self.errors += 1
+
+    def finished(self):
+        with self._lock:
+            self.conversations += 1
+
+
+def run_conversation(conv, store, recorder, think, speech, deadline):
+    session = Session(conv["recipe_id"], store)
+    session.notify = lambda message: None
+    try:
+        for query in conv["queries"]:
+            if time.monotonic() > deadline:
+                return
+            start = time.perf_counter()
+            try:
+                intent, _ = route_query(query, session, speech)
+            except Exception:
+                recorder.error()
+                intent = "error"
+            recorder.add(intent, time.perf_counter() - start)
+            if think:
+                time.sleep(random.expovariate(1 / think))
+        recorder.finished()
+    finally:
+        timers.end_session(session.session_id)
+
+
+def warm_up(conversations, store):
+    """One untimed pass, so per-recipe indexes and the spaCy model are built before measuring."""
+    for conv in conversations:
+        run_conversation(conv, store, Recorder(), 0, False, float("inf"))
+
+
+def run_load(conversations, store, concurrency=10, rate=None, duration=10.0, think=0.0, speech=False, seed=0):
+    random.seed(seed)
+    recorder = Recorder()
+    deadline = time.monotonic() + duration
+    start = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        if rate:
+            # open loop: cooks arrive on their own schedule whether or not earlier ones are done
+            while time.monotonic() < deadline:
+                pool.submit(run_conversation, random.choice(conversations), store, recorder, think, speech, deadline)
+                time.sleep(random.expovariate(rate))
+        else:
+            def cook():
+                while time.monotonic() < deadline:
+                    run_conversation(random.choice(conversations), store, recorder, think, speech, deadline)
+            for _ in range(concurrency):
+                pool.submit(cook)
+    return recorder, time.perf_counter() - start
+
+
+def report(recorder, elapsed):
+    rows = sorted(recorder.latencies.items(), key=lambda kv: -len(kv[1]))
+    everything = [s for _, lat in rows for s in lat]
+    print(f"{'intent':14s} {'count':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'max ms':>9s}")
+    for intent, lat in rows + [("all", everything)]:
+        if not lat:
+            continue
+        p50, p95, p99 = np.percentile(lat, [50, 95, 99]) * 1000
+        print(f"{intent:14s} {len(lat):8d} {p50:9.2f} {p95:9.2f} {p99:9.2f} {max(lat) * 1000:9.2f}")
+    print(f"{len(everything)} queries in {elapsed:.1f}s = {len(everything) / elapsed:.1f} queries/s; "
+          f"{recorder.conversations} conversations finished, {recorder.errors} errors")
+    print(answer_cache.format_stats())
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Replay cooking conversations against the query handlers")
+    arg_parser.add_argument("--conversations", default=CONVERSATIONS_FILE)
+    arg_parser.add_argument("--concurrency", type=int, default=20, help="simultaneous cooks (worker threads)")
+    arg_parser.add_argument("--rate", type=float, default=None, help="new cooks per second (open loop)")
+    arg_parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    arg_parser.add_argument("--think", type=float, default=0.0, help="mean pause between a cook's queries")
+    arg_parser.add_argument("--speech", action="store_true", help="format answers for speech output")
+    arg_parser.add_argument("--cold", action="store_true", help="skip the warm-up pass and measure cold start too")
+    arg_parser.add_argument("--event-log", default=None, metavar="PATH",
+                            help="record the run's query events here (off by default)")
+    args = arg_parser.parse_args()
+    event_log.configure(args.event_log)
+
+    store = recipe_store.get_store()
+    conversations = load_conversations(args.conversations, store)
+    if not conversations:
+        sys.exit("no conversations with available recipes")
+    if not args.cold:
+        warm_up(conversations, store)
+    recorder, elapsed = run_load(conversations, store, args.concurrency, args.rate, args.duration,
+                                 args.think, args.speech)
+    report(recorder, elapsed)
+
+
+if __name__ == "__main__":
+    main()
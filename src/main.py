@@ -3,70 +3,45 @@ import time
 import recipe_scraper
 import recipe_parser
 import step_manager
-import json
+import threading
+import resources
+import nlp_pool
+import recipe_store
+import step_search
+import step_graph
+import timers
+import nutrition
+import answer_cache
+import ingredient_catalog
+import ingredient_usage
+import event_log
+from parser_1 import extract_time, parse_duration_seconds
+from session import Session
+from context_tracker import VAGUE_PATTERN
+from render import Response, render, slow_print, word_print, tactical_pause
 from typing import Tuple
 
-_DELAY_MULTIPLIER = 0.0 # for testing, set to 0.0 to skip delays
+subs = resources.get_substitutions()
 
-subs = {}
-with open("src/ingredient_substitutions.json", "r") as f:
-    data = json.load(f)
-
-    # Expecting a list of objects
-    for entry in data:
-        ingredient = entry.get("ingredient")
-        substitution = entry.get("substitution")
-
-        if not ingredient or not substitution:
-            continue  # skip incomplete rows
-
-        subs[ingredient.lower()] = substitution
-
-with open("src/recipe.json", "r", encoding="utf-8") as f:
-    recipe_data = json.load(f)
-
-# with open("parsed_recipes.json", "r", encoding="utf-8") as f:
-#     parsed_recipe_data = json.load(f)
-
-with open("src/culinary_dictionary.json", "r", encoding="utf-8") as f:
-    culinary_dict = json.load(f)
+culinary_dict = resources.get_culinary_dict()
 
 def load_cooking_tools():
     # returns a dict: {"Hand whisk": "...", "...": "..."}
-    tools = {}
-    with open("src/common_cooking_tools.txt", "r", encoding="utf-8") as f:
-        for line in f:
-            if ':' in line:
-                name, desc = line.split(':', 1)
-                tools[name.strip().lower()] = desc.strip()
-    return tools
+    return resources.get_cooking_tools()
 
 cooking_tools = load_cooking_tools()
 
-def slow_print(*args, delay=0.025):
-    text = ''.join(str(arg) for arg in args)
-    for char in text:
-        print(char, end='', flush=True)
-        time.sleep(_DELAY_MULTIPLIER*delay)
-    tactical_pause()
-    print()  # Move to the next line after printing
-
-def word_print(*args, delay=0.15):
-    text = ' '.join(str(arg) for arg in args)
-    words = text.split()
-    for word in words:
-        print(word, end=' ', flush=True)
-        time.sleep(_DELAY_MULTIPLIER*delay)
-    print() 
-
-def tactical_pause(seconds = 0.35):
-    time.sleep(_DELAY_MULTIPLIER*seconds)
-
-def scrape_and_parse(url: str):
-    recipe_scraper.main(url)
-    recipe_parser.main()
-    step_manager.main()
-    slow_print("Scraping and parsing complete!")
+def scrape_and_parse(url: str) -> str:
+    """Scrape and parse a recipe into the recipe store; returns its recipe id."""
+    recipe_id = recipe_store.recipe_id_for_url(url)
+    data = recipe_scraper.scrape(url)
+    steps = recipe_parser.get_parsed_steps(data)
+    recipe_store.get_store().put(recipe_id, data, steps, url)
+    catalog = ingredient_catalog.get_catalog()
+    catalog.resolve_all(item["name"] for item in data["ingredients"])
+    catalog.save()
+    render("Scraping and parsing complete!")
+    return recipe_id
 
 def make_google_search_url(q):
     g_query = q.replace(" ", "+")
@@ -76,188 +51,117 @@ def make_youtube_search_url(q):
     yt_query = q.replace(" ", "+")
     return f"https://www.youtube.com/results?search_query={yt_query}"
 
-def startup_base():
-    slow_print("What recipe would you like to cook today?")
-    url = input("\nEnter recipe url: ")
-    slow_print("\nGreat! Let's scrape and parse this delicious recipe!")
-    tactical_pause()
-    scrape_and_parse(url)
-    tactical_pause(3)
-    slow_print("Let's see what we have!")
-    word_print("\nRecipe Details:\n", delay=0.3)
-    word_print("Title:", recipe_data["title"],), tactical_pause()
-    word_print("Prep time:", recipe_data["prep_time"]), tactical_pause()
-    word_print("Cook time:", recipe_data["cook_time"]), tactical_pause()
-    word_print("Additional time:", recipe_data["additional_time"]), tactical_pause()
-    word_print("Total time:", recipe_data["total_time"]), tactical_pause()
-    word_print("Yield:", recipe_data["yield"], " servings"), tactical_pause()
-    word_print("\nIngredients:")
-    
-    for ingredient in recipe_data["ingredients"]:
-        slow_print("- ", ingredient["qty"]," ", ingredient["unit"]," ", ingredient["name"], delay=0.02), tactical_pause()
-    tactical_pause(.5)
-    
-    print("\n\n")
-    slow_print(" And the steps are as follows:\n")
-    
-    for step in recipe_data["steps"]:
-        print()
-        word_print("Step ", step["step_number"], ": ", step["text"], delay=0.15), tactical_pause(1.5)
+def format_recipe_overview(recipe_data) -> Response:
+    """Recipe details, ingredients and steps as one Response."""
+    response = Response()
+    response.add("Let's see what we have!", style="char")
+    response.add("\nRecipe Details:\n", delay=0.3)
+    response.add(f"Title: {recipe_data['title']}", pause=0.35)
+    response.add(f"Prep time: {recipe_data['prep_time']}", pause=0.35)
+    response.add(f"Cook time: {recipe_data['cook_time']}", pause=0.35)
+    response.add(f"Additional time: {recipe_data['additional_time']}", pause=0.35)
+    response.add(f"Total time: {recipe_data['total_time']}", pause=0.35)
+    response.add(f"Yield: {recipe_data['yield']} servings", pause=0.35)
+    response.add("\nIngredients:")
 
-# ------------------------------------------------------------
-# Helper: choose best phrase to replace "it / that / this / them"
-# ------------------------------------------------------------
-def get_replacement_phrase(step):
-    """Return the most relevant description for vague-noun replacement."""
-
-    # Prefer an ingredient-targeting phrase
-    if step.get("actions"):
-        action = step["actions"][0]
-        verb = action.get("verb")
-        ingredients = action.get("ingredients", [])
-
-        if verb and ingredients:
-            ing_phrase = ", ".join(ingredients)
-            return f"{verb} the {ing_phrase}"
-        if verb:
-            return verb
-
-    # Fallback to step description
-    return step.get("description", "the current step")
+    for ingredient in recipe_data["ingredients"]:
+        response.add(f"- {ingredient['qty']} {ingredient['unit']} {ingredient['name']}", style="char", delay=0.02, pause=0.35)
 
+    response.add("\n\n And the steps are as follows:\n", style="char", pause=0.5)
 
-# ------------------------------------------------------------
-# Replacement of vague pronouns
-# ------------------------------------------------------------
-def replace_vague_terms(q: str, phrase: str, vague_terms):
-    for vt in vague_terms:
-        q = re.sub(rf"\b{vt}\b", phrase, q, flags=re.I)
-    return q
+    for step in recipe_data["steps"]:
+        response.add(f"\nStep {step['step_number']}: {step['text']}", pause=1.5)
+    return response
+
+def startup_base() -> Session:
+    """Ask for a recipe, scrape and parse it, and return a session bound to it."""
+    # Load the spaCy model while the user is typing the url
+    threading.Thread(target=nlp_pool.warm, daemon=True).start()
+    render("What recipe would you like to cook today?")
+    url = input("\nEnter recipe url: ")
+    render("\nGreat! Let's scrape and parse this delicious recipe!")
+    session = Session(scrape_and_parse(url))
+    render(format_recipe_overview(session.recipe))
+    return session
 
 def contains_vague_term(query):
-    vague_terms = ["it", "that", "this", "them"]
-    for vt in vague_terms:
-        if re.search(rf"\b{vt}\b", query, flags=re.I):
-            return True
-    return False
-
-# ------------------------------------------------------------
-# Extract primary ingredient of current step
-# ------------------------------------------------------------
-def get_primary_ingredient(step):
-    if not step or not isinstance(step, dict):
-        return None
-    if step.get("actions"):
-        ingredients = step["actions"][0].get("ingredients", [])
-        return ingredients[0] if ingredients else None
-    return None
-
-# ------------------------------------------------------------
-# Extract time / temperature if present
-# ------------------------------------------------------------
-def get_step_time_phrase(step):
-    t = step.get("time", {})
-    if not t:
-        return None
-
-    if "duration" in t:
-        return t["duration"]
-
-    if "min" in t and "max" in t:
-        return f"{t['min']} to {t['max']} minutes"
-
-    if "min" in t:
-        return f"{t['min']} minutes"
-
-    return None
-
-
-def get_step_temp_phrase(step):
-    temp = step.get("temperature", {})
-    if not temp:
-        return None
-
-    if "fahrenheit" in temp:
-        return f"{temp['fahrenheit']}°F"
-    if "celsius" in temp:
-        return f"{temp['celsius']}°C"
-
-    return None
+    return VAGUE_PATTERN.search(query) is not None
 
 # ------------------------------------------------------------
 # Main vague query handler
 # ------------------------------------------------------------
-def handle_vague_query(query, curr_idx, speech: bool) -> Tuple[bool, str]:
-
-    steps = step_manager.get_steps()
-    step = step_manager.get_current_step(steps, curr_idx)
-
-    vague_terms = ["it", "that", "this", "them"]
-    replacement_phrase = get_replacement_phrase(step)
-    lower_query = query.lower()
+HOW_MUCH_OF_PAT = re.compile(r"how\s+much\s+of\s+(it|that|this|them)", re.I)
+HOW_LONG_PAT = re.compile(r"how\s+long.*\b(it|that|this|them)\b", re.I)
+SUBSTITUTION_OF_PAT = re.compile(r"(use|substitute|instead of)\s+(it|that|this|them)", re.I)
+HOW_DO_VAGUE_PAT = re.compile(r"how\s+(do|to|should)\b", re.I)
+WHAT_IS_VAGUE_PAT = re.compile(r"what\s+(is|does)\b", re.I)
 
-    # --------------------------------------------------------
-    # Specific disambiguation based on question type
-    # --------------------------------------------------------
+def handle_vague_query(query, session, speech: bool) -> Tuple[bool, str]:
+    """
+    Answer a question containing it/that/this/them. The referent comes from
+    the session's context tracker (ingredients named in recent turns, then
+    the current step's precomputed referents), with no query rewriting.
+    """
+    context = session.context
 
     # --- Case 1: "how much of that / how much of it" → quantity inquiry
-    how_much_of_pat = re.compile(r"how\s+much\s+of\s+(it|that|this|them)", re.I)
-    if how_much_of_pat.search(query):
-        ingredient = get_primary_ingredient(step)
+    if HOW_MUCH_OF_PAT.search(query):
+        ingredient = context.resolve_ingredient()
         if not ingredient:
             return True, "I'm not sure which ingredient you're referring to."
 
-        qty = find_ingredient_quantity(ingredient, steps, curr_idx)
+        qty = find_ingredient_quantity(ingredient, session)
         if qty:
             return True, f"You need {qty} of {ingredient}."
         else:
             return True, f"I couldn't find the quantity for {ingredient}."
 
     # --- Case 2: "how long do I bake it / how long should I cook that"
-    how_long_pat = re.compile(r"how\s+long.*\b(it|that|this|them)\b", re.I)
-    if how_long_pat.search(query):
-        t = get_step_time_phrase(step)
+    if HOW_LONG_PAT.search(query):
+        t = context.resolve("time")
         if t:
             return True, f"You should do it for {t}."
         return True, "This step doesn't specify a cooking time."
 
     # --- Case 3: "what can I use instead of it/that" → ingredient substitution
-    substitution_pat = re.compile(r"(use|substitute|instead of)\s+(it|that|this|them)", re.I)
-    if substitution_pat.search(query):
-        ingredient = get_primary_ingredient(step)
+    if SUBSTITUTION_OF_PAT.search(query):
+        ingredient = context.resolve_ingredient()
         if not ingredient:
             return True, "I'm not sure which ingredient you're referring to."
-        # Let your existing substitution handler take over
-        return handle_substitution_query(f"what can I use instead of {ingredient}", curr_idx, speech)
+        return True, find_substitution(ingredient, session)
 
-    # --------------------------------------------------------
-    # Generic ambiguous replacement + forward to info handler
-    # --------------------------------------------------------
+    # --- Case 4: "how do I do that" → the step's action
+    if HOW_DO_VAGUE_PAT.search(query):
+        verb = context.resolve("verb")
+        if verb:
+            answer = describe_term(verb, speech)
+            if answer:
+                return True, answer
+        return True, search_suggestion("how to " + context.resolve("phrase"), speech)
 
-    rewritten_query = replace_vague_terms(query, replacement_phrase, vague_terms)
+    # --- Case 5: "what is that" → the step's ingredient or tool
+    if WHAT_IS_VAGUE_PAT.search(query):
+        for term in (context.resolve_ingredient(), context.resolve("tool")):
+            answer = describe_term(term, speech) if term else None
+            if answer:
+                return True, answer
 
-    handled, output = handle_info_query(rewritten_query, speech, curr_idx)
-    return handled, output
+    return True, search_suggestion(VAGUE_PATTERN.sub(context.resolve("phrase"), query), speech)
 
 # ------------------------------------------------------------
 # Utility: find ingredient quantity from steps
 # ------------------------------------------------------------
-def find_ingredient_quantity(ingredient, steps, curr_idx): #TODO Pull from original ingredient list
+def find_ingredient_quantity(ingredient, session):
     """
-    Search ingredients across all steps to find a matching quantity entry.
-    You can customize this depending on how you store quantities.
+    The recipe's quantity of an ingredient ("2 cups"), looked up in the
+    recipe's ingredient usage index, or None if it names no single ingredient.
     """
-    target = ingredient.lower()
-    amount = step_manager.get_current_step(steps, curr_idx)
-    if amount:
-        for ing in amount["ingredients"]:
-            if ing["name"] == target:
-                return ing["qty"] + ing["unit"]
-    return
-    
-    
+    index = ingredient_usage.get_usage_index(session.entry)
+    found = index.find(ingredient)
+    return index.quantity(found[0]) or None if len(found) == 1 else None
+
 
-def handle_substitution_query(query: str, curr_idx: int, speech: bool) -> Tuple[bool, str]:
+def handle_substitution_query(query: str, session, speech: bool) -> Tuple[bool, str]:
     """
     Detects when the user asks for a substitution (e.g., "What can I use instead of butter?")
     Extracts the ingredient, looks up a substitution in substitutions.txt, and returns an answer.
@@ -287,7 +191,11 @@ def handle_substitution_query(query: str, curr_idx: int, speech: bool) -> Tuple[
     # -------------------------------------------------
     #     EXTRACT RAW INGREDIENT TERM FROM QUERY
     # -------------------------------------------------
-    raw_ing = match.group(1).strip().lower()
+    return True, find_substitution(match.group(1), session)
+
+def find_substitution(raw_ing: str, session) -> str:
+    """Match an ingredient name against the session's recipe and return the substitution answer."""
+    raw_ing = raw_ing.strip().lower()
 
     # Normalize plurals or trailing punctuation
     raw_ing = re.sub(r"[?.!]", "", raw_ing)
@@ -296,8 +204,8 @@ def handle_substitution_query(query: str, curr_idx: int, speech: bool) -> Tuple[
     # -------------------------------------------------
     #          COLLECT INGREDIENTS FOR MATCHING
     # -------------------------------------------------
-    steps = step_manager.get_steps()
-    current = step_manager.get_current_step(steps, curr_idx)
+    steps = session.steps
+    current = session.current_step()
 
     def collect_ingredients(step):
         ings = []
@@ -322,7 +230,7 @@ def handle_substitution_query(query: str, curr_idx: int, speech: bool) -> Tuple[
             break
 
     if not matched_ing:
-        return True, f"I couldn't find the ingredient '{raw_ing}' in the recipe."
+        return f"I couldn't find the ingredient '{raw_ing}' in the recipe."
 
     # -------------------------------------------------
     #             LOAD SUBSTITUTIONS.TXT
@@ -332,14 +240,11 @@ def handle_substitution_query(query: str, curr_idx: int, speech: bool) -> Tuple[
     # -------------------------------------------------
     #             FIND SUBSTITUTIONS
     # -------------------------------------------------
-    # direct match
-    if matched_ing in subs:
-        sub_list = subs[matched_ing]
-    # plural/singular check
-    elif matched_ing.rstrip("s") in subs:
-        sub_list = subs[matched_ing.rstrip("s")]
-    else:
-        return True, f"I couldn't find any substitutions for {matched_ing}."
+    # match by ingredient catalog id, so "shredded parmesan cheese" finds "Parmesan cheese"
+    # and "eggs" finds "Egg"
+    sub_list = ingredient_catalog.find_substitution(subs, matched_ing)
+    if sub_list is None:
+        return f"I couldn't find any substitutions for {matched_ing}."
 
     # Format for output
     if len(sub_list) == 1:
@@ -351,13 +256,14 @@ def handle_substitution_query(query: str, curr_idx: int, speech: bool) -> Tuple[
     #           RETURN FORMATTED SUBSTITUTION
     # -------------------------------------------------
     response = f"You can substitute **{matched_ing}** with: {sub_text}."
-    return True, response
-
-def handle_step_query(query, recipe_data, curr_idx, speech: bool) -> Tuple[bool, int, str]:
-    """ Handles step navigation queries.
-        Returns (handled: bool, new_curr_idx: int)"""
-    steps = step_manager.get_steps()
-    total_steps = steps[len(steps)-1]["step_number"]
+    return response
+
+def handle_step_query(query, session, speech: bool) -> Tuple[bool, str]:
+    """ Handles step navigation queries; moves session.idx.
+        Returns (handled: bool, output: str)"""
+    steps = session.steps
+    total_steps = session.total_steps
+    curr_idx = session.idx
     handled = False
     output = ""
     
@@ -373,23 +279,13 @@ def handle_step_query(query, recipe_data, curr_idx, speech: bool) -> Tuple[bool,
         if curr_idx < total_steps:
             curr_idx += 1
         else:
-            if speech:
-                output = "You’re already on the last step!"
-                return True, curr_idx, output
-            else:
-                slow_print("You’re already on the last step!")
-                return True, curr_idx, output
+            return True, "You’re already on the last step!"
             
     elif prev_step.search(q):
         if curr_idx > 1:
             curr_idx -= 1
         else:
-            if speech:
-                output = "You’re already on the first step!"
-                return True, curr_idx, output
-            else:
-                slow_print("You’re already on the first step!")
-                return True, curr_idx, output
+            return True, "You’re already on the first step!"
 
     elif first_step.search(q):
         curr_idx = 1
@@ -398,28 +294,132 @@ def handle_step_query(query, recipe_data, curr_idx, speech: bool) -> Tuple[bool,
         pass
     
     else:
-        return False, curr_idx, ""
+        return False, ""
 
-    # Get all entries for this step_number
-    step_entries = step_manager.get_current_step(steps, curr_idx)
+    session.idx = curr_idx
+    output = format_step(session.current_step(), speech)
+    handled = True
+    return handled, output
 
-    step = step_manager.get_current_step(steps, curr_idx)
+def format_step(step, speech: bool) -> str:
     if speech:
-        output += "Step " + str(step['step_number']) + ": " + str(step['description'] + " ")
+        output = "Step " + str(step['step_number']) + ": " + str(step['description'] + " ")
         for note in step["notes"]:
             output += note + "\n"
-    else:
-        word_print("Step", step['step_number'], ":", step['description'])
-        word_print("Notes: \n")
-        for s in step["notes"]:
-            word_print(s, "\n")
-    handled = True
-    return handled, curr_idx, output
-
-def handle_can_i_query(query):
+        return output
+    lines = [f"Step {step['step_number']} : {step['description']}", "Notes:"]
+    lines.extend(step["notes"])
+    return "\n".join(lines)
+
+STEP_SEARCH_PAT = re.compile(
+    r"\b(which|what)\s+step\b|"
+    r"\b(go|take me|jump|skip|bring me)\s+(back\s+)?to\s+(the\s+(step|part)\s+)?(where|with|that)\b|"
+    r"\bwhere\s+(do|did)\s+(i|we)\b", re.I)
+
+def handle_step_search_query(query, session, speech: bool) -> Tuple[bool, str]:
+    """ "which step has the cheese mixture", "go to where I bake it":
+        finds the best matching step and moves session.idx there."""
+    if not STEP_SEARCH_PAT.search(query):
+        return False, ""
+    hits = step_search.get_step_index(session.entry).search(query)
+    if not hits:
+        return True, "I couldn't find a step that matches that."
+    session.idx = hits[0][0] + 1
+    return True, format_step(session.current_step(), speech)
+
+SCHEDULE_PAT = re.compile(r"\b(optimi[sz]ed?|fastest|faster|in parallel|at the same time|schedule|what order)\b", re.I)
+COOKS_PAT = re.compile(r"\b(\d+|one|two|three|four|five)\s+(cooks?|people|persons|burners?)\b", re.I)
+NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+
+def handle_schedule_query(query, session) -> Tuple[bool, str]:
+    """ "what's the fastest way to do this with two cooks": reads out the optimized step order."""
+    if not SCHEDULE_PAT.search(query):
+        return False, ""
+    cooks = 1
+    m = COOKS_PAT.search(query)
+    if m:
+        count = m.group(1).lower()
+        cooks = int(count) if count.isdigit() else NUMBER_WORDS[count]
+    return True, step_graph.describe_schedule(step_graph.get_step_graph(session.entry), cooks)
+
+WHERE_ELSE_PAT = re.compile(r"\bwhere\s+(else\s+)?(is|are|do\s+(i|we)\s+use|does\s+it\s+use)\s+(?P<what>.+?)(\s+used)?\s*\??$", re.I)
+LEFT_PAT = re.compile(r"\bhow\s+(much|many)\s+(?P<what>.*?)\s*(is|are|do\s+i\s+have)?\s*(left|remaining)\b", re.I)
+VAGUE_WHAT_PAT = re.compile(r"^(of\s+)?(it|that|this|them)$", re.I)
+
+def handle_usage_query(query, session) -> Tuple[bool, str]:
+    """ "where else is ricotta used", "how much mozzarella is left", "how much is left to add":
+        answered from the recipe's ingredient <-> step usage index."""
+    where = WHERE_ELSE_PAT.search(query)
+    left = None if where else LEFT_PAT.search(query)
+    if not where and not left:
+        return False, ""
+    if where and not (where.group(1) or where.group(5)):
+        return False, ""  # "where is the oven": not an ingredient-use question
+    what = (where or left).group("what").strip()
+    what = re.sub(r"^(of\s+)?(the\s+)", "", what)
+    if VAGUE_WHAT_PAT.match(what):
+        what = session.context.resolve_ingredient()
+        if not what:
+            return True, "I'm not sure which ingredient you're referring to."
+    index = ingredient_usage.get_usage_index(session.entry)
+    if where:
+        return True, ingredient_usage.where_else(index, session.idx, what)
+    return True, ingredient_usage.how_much_left(index, session.idx, what or None)
+
+START_TIMER_PAT = re.compile(r"\b(start|set)\s+(a|the|my)?\s*timer\b|\btimer\s+for\b", re.I)
+TIME_LEFT_PAT = re.compile(r"\b(time|long)\b.*\b(left|remaining)\b|\btimers?\b.*\b(left|status|running)\b", re.I)
+CANCEL_TIMER_PAT = re.compile(r"\b(cancel|stop|clear)\s+(a|the|my|all)?\s*(the\s+)?timers?\b", re.I)
+TIMER_PAT = re.compile(START_TIMER_PAT.pattern + "|" + TIME_LEFT_PAT.pattern + "|" + CANCEL_TIMER_PAT.pattern, re.I)
+
+def handle_timer_query(query, session) -> Tuple[bool, str]:
+    """ Start / check / cancel kitchen timers for this session. "start the timer"
+        uses the current step's own time unless the query names one."""
+    manager = timers.get_timer_manager()
+
+    if CANCEL_TIMER_PAT.search(query):
+        running = manager.active(session.session_id)
+        if not running:
+            return True, "There are no timers running."
+        if "all" in query.lower().split():
+            manager.cancel_all(session.session_id)
+            return True, f"Cancelled {len(running)} timer" + ("s." if len(running) != 1 else ".")
+        timer = running[-1]  # the one that would go off last, usually the one just started
+        manager.cancel(timer)
+        return True, f"Cancelled the timer for {timer.label}."
+
+    if START_TIMER_PAT.search(query):
+        seconds = parse_duration_seconds(query)
+        label = "your timer"
+        if not seconds:
+            step = session.current_step()
+            seconds = parse_duration_seconds(extract_time(step["description"]).get("duration", ""))
+            label = f"step {step['step_number']}"
+        if not seconds:
+            return True, "This step doesn't give a time. Try 'set a timer for 5 minutes'."
+        manager.start(session.session_id, seconds, label, session.notify)
+        target = "" if label == "your timer" else f" for {label}"
+        return True, f"Started a timer{target}: {timers.format_seconds(seconds)}."
+
+    if TIME_LEFT_PAT.search(query):
+        running = manager.active(session.session_id)
+        if not running:
+            return True, "There are no timers running."
+        return True, "\n".join(f"{t.label}: {timers.format_seconds(t.remaining())} left" for t in running)
+
+    return False, ""
+
+NUTRITION_PAT = re.compile(r"\b(calories|nutrition|nutritional|protein|carbs|how much (does|will) (this|it) cost|cost)\b", re.I)
+
+def handle_nutrition_query(query, session) -> Tuple[bool, str]:
+    if not NUTRITION_PAT.search(query):
+        return False, ""
+    return True, nutrition.describe(nutrition.get_nutrition(session.entry))
+
+def handle_can_i_query(query, session) -> Tuple[bool, str]:
     handled = False
+    output = ""
     q = query.lower().strip()
-    title = recipe_data["title"].lower().strip()
+    title = session.recipe["title"].lower().strip()
     goog_title = title.replace(" ", "+")
     can_i_pat = re.compile(r"can\s+i\s+(.+?)[\?\s]*$")
 
@@ -429,170 +429,170 @@ def handle_can_i_query(query):
         # check culinary dictionary
         definition = culinary_dict.get(action)
         if definition:
-            word_print("Yes, you can", action + ":", definition)
+            output = f"Yes, you can {action}: {definition}"
             handled = True
         else:
-            word_print("Sorry, I couldn't find information about", action)
+            output = f"Sorry, I couldn't find information about {action}"
             handled = True
-    return handled
+    return handled, output
 
-def handle_info_query(query: str, speech: bool, curr_idx: str) -> Tuple[bool, str]:
-    handled = False
-    output = ""
+def describe_term(term: str, speech: bool):
+    """Definition of a term from the culinary dictionary or the tool list, or None."""
+    definition = culinary_dict.get(term)
+    if definition:
+        return term + " means " + definition if speech else f"{term} means: {definition}"
+    if term in cooking_tools:
+        return term + " " + cooking_tools[term] if speech else f"{term} : {cooking_tools[term]}"
+    return None
+
+def search_suggestion(q: str, speech: bool) -> str:
+    if speech:
+        return "Here is a youtube video to help."
+    return "For more information, feel free to try this YouTube search:\n" + make_youtube_search_url(q)
+
+WHAT_IS_PAT = re.compile(r"(what\s+is|what\s+does)\s+(.+?)(?:\s+mean)?[\?\s]*$")
+HOW_DO_PAT = re.compile(r"(how\s+(do|to)\s+(i\s+)?)(.+?)[\?\s]*$")
+
+def handle_definition_query(query: str, session, speech: bool) -> Tuple[bool, str]:
+    """ "what is a skillet", "how do I fold": answered from the culinary dictionary and
+        tool list alone, so the answer is the same for every recipe and step."""
     q = query.lower().strip()
 
     # what is / what does ... mean
-    what_is_pat = re.compile(r"(what\s+is|what\s+does)\s+(.+?)(?:\s+mean)?[\?\s]*$")
-    # how do / how to ...
-    how_do_pat = re.compile(r"(how\s+(do|to)\s+(i\s+)?)(.+?)[\?\s]*$")
-    # how much / how many ...
-    how_much_pat = re.compile(r"(how\s+(much|many)\s+)(.+?)[\?\s]*$")
-
-    # what-is lookup
-    m = what_is_pat.match(q)
+    m = WHAT_IS_PAT.match(q)
     if m:
         term = m.group(2).strip()
-        definition = culinary_dict.get(term)
-        if speech: # Could also move speech check inside the ifs
-            if definition:
-                output = term + " means " + definition
-                return True, output
-            #  check cooking tools
-            elif term in cooking_tools:
-                output = term + " " + cooking_tools[term]
-                return True, output
-            else:
-                output = "Sorry, I couldn't find a definition for " + term
-                return True, output
-        else:
-            if definition:
-                word_print(term, "means:", definition)
-                handled = True
-            #  check cooking tools
-            elif term in cooking_tools:
-                word_print(term, ":", cooking_tools[term])
-                handled = True
-            else:
-                word_print("Sorry, I couldn't find a definition for", term)
-                handled = True
-    
-    
-    # how-to lookup
-    m = how_do_pat.match(q)
+        # culinary dictionary, then cooking tools
+        return True, describe_term(term, speech) or "Sorry, I couldn't find a definition for " + term
+
+    # how do / how to ...
+    m = HOW_DO_PAT.match(q)
     if m:
-        procedure = m.group(4).strip()
-        definition = culinary_dict.get(procedure)
-        if speech: # I mimicked the existing code here, but am unsure of the purpose? Why would procedure ever be in cooking tools? Also, you're youtube searching no matter what?
-            if definition:
-                output = procedure + "means " + definition
-                return True, output
-            # check tools
-            elif procedure in cooking_tools:
-                output = procedure + " " + cooking_tools[procedure]
-                return True, output
-        else:
-            if definition:
-                word_print(procedure, "means:", definition)
-            # check tools
-            elif procedure in cooking_tools:
-                word_print(procedure, ":", cooking_tools[procedure])
+        answer = describe_term(m.group(4).strip(), speech)
+        # speech answers with the definition alone; text also offers a search
+        if answer and speech:
+            return True, answer
+        lines = [answer] if answer else []
+        lines.append(search_suggestion(q, speech))
+        return True, "\n".join(lines)
+
+    return False, ""
+
+def handle_info_query(query: str, speech: bool, session) -> Tuple[bool, str]:
+    lines = []
+    q = query.lower().strip()
+
+    # how much / how many ...
+    how_much_pat = re.compile(r"(how\s+(much|many)\s+)(.+?)[\?\s]*$")
 
     # how-much / how-many lookup
-    if not handled:
-        m = how_much_pat.match(q)
-        #print('how much: ' + m)
-        if m:
-            target = m.group(3).strip()
-            steps = step_manager.get_steps()
-            amount = step_manager.get_current_step(steps, curr_idx)
-            known = False
-            if amount:
-                for ing in amount["ingredients"]:
-                    if ing["name"] == target:
-                        output += "You typically need " + ing["qty"] + " " + ing["unit"] + " of " + target
-                        if not speech:
-                            word_print("You typically need", ing["qty"], ing["unit"], "of", target)
-                        known = True
-                if not known:
-                    word_print("Sorry, I don't know how much", target, "you need.")
-            else:
-                output = "Sorry, I don't know how much", target, "you need."
-                if not speech:
-                    word_print("Sorry, I don't know how much", target, "you need.")
-            handled = True
+    m = how_much_pat.match(q)
+    if m:
+        target = m.group(3).strip()
+        lines.append(ingredient_usage.how_much(ingredient_usage.get_usage_index(session.entry), target))
+        return True, "\n".join(lines)
 
     # Can't find lookup
-    if not handled:
-          yt_query = q.replace(" ", "+")
-          youtube_url = f"https://www.youtube.com/results?search_query={yt_query}"
-          word_print("For more information, feel free to try this YouTube search:")
-          word_print(youtube_url)
-          output += "Here is a youtube video to help."
-          handled = True
-    
-    return handled, output
+    return True, search_suggestion(q, speech)
 
-def handle_temp_query(query, speech: bool):
+def handle_temp_query(query, speech: bool, session):
     handled = False
     q = query.lower().strip()
     temp_pat = re.compile(r"what\s+is\s+the\s+temperature\s+for.*$")
 
     m = temp_pat.match(q)
-    temperature_info = ""
-    if m:
-        temperature_info = step_manager.get_temperature()
-        if not speech:
-            word_print("The temperature information is as follows:")
-            word_print(temperature_info)
-        handled = True
-    return handled, "The temperature is " + temperature_info
-
-def query_handler():
-    slow_print(" Great!")
-    slow_print(" Now, we will begin navigating the recipe! At any point during the experience, you can type 'exit' to quit.")
-    slow_print(" Whenever you're ready, ask 'What is the first step?' to begin.")
-    idx = 1
+    if not m:
+        return handled, ""
+
+    temperature_info = step_manager.get_temperature(session.steps, session.idx)
+    if speech:
+        return True, "The temperature is " + temperature_info
+    return True, "The temperature information is as follows:\n" + temperature_info
+
+# Handler cascade, in priority order: (intent, handler(query, session, speech) -> (handled, output),
+# what the answer depends on for answer_cache: "global", "recipe", "step", "session" or None = not cached)
+QUERY_HANDLERS = [
+    ("step_search", handle_step_search_query, None),
+    ("schedule", lambda q, session, speech: handle_schedule_query(q, session), "recipe"),
+    ("timer", lambda q, session, speech: handle_timer_query(q, session), None),
+    ("usage", lambda q, session, speech: handle_usage_query(q, session), "session"),
+    ("nutrition", lambda q, session, speech: handle_nutrition_query(q, session), "recipe"),
+    ("vague", lambda q, session, speech: handle_vague_query(q, session, speech) if contains_vague_term(q) else (False, ""), "session"),
+    ("temperature", lambda q, session, speech: handle_temp_query(q, speech, session), "step"),
+    ("substitution", handle_substitution_query, "step"),
+    ("navigation", handle_step_query, None),
+    ("definition", handle_definition_query, "global"),
+    ("info", lambda q, session, speech: handle_info_query(q, speech, session), "step"),
+]
+HANDLERS_BY_INTENT = {intent: (handler, scope) for intent, handler, scope in QUERY_HANDLERS}
+
+def route_query(query, session, speech: bool) -> Tuple[str, str]:
+    """
+    Run the handler cascade for one query against a session (navigation
+    moves session.idx). Returns (intent, output); nothing is printed, the
+    caller renders or speaks the output. A query seen before goes straight
+    to the handler that took it last time, and its answer comes from
+    answer_cache when nothing it depends on has changed. Every query is
+    recorded in the event log.
+    """
+    step = session.idx
+    start = time.perf_counter()
+    intent, output, cached = _route(query, session, speech)
+    event_log.record_query(session, query, intent, output, time.perf_counter() - start, step, cached)
+    return intent, output
+
+def _route(query, session, speech):
+    session.refresh()
+    session.context.observe(query)
+    q = answer_cache.normalize_query(query)
+    known = answer_cache.routes.get(q)
+    if known is not None:
+        # only a cached answer may skip the handlers in front of the one that answered before:
+        # in a new context an earlier handler can claim the query
+        cache, key = answer_cache.lookup(HANDLERS_BY_INTENT[known][1], q, session, speech)
+        output = answer_cache.get(cache, key) if cache is not None else None
+        if output is not None:
+            return known, output, True
+
+    for intent, handler, scope in QUERY_HANDLERS:
+        handled, output = handler(q, session, speech)
+        if handled:
+            answer_cache.routes.put(q, intent)
+            cache, key = answer_cache.lookup(scope, q, session, speech)
+            if cache is not None:
+                cache.put(key, output)
+            return intent, output, False
+    return "unknown", "Sorry, I didn't understand that. Please try again.", False
+
+def answer_query(query, session, speech: bool) -> str:
+    return route_query(query, session, speech)[1]
+
+def query_handler(session):
+    render(Response()
+           .add(" Great!", style="char")
+           .add(" Now, we will begin navigating the recipe! At any point during the experience, you can type 'exit' to quit.", style="char")
+           .add(" Whenever you're ready, ask 'What is the first step?' to begin.", style="char"))
     while True:
-        handled = False
         query = input("\n q -- ")
         query = query.strip().lower()
         if query.lower() in ['exit', 'quit']:
-            slow_print("Goodbye! Happy cooking!")
+            render("Goodbye! Happy cooking!")
             break
-        
-        if not handled:
-            if (contains_vague_term(query)):
-                handled, output = handle_vague_query(query, idx, False)
-                print(output)
-
-        if not handled:
-            handled, output = handle_temp_query(query, False)
-        
-        if not handled:
-            handled, output = handle_substitution_query(query, idx, False)
-            print(output)
-
-        if not handled:
-            handled, idx, output = handle_step_query(query, recipe_data, idx, False)
-
-        if not handled:
-            handled, output = handle_info_query(query, False, idx)
-        
-        if not handled:
-            slow_print("Sorry, I didn't understand that. Please try again.")
+
+        render(answer_query(query, session, False))
     
 def main():
     
-    startup_base()
-    slow_print("Would you like to interact with this recipe?")
+    session = startup_base()
+    render("Would you like to interact with this recipe?")
     yes_or_no = input(" y/n : ")
     yes_or_no = yes_or_no.strip()
     if yes_or_no.lower() in ['y', 'yes', 'sure', 'yeah']:
-        query_handler()
+        query_handler(session)
     elif yes_or_no.lower() in ['n', 'no', 'nah', 'nope']:
-        slow_print("Alright! Enjoy your cooking!")
+        render("Alright! Enjoy your cooking!")
     else:
-        print("Invalid input. Please enter 'y' or 'n'.")
+        render("Invalid input. Please enter 'y' or 'n'.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
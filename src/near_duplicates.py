@@ -0,0 +1,341 @@
+"""
+Near-duplicate recipe detection with MinHash and locality-sensitive hashing.
+
+A recipe's shingles are its canonical ingredient names (ingredient_catalog)
+and the word 3-grams of its step text, i.e. the extract_ingredients /
+extract_steps output, before any spaCy parsing. NUM_PERM universal hash
+functions turn the shingle set into a MinHash signature; the fraction of
+equal positions in two signatures estimates their Jaccard similarity.
+
+The signature is cut into BANDS bands of ROWS rows, and each band is a key
+in a hash table. Two recipes become candidates only if some band matches
+exactly, which is likely above ~(1/BANDS)^(1/ROWS) = 0.71 similarity and
+unlikely below it. A lookup therefore touches a few buckets instead of the
+whole library; candidates are then checked against THRESHOLD with their
+full signatures.
+
+recipe_crawler checks every scraped recipe here before it is queued for
+parsing. A duplicate is linked to the recipe it copies (src/library/dedup/
+links.json) or skipped, and either way is never parsed or stored.
+Signatures of stored recipes are kept in src/library/dedup/signatures.npz.
+
+Usage:
+    python3 src/near_duplicates.py                       # near-duplicate groups in the library
+    python3 src/near_duplicates.py --benchmark 20000     # LSH vs brute force on a synthetic corpus
+"""
+import os
+import re
+import json
+import time
+import zlib
+import random
+import argparse
+import threading
+import numpy as np
+import recipe_store
+from ingredient_catalog import canonical_key
+
+DEDUP_DIR = os.path.join(recipe_store.LIBRARY_DIR, "dedup")
+SIGNATURES_FILE = os.path.join(DEDUP_DIR, "signatures.npz")
+LINKS_FILE = os.path.join(DEDUP_DIR, "links.json")
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+THRESHOLD = 0.8       # estimated Jaccard similarity that counts as a duplicate
+SHINGLE_WORDS = 3
+
+_PRIME = np.uint64(4294967291)  # largest prime below 2**32
+_rng = np.random.default_rng(337)
+_A = _rng.integers(1, 2 ** 31, NUM_PERM, dtype=np.uint64)[:, None]
+_B = _rng.integers(0, 2 ** 31, NUM_PERM, dtype=np.uint64)[:, None]
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def shingles(recipe) -> set:
+    """Ingredient keys plus word 3-grams of the steps of a recipe.json-style record."""
+    result = {"i:" + canonical_key(item["name"]) for item in recipe.get("ingredients", [])}
+    for step in recipe.get("steps", []):
+        words = _WORD.findall(step["text"].lower())
+        if len(words) < SHINGLE_WORDS:
+            result.add(" ".join(words))
+        for i in range(len(words) - SHINGLE_WORDS + 1):
+            result.add(" ".join(words[i:i + SHINGLE_WORDS]))
+    return result
+
+
+def signature(shingle_set) -> np.ndarray:
+    """MinHash signature (NUM_PERM uint32 values) of a set of strings."""
+    if not shingle_set:
+        return np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint32)
+    x = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingle_set), dtype=np.uint64,
+                    count=len(shingle_set))
+    # a < 2**31 and x < 2**32, so a * x + b fits in uint64
+    return ((_A * x[None, :] + _B) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def similarity(sig_a, sig_b) -> float:
+    return float(np.count_nonzero(sig_a == sig_b)) / NUM_PERM
+
+
+class LSHIndex:
+    """Recipe id -> MinHash signature, banded for sublinear near-duplicate lookups."""
+
+    def __init__(self, threshold=THRESHOLD):
+        self.threshold = threshold
+        self.ids = []
+        self._matrix = np.empty((1024, NUM_PERM), dtype=np.uint32)  # rows 0..len(ids)-1 are in use
+        self._row = {}                 # recipe id -> row in ids / _matrix
+        self._buckets = [{} for _ in range(BANDS)]
+        self._lock = threading.Lock()
+        self.compared = 0
+
+    def _bands(self, sig):
+        return [sig[b * ROWS:(b + 1) * ROWS].tobytes() for b in range(BANDS)]
+
+    def add(self, recipe_id, sig):
+        with self._lock:
+            self._add(recipe_id, sig)
+
+    def _add(self, recipe_id, sig):
+        if recipe_id in self._row:
+            return
+        row = len(self.ids)
+        if row == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+        self._matrix[row] = sig
+        self._row[recipe_id] = row
+        self.ids.append(recipe_id)
+        for bucket, key in zip(self._buckets, self._bands(sig)):
+            bucket.setdefault(key, []).append(row)
+
+    def query(self, sig):
+        """(recipe id, similarity) of the closest indexed recipe at or above the threshold, or None."""
+        with self._lock:
+            return self._query(sig)
+
+    def _query(self, sig):
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._bands(sig)):
+            candidates.update(bucket.get(key, ()))
+        if not candidates:
+            return None
+        rows = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        self.compared += len(rows)
+        scores = np.count_nonzero(self._matrix[rows] == sig, axis=1) / NUM_PERM
+        best = int(scores.argmax())
+        if scores[best] < self.threshold:
+            return None
+        return self.ids[rows[best]], float(scores[best])
+
+    def remove(self, recipe_id):
+        """Forget a recipe (e.g. its parse or store failed); its row stays allocated but is never matched."""
+        with self._lock:
+            row = self._row.pop(recipe_id, None)
+            if row is None:
+                return
+            for bucket, key in zip(self._buckets, self._bands(self._matrix[row])):
+                rows = bucket.get(key)
+                if rows and row in rows:
+                    rows.remove(row)
+                    if not rows:
+                        del bucket[key]
+            self.ids[row] = None
+
+    def check_and_add(self, recipe_id, sig):
+        """Return the near-duplicate of this recipe if there is one, else index it and return None."""
+        with self._lock:
+            if recipe_id in self._row:
+                return None  # seen before (e.g. its parse failed last run); not a copy of itself
+            match = self._query(sig)
+            if match is None:
+                self._add(recipe_id, sig)
+            return match
+
+    def save(self, path=SIGNATURES_FILE):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._lock:
+            rows = sorted(self._row.values())
+            sigs = self._matrix[rows].copy()
+            ids = np.array([self.ids[row] for row in rows], dtype=str)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp, ids=ids, signatures=sigs, num_perm=NUM_PERM, bands=BANDS)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path=SIGNATURES_FILE, threshold=THRESHOLD):
+        index = cls(threshold)
+        if os.path.exists(path):
+            data = np.load(path)
+            if int(data["num_perm"]) == NUM_PERM and int(data["bands"]) == BANDS:
+                for recipe_id, sig in zip(data["ids"], data["signatures"]):
+                    index._add(str(recipe_id), sig)
+        return index
+
+    def __len__(self):
+        return len(self._row)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self._row
+
+
+class Deduplicator:
+    """
+    The crawler's dedup stage: indexes the library once (signatures are
+    saved, so later runs only sign new recipes) and decides for each
+    scraped recipe whether it is a near-duplicate of one already kept.
+
+    A recipe that passes check() is pending until the crawler reports it
+    stored() or failed(); only stored or pending recipes count as originals,
+    and a failed one is dropped from the index together with the links to it.
+    """
+
+    def __init__(self, store=None, mode="link", threshold=THRESHOLD):
+        self.mode = mode                      # "link", "skip" or "keep"
+        self.store = store or recipe_store.get_store()
+        dedup_dir = os.path.join(self.store.library_dir, os.path.basename(DEDUP_DIR))
+        self.signatures_file = os.path.join(dedup_dir, os.path.basename(SIGNATURES_FILE))
+        self.links_file = os.path.join(dedup_dir, os.path.basename(LINKS_FILE))
+        self.index = LSHIndex.load(self.signatures_file, threshold)
+        self.links = {}
+        if os.path.exists(self.links_file):
+            with open(self.links_file, "r", encoding="utf-8") as f:
+                self.links = json.load(f)
+        self.pending = set()  # passed check(), not stored yet
+        self._lock = threading.Lock()
+        self._index_library()
+
+    def _index_library(self):
+        for recipe_id in self.store.record_ids():
+            if recipe_id not in self.index:
+                self.index.add(recipe_id, signature(shingles(self.store.get_record(recipe_id))))
+
+    def is_known_duplicate(self, recipe_id) -> bool:
+        link = self.links.get(recipe_id)
+        return link is not None and link["original"] in self.store
+
+    def check(self, recipe_id, recipe):
+        """
+        Return (original id, similarity) if the recipe should not be parsed,
+        else None. In "keep" mode duplicates are reported but still parsed.
+        """
+        sig = signature(shingles(recipe))
+        with self._lock:
+            while True:
+                match = self.index.check_and_add(recipe_id, sig)
+                if match is None or match[0] in self.pending or match[0] in self.store:
+                    break
+                self.index.remove(match[0])  # signed, but its recipe was never stored
+            if match is None or self.mode == "keep":
+                self.pending.add(recipe_id)
+                return None
+            if self.mode == "link":
+                self.links[recipe_id] = {"original": match[0], "similarity": round(match[1], 3)}
+        return match
+
+    def stored(self, recipe_ids):
+        with self._lock:
+            self.pending.difference_update(recipe_ids)
+
+    def failed(self, recipe_id):
+        """A recipe that passed check() could not be parsed or stored: it is no one's original."""
+        with self._lock:
+            self.pending.discard(recipe_id)
+            self.index.remove(recipe_id)
+            for dup in [d for d, link in self.links.items() if link["original"] == recipe_id]:
+                del self.links[dup]
+
+    def save(self):
+        self.index.save(self.signatures_file)
+        if self.links or os.path.exists(self.links_file):
+            recipe_store._write_json(self.links_file, self.links)
+
+
+# ------------------------------------------------------------
+# Command line: library report and benchmark
+# ------------------------------------------------------------
+def _synthetic_corpus(base_recipes, n, dup_rate=0.1, seed=0):
+    """n recipes built by shuffling steps and ingredients of the base recipes; dup_rate of them lightly edited copies."""
+    rand = random.Random(seed)
+    pool_steps = [s["text"] for r in base_recipes for s in r["steps"]]
+    pool_ingredients = [i for r in base_recipes for i in r["ingredients"]]
+    words = sorted({w for text in pool_steps for w in text.split()})
+    corpus, truth = [], {}
+    for i in range(n):
+        if corpus and rand.random() < dup_rate:
+            j = rand.randrange(len(corpus))
+            copy = json.loads(json.dumps(corpus[j]))
+            step = rand.choice(copy["steps"])
+            step["text"] = step["text"].replace(rand.choice(step["text"].split()), rand.choice(words), 1)
+            corpus.append(copy)
+            truth[i] = j
+            continue
+        steps = [{"text": " ".join(rand.choice(words) for _ in range(12)) + ". " +
+                          (rand.choice(pool_steps) if rand.random() < 0.3 else "")}
+                 for _ in range(rand.randint(4, 9))]
+        corpus.append({"ingredients": rand.sample(pool_ingredients, min(len(pool_ingredients), rand.randint(5, 12))),
+                       "steps": steps})
+    return corpus, truth
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Find near-duplicate recipes with MinHash/LSH")
+    arg_parser.add_argument("--library", default=recipe_store.LIBRARY_DIR)
+    arg_parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    arg_parser.add_argument("--benchmark", type=int, metavar="N",
+                            help="compare LSH with brute force on N synthetic recipes")
+    args = arg_parser.parse_args()
+
+    store = recipe_store.open_store(args.library)
+    if args.benchmark:
+        base = [store.get_record(recipe_store.LEGACY_ID)]
+        corpus, truth = _synthetic_corpus(base, args.benchmark)
+        start = time.perf_counter()
+        sigs = [signature(shingles(r)) for r in corpus]
+        print(f"signatures: {(time.perf_counter() - start) / len(corpus) * 1e3:.3f} ms per recipe")
+
+        index = LSHIndex(args.threshold)
+        found = {}
+        start = time.perf_counter()
+        for i, sig in enumerate(sigs):
+            match = index.check_and_add(i, sig)
+            if match:
+                found[i] = match[0]
+        lsh_time = time.perf_counter() - start
+
+        sample = range(0, len(sigs), max(1, len(sigs) // 2000))
+        matrix = np.array(sigs)
+        start = time.perf_counter()
+        brute = {}
+        for i in sample:
+            scores = np.count_nonzero(matrix[:i] == sigs[i], axis=1) / NUM_PERM
+            if len(scores) and scores.max() >= args.threshold:
+                brute[i] = int(scores.argmax())
+        brute_time = (time.perf_counter() - start) / len(sample) * len(sigs)
+
+        recall = sum(1 for i in truth if i in found) / max(1, len(truth))
+        false = sum(1 for i in found if i not in truth)
+        agree = sum(1 for i in sample if (i in brute) == (i in found)) / len(sample)
+        print(f"LSH:         {lsh_time:.2f}s for {len(sigs)} recipes, {index.compared / len(sigs):.1f} "
+              f"signature comparisons per recipe")
+        print(f"brute force: {brute_time:.2f}s (extrapolated from {len(sample)} lookups), "
+              f"{len(sigs) / 2:.0f} comparisons per recipe on average")
+        print(f"planted duplicates found: {recall:.1%}; flagged non-planted: {false}; "
+              f"agreement with brute force: {agree:.1%}")
+        return
+
+    index = LSHIndex(args.threshold)
+    groups = {}
+    count = 0
+    for recipe_id, recipe in store.records():
+        count += 1
+        match = index.check_and_add(recipe_id, signature(shingles(recipe)))
+        if match:
+            groups.setdefault(match[0], []).append((recipe_id, match[1]))
+    print(f"{count} recipes, {len(index)} distinct, {count - len(index)} near-duplicates")
+    for original, dups in groups.items():
+        print(f"  {original}: " + ", ".join(f"{d} ({s:.2f})" for d, s in dups))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Managed spaCy pipeline for parse jobs.
+
+The model and the components to disable come from the environment:
+    RECIPE_NLP_MODEL    spaCy package or path   (default: en_core_web_sm)
+    RECIPE_NLP_DISABLE  comma-separated names   (default: ner)
+
+Each worker process keeps one warmed pipeline, plus the Matcher objects
+built from its vocab, so the parser never pays model setup per call.
+Load time and per-doc latency are tracked and printed by report().
+"""
+import os
+import time
+import threading
+import spacy
+from spacy.matcher import Matcher
+
+WARMUP_TEXT = "Preheat the oven to 350 degrees F and stir the sauce over medium heat."
+
+_lock = threading.Lock()
+_nlp = None
+_matcher = None
+_config = {
+    "model": os.environ.get("RECIPE_NLP_MODEL", "en_core_web_sm"),
+    "disable": [c.strip() for c in os.environ.get("RECIPE_NLP_DISABLE", "ner").split(",") if c.strip()],
+}
+_stats = {"load_seconds": 0.0, "warmup_seconds": 0.0, "docs": 0, "parse_seconds": 0.0, "max_parse_seconds": 0.0}
+
+
+def configure(model=None, disable=None):
+    """Switch model/disabled components; the next get_nlp() loads the new pipeline."""
+    global _nlp, _matcher
+    with _lock:
+        if model is not None:
+            _config["model"] = model
+        if disable is not None:
+            _config["disable"] = list(disable)
+        _nlp = None
+        _matcher = None
+
+
+def get_config() -> dict:
+    return {"model": _config["model"], "disable": list(_config["disable"])}
+
+
+def get_nlp():
+    """Return this worker's warmed pipeline, loading it on first use."""
+    global _nlp
+    if _nlp is None:
+        with _lock:
+            if _nlp is None:
+                start = time.perf_counter()
+                nlp = spacy.load(_config["model"], disable=_config["disable"])
+                _stats["load_seconds"] = time.perf_counter() - start
+
+                # First call initialises lazy tables (lemmatizer lookups etc.)
+                start = time.perf_counter()
+                nlp(WARMUP_TEXT)
+                _stats["warmup_seconds"] = time.perf_counter() - start
+                _nlp = nlp
+    return _nlp
+
+
+def warm():
+    """Load and warm the pipeline now (call at worker start-up)."""
+    get_nlp()
+    get_matcher()
+
+
+def get_matcher() -> Matcher:
+    """Return the shared token Matcher, built once per pipeline."""
+    global _matcher
+    if _matcher is None:
+        _matcher = Matcher(get_nlp().vocab)
+    return _matcher
+
+
+def parse(text: str):
+    """Run the pipeline over one text and record its latency."""
+    nlp = get_nlp()
+    start = time.perf_counter()
+    doc = nlp(text)
+    elapsed = time.perf_counter() - start
+    _stats["docs"] += 1
+    _stats["parse_seconds"] += elapsed
+    _stats["max_parse_seconds"] = max(_stats["max_parse_seconds"], elapsed)
+    return doc
+
+
+def get_stats() -> dict:
+    stats = dict(_stats)
+    stats["mean_parse_ms"] = (stats["parse_seconds"] / stats["docs"] * 1000) if stats["docs"] else 0.0
+    return stats
+
+
+def report() -> str:
+    stats = get_stats()
+    disabled = ", ".join(_config["disable"]) or "none"
+    return (f"model {_config['model']} (disabled: {disabled}) "
+            f"loaded in {stats['load_seconds'] * 1000:.0f} ms, warm-up {stats['warmup_seconds'] * 1000:.1f} ms; "
+            f"{stats['docs']} docs, mean {stats['mean_parse_ms']:.2f} ms, "
+            f"max {stats['max_parse_seconds'] * 1000:.2f} ms per doc")
+
+
+if __name__ == "__main__":
+    warm()
+    for _ in range(20):
+        parse("Cook and stir the beef in a large skillet over medium heat until browned, about 10 minutes.")
+    print(report())
@@ -0,0 +1,294 @@
+"""
+Estimated nutrition and cost per recipe from a local reference table
+(src/nutrition_reference.csv: values per 100 g, plus density for volume
+units and weight per piece for counted items).
+
+Ingredient names are fuzzy-matched to the table once per normalized name;
+the matches are cached (and saved next to the library for bulk runs), so
+"salt" is matched once, not once per recipe. Quantities and units are
+parsed once per distinct string. Totals for a whole library are then one
+vectorized gather + scatter-add over every ingredient line at once.
+
+Usage:
+    python3 src/nutrition.py                  # annotate src/library -> src/library/nutrition/recipes.json
+    python3 src/nutrition.py --benchmark 100000
+"""
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import argparse
+import functools
+import numpy as np
+from rapidfuzz import process, fuzz
+import recipe_store
+from parser_1 import normalize_ingredient
+
+REFERENCE_FILE = os.path.join(recipe_store.SRC_DIR, "nutrition_reference.csv")
+NUTRITION_DIR = os.path.join(recipe_store.LIBRARY_DIR, "nutrition")
+MATCH_CACHE_FILE = os.path.join(NUTRITION_DIR, "matches.json")
+OUTPUT_FILE = os.path.join(NUTRITION_DIR, "recipes.json")
+MATCH_THRESHOLD = 85
+FIELDS = ["kcal", "protein_g", "fat_g", "carbs_g", "usd"]
+
+MASS_UNITS = {"pound": 453.6, "lb": 453.6, "ounce": 28.35, "oz": 28.35, "gram": 1.0, "g": 1.0,
+              "kilogram": 1000.0, "kg": 1000.0}
+VOLUME_UNITS = {"cup": 240.0, "tablespoon": 15.0, "tbsp": 15.0, "teaspoon": 5.0, "tsp": 5.0,
+                "milliliter": 1.0, "ml": 1.0, "liter": 1000.0, "l": 1000.0, "pint": 473.0,
+                "quart": 946.0, "gallon": 3785.0, "fluid ounce": 29.6, "pinch": 0.3, "dash": 0.6}
+COUNT_UNITS = {"", "clove", "slice", "large", "medium", "small", "whole", "piece", "stalk", "fillet",
+               "breast", "thigh", "link", "sprig", "head", "bunch"}
+MASS, VOLUME, COUNT, UNKNOWN = 0, 1, 2, 3
+
+_FRACTIONS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅛": 0.125, "⅜": 0.375,
+              "⅝": 0.625, "⅞": 0.875, "⅕": 0.2}
+_NUMBER = re.compile(r"\d+(?:\.\d+)?(?:/\d+)?|[½⅓⅔¼¾⅛⅜⅝⅞⅕]")
+_PACKAGE = re.compile(r"\(\s*([\d.½¼¾⅓⅔/ ]+)\s*(ounce|oz|pound|lb|gram|g|fluid ounce|ml)s?\s*\)", re.I)
+_TASTE = re.compile(r"\b(or )?to taste\b|\boptional\b|\bdivided\b")
+
+
+# ------------------------------------------------------------
+# Reference table
+# ------------------------------------------------------------
+class ReferenceTable:
+    def __init__(self, path=REFERENCE_FILE):
+        with open(path, "r", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        with open(path, "rb") as f:
+            self.digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        self.names = [r["name"] for r in rows]
+        self.keys = [match_key(n) for n in self.names]
+        self.values = np.array([[float(r[c]) for c in FIELDS] for r in rows], dtype=np.float64)  # per 100 g
+        self.g_per_ml = np.array([float(r["g_per_ml"] or 1.0) for r in rows])
+        self.g_each = np.array([float(r["g_each"] or 0.0) for r in rows])
+
+
+def match_key(name: str) -> str:
+    """Normalized form used for matching: no parentheses, "to taste" or plurals."""
+    name = _TASTE.sub("", normalize_ingredient(name)).replace("-", " ")
+    words = []
+    for w in name.split():
+        if w.endswith("oes") or w.endswith("ches"):
+            w = w[:-2]
+        elif w.endswith("s") and not w.endswith("ss") and len(w) > 3:
+            w = w[:-1]
+        words.append(w)
+    return " ".join(words)
+
+
+class Matcher:
+    """Ingredient name -> reference row (or -1), cached per normalized name."""
+
+    def __init__(self, table: ReferenceTable, cache_file=None):
+        self.table = table
+        self.cache_file = cache_file
+        self.cache = {}
+        self._by_name = {}  # raw name -> row, skips re-normalizing repeated names
+        self.lookups = 0
+        if cache_file and os.path.exists(cache_file):
+            with open(cache_file, "r", encoding="utf-8") as f:
+                saved = json.load(f)
+            if saved.get("table") == table.digest:
+                self.cache = saved["matches"]
+
+    def match(self, name: str) -> int:
+        row = self._by_name.get(name)
+        if row is not None:
+            return row
+        key = match_key(name)
+        row = self.cache.get(key)
+        if row is None:
+            self.lookups += 1
+            row = self._fuzzy(key)
+            self.cache[key] = row
+        self._by_name[name] = row
+        return row
+
+    def _fuzzy(self, key) -> int:
+        if not key:
+            return -1
+        candidates = process.extract(key, self.table.keys, scorer=fuzz.token_set_ratio,
+                                     score_cutoff=MATCH_THRESHOLD, limit=5)
+        if not candidates:
+            return -1
+        # several table names can be a full subset of the key ("garlic" / "garlic powder"): prefer the closest
+        best = max(candidates, key=lambda c: (c[1], fuzz.ratio(key, c[0])))
+        return best[2]
+
+    def save(self):
+        if self.cache_file:
+            os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+            recipe_store._write_json(self.cache_file, {"table": self.table.digest, "matches": self.cache})
+
+
+# ------------------------------------------------------------
+# Quantities
+# ------------------------------------------------------------
+@functools.lru_cache(maxsize=4096)
+def parse_qty(qty: str) -> float:
+    """ "1 ½" -> 1.5, "1/2" -> 0.5, "2 to 3" -> 2.0 (first amount of a range); "" -> 0."""
+    total = 0.0
+    for i, token in enumerate(_NUMBER.findall(qty)):
+        if i and not (token in _FRACTIONS or "/" in token):
+            break  # a second whole number starts a range
+        if token in _FRACTIONS:
+            total += _FRACTIONS[token]
+        elif "/" in token:
+            num, den = token.split("/")
+            total += float(num) / float(den) if float(den) else 0.0
+        else:
+            total += float(token)
+    return total
+
+
+@functools.lru_cache(maxsize=4096)
+def parse_unit(unit: str):
+    """Unit string -> (kind, factor): grams per unit for MASS, ml per unit for VOLUME."""
+    package = _PACKAGE.search(unit)
+    if package:
+        amount = parse_qty(package.group(1))
+        size_unit = package.group(2).lower()
+        if size_unit in MASS_UNITS:
+            return MASS, amount * MASS_UNITS[size_unit]
+        return VOLUME, amount * VOLUME_UNITS.get(size_unit, 1.0)
+    u = unit.lower().strip().rstrip(".")
+    if u.endswith("es") and u[:-2] in VOLUME_UNITS:
+        u = u[:-2]
+    elif u.endswith("s") and u not in MASS_UNITS:
+        u = u[:-1]
+    if u in MASS_UNITS:
+        return MASS, MASS_UNITS[u]
+    if u in VOLUME_UNITS:
+        return VOLUME, VOLUME_UNITS[u]
+    if u in COUNT_UNITS:
+        return COUNT, 1.0
+    return UNKNOWN, 0.0
+
+
+# ------------------------------------------------------------
+# Bulk aggregation
+# ------------------------------------------------------------
+def aggregate(recipes, matcher: Matcher):
+    """
+    Totals for many recipes at once. Returns (totals [n_recipes x FIELDS],
+    coverage [n_recipes]: fraction of ingredient lines matched and converted).
+    """
+    recipe_idx, rows, amounts, kinds = [], [], [], []
+    for i, recipe in enumerate(recipes):
+        for item in recipe.get("ingredients", []):
+            # scrapers store None for a missing qty/unit span
+            kind, factor = parse_unit(item.get("unit") or "")
+            recipe_idx.append(i)
+            rows.append(matcher.match(item.get("name") or ""))
+            amounts.append(parse_qty(item.get("qty") or "") * factor)
+            kinds.append(kind)
+
+    table = matcher.table
+    recipe_idx = np.array(recipe_idx, dtype=np.int64)
+    rows = np.array(rows, dtype=np.int64)
+    amounts = np.array(amounts, dtype=np.float64)
+    kinds = np.array(kinds, dtype=np.int8)
+
+    safe_rows = np.where(rows >= 0, rows, 0)
+    grams = np.select([kinds == MASS, kinds == VOLUME, kinds == COUNT],
+                      [amounts, amounts * table.g_per_ml[safe_rows], amounts * table.g_each[safe_rows]], 0.0)
+    known = (rows >= 0) & (grams > 0)
+    grams = np.where(known, grams, 0.0)
+
+    totals = np.zeros((len(recipes), len(FIELDS)))
+    np.add.at(totals, recipe_idx, table.values[safe_rows] * (grams / 100.0)[:, None])
+    lines = np.bincount(recipe_idx, minlength=len(recipes))
+    matched = np.bincount(recipe_idx, weights=known, minlength=len(recipes))
+    coverage = np.divide(matched, lines, out=np.zeros(len(recipes)), where=lines > 0)
+    return totals, coverage
+
+
+def servings(recipe) -> int:
+    m = re.search(r"\d+", str(recipe.get("yield", "")))
+    return max(1, int(m.group())) if m else 1
+
+
+def annotation(recipe, totals, coverage) -> dict:
+    n = servings(recipe)
+    result = {field: round(float(v), 2) for field, v in zip(FIELDS, totals)}
+    result["servings"] = n
+    result["per_serving"] = {field: round(float(v) / n, 2) for field, v in zip(FIELDS, totals)}
+    result["coverage"] = round(float(coverage), 2)
+    return result
+
+
+_matcher = None
+
+
+def get_matcher() -> Matcher:
+    global _matcher
+    if _matcher is None:
+        _matcher = Matcher(ReferenceTable(), MATCH_CACHE_FILE)
+    return _matcher
+
+
+def get_nutrition(entry) -> dict:
+    """Nutrition/cost annotation for one recipe, cached on the store entry."""
+    result = entry.derived.get("nutrition")
+    if result is None:
+        totals, coverage = aggregate([entry.recipe], get_matcher())
+        result = annotation(entry.recipe, totals[0], coverage[0])
+        entry.derived["nutrition"] = result
+    return result
+
+
+def describe(result) -> str:
+    per = result["per_serving"]
+    return (f"Per serving (about {result['servings']}): {per['kcal']:.0f} calories, "
+            f"{per['protein_g']:.0f} g protein, {per['fat_g']:.0f} g fat, {per['carbs_g']:.0f} g carbs, "
+            f"roughly ${per['usd']:.2f}. Whole recipe: about ${result['usd']:.2f}. "
+            f"(Estimated from {result['coverage']:.0%} of the ingredients.)")
+
+
+def load_library(store):
+    ids, recipes = [], []
+    for recipe_id, recipe in store.records():
+        ids.append(recipe_id)
+        recipes.append(recipe)
+    return ids, recipes
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Estimate nutrition and cost for every recipe in the library")
+    arg_parser.add_argument("--library", default=recipe_store.LIBRARY_DIR)
+    arg_parser.add_argument("--benchmark", type=int, metavar="N",
+                            help="time N recipes (cycling through the library) instead of writing results")
+    args = arg_parser.parse_args()
+
+    store = recipe_store.open_store(args.library)
+    ids, recipes = load_library(store)
+    from_library = bool(recipes)
+    if not recipes:
+        ids, recipes = [recipe_store.LEGACY_ID], [store.get_record(recipe_store.LEGACY_ID)]
+
+    matcher = get_matcher()
+    if args.benchmark:
+        recipes = [recipes[i % len(recipes)] for i in range(args.benchmark)]
+    start = time.perf_counter()
+    totals, coverage = aggregate(recipes, matcher)
+    elapsed = time.perf_counter() - start
+    lines = sum(len(r.get("ingredients", [])) for r in recipes)
+    print(f"{len(recipes)} recipes, {lines} ingredient lines in {elapsed:.2f}s; "
+          f"{matcher.lookups} fuzzy lookups, {len(matcher.cache)} cached names")
+    matcher.save()
+    if args.benchmark:
+        return
+
+    results = {rid: annotation(r, t, c) for rid, r, t, c in zip(ids, recipes, totals, coverage)}
+    if from_library:
+        os.makedirs(NUTRITION_DIR, exist_ok=True)
+        recipe_store._write_json(OUTPUT_FILE, results)
+        print(f"wrote {OUTPUT_FILE}")
+    for rid, result in list(results.items())[:5]:
+        print(f"  {rid}: {describe(result)}")
+
+
+if __name__ == "__main__":
+    main()
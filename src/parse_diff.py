@@ -0,0 +1,230 @@
+"""
+Run two parser versions over a recipe corpus and diff their parsed output.
+
+A version is either a git revision (e.g. HEAD~1, main) or a path to a
+checkout containing src/. Each version runs in its own subprocess, from a
+temporary copy of its src/ tree, so their modules never mix and neither
+touches this checkout's src/recipe.json. Run-time data that isn't under
+version control (the built knowledge base in src/kb and the classifier in
+src/library/models) is taken from this checkout for both versions, so
+they parse with the same tool lists and the same model.
+
+Usage:
+    python3 src/parse_diff.py OLD NEW [--corpus DIR_OR_FILE] [--json REPORT]
+
+The report lists per-recipe parse time for both versions and every field
+that changed: steps that became notes (or the reverse), action verbs,
+matched ingredients, tools, time and temperature (including carried-over
+values) and notes.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = os.path.join(SRC_DIR, "library")
+SHARED_DATA = ["kb", os.path.join("library", "models")]  # untracked inputs both versions get from this checkout
+# step_number is left out: it shifts whenever an earlier step becomes a note
+STEP_FIELDS = ["actions", "ingredients", "time", "temperature", "notes"]
+
+
+# ------------------------------------------------------------
+# Running one version (subprocess side)
+# ------------------------------------------------------------
+def run_version(root, corpus_files, out_path):
+    """
+    Parse every corpus record with the parser found in root/src, writing
+    {recipe_id: {"seconds": float, "parsed": [...] or "error": str}} to out_path.
+    Each record goes through root/src/recipe.json so older parsers, which
+    only read that file, can be timed the same way as newer ones.
+    """
+    os.chdir(root)
+    sys.path.insert(0, os.path.join(root, "src"))
+    import recipe_parser
+    try:
+        import nlp_pool
+        nlp_pool.warm()
+    except ImportError:
+        pass  # older versions load the model at import
+
+    results = {}
+    for path in corpus_files:
+        recipe_id = os.path.splitext(os.path.basename(path))[0]
+        shutil.copyfile(path, os.path.join("src", "recipe.json"))
+        start = time.perf_counter()
+        try:
+            parsed = recipe_parser.get_parsed_steps()
+            results[recipe_id] = {"seconds": time.perf_counter() - start, "parsed": parsed}
+        except Exception as e:
+            results[recipe_id] = {"seconds": time.perf_counter() - start, "error": f"{type(e).__name__}: {e}"}
+
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False)
+
+
+# ------------------------------------------------------------
+# Materialising versions
+# ------------------------------------------------------------
+def checkout_version(version, workdir):
+    """
+    Copy the src/ tree of a git revision or checkout path into workdir; return the new root.
+    Both kinds get the same SHARED_DATA, whatever the version itself has.
+    """
+    root = os.path.join(workdir, "root")
+    if os.path.isdir(os.path.join(version, "src")):
+        shutil.copytree(os.path.join(version, "src"), os.path.join(root, "src"),
+                        ignore=shutil.ignore_patterns("__pycache__", "library", "kb", "logs", "*.db"))
+    else:
+        os.makedirs(root)
+        archive = subprocess.run(["git", "archive", version, "src"], check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", root], input=archive, check=True)
+
+    for name in SHARED_DATA:
+        target = os.path.join(root, "src", name)
+        shutil.rmtree(target, ignore_errors=True)
+        if os.path.isdir(os.path.join(SRC_DIR, name)):
+            shutil.copytree(os.path.join(SRC_DIR, name), target)
+    return root
+
+
+def collect_corpus(corpus):
+    if os.path.isfile(corpus):
+        return [os.path.abspath(corpus)]
+    return sorted(os.path.abspath(os.path.join(corpus, name)) for name in os.listdir(corpus)
+                  if name.endswith(".json") and not name.startswith("reprocess_checkpoint"))
+
+
+def parse_with(version, corpus_files):
+    """Run one version over the corpus in a subprocess and return its results."""
+    with tempfile.TemporaryDirectory() as workdir:
+        root = checkout_version(version, workdir)
+        out_path = os.path.join(workdir, "out.json")
+        subprocess.run([sys.executable, os.path.abspath(__file__), "--run", root, out_path, *corpus_files],
+                       check=True)
+        with open(out_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+# ------------------------------------------------------------
+# Diffing
+# ------------------------------------------------------------
+def summarize_step(step):
+    """Reduce a parsed step to the fields we compare, in a stable form."""
+    return {
+        "actions": [(a.get("verb"), sorted(a.get("ingredients", [])), a.get("tool")) for a in step.get("actions", [])],
+        "ingredients": sorted(i.get("name") for i in step.get("ingredients", [])),
+        "time": step.get("time", {}),
+        "temperature": step.get("temperature", {}),
+        "notes": step.get("notes", []),
+    }
+
+
+def key_steps(steps):
+    """{(description, occurrence): step}, so repeated descriptions ("Stir.") stay apart."""
+    keyed, seen = {}, {}
+    for step in steps:
+        desc = step.get("description")
+        seen[desc] = seen.get(desc, 0) + 1
+        keyed[(desc, seen[desc] - 1)] = step
+    return keyed
+
+
+def diff_recipe(old, new):
+    """Return a list of {substep, field, old, new} differences between two parsed recipes."""
+    old_steps = key_steps(old)
+    new_steps = key_steps(new)
+    diffs = []
+
+    # Steps only on one side were classified actionable by one version and a note by the other
+    for key in old_steps.keys() - new_steps.keys():
+        diffs.append({"substep": old_steps[key].get("substep_number"), "field": "actionable",
+                      "old": True, "new": False, "description": key[0]})
+    for key in new_steps.keys() - old_steps.keys():
+        diffs.append({"substep": new_steps[key].get("substep_number"), "field": "actionable",
+                      "old": False, "new": True, "description": key[0]})
+
+    for key in old_steps.keys() & new_steps.keys():
+        a = summarize_step(old_steps[key])
+        b = summarize_step(new_steps[key])
+        for field in STEP_FIELDS:
+            if a[field] != b[field]:
+                diffs.append({"substep": new_steps[key].get("substep_number"), "field": field,
+                              "old": a[field], "new": b[field], "description": key[0]})
+
+    diffs.sort(key=lambda d: (str(d["substep"]), d["field"]))
+    return diffs
+
+
+def compare(old_results, new_results):
+    report = {"recipes": {}, "fields": {}, "old_seconds": 0.0, "new_seconds": 0.0}
+    for recipe_id in sorted(old_results.keys() | new_results.keys()):
+        old = old_results.get(recipe_id, {"error": "missing"})
+        new = new_results.get(recipe_id, {"error": "missing"})
+        entry = {"old_seconds": old.get("seconds"), "new_seconds": new.get("seconds")}
+        if "error" in old or "error" in new:
+            entry["errors"] = {"old": old.get("error"), "new": new.get("error")}
+        else:
+            entry["diffs"] = diff_recipe(old["parsed"], new["parsed"])
+            for d in entry["diffs"]:
+                report["fields"][d["field"]] = report["fields"].get(d["field"], 0) + 1
+            report["old_seconds"] += old["seconds"]
+            report["new_seconds"] += new["seconds"]
+        report["recipes"][recipe_id] = entry
+    return report
+
+
+def print_report(report, old_label, new_label):
+    print(f"{'recipe':<40} {old_label[:10]:>10} {new_label[:10]:>10} {'delta':>9}  changes")
+    for recipe_id, entry in report["recipes"].items():
+        if "errors" in entry:
+            print(f"{recipe_id[:40]:<40} error: {entry['errors']}")
+            continue
+        old_s, new_s = entry["old_seconds"], entry["new_seconds"]
+        delta = (new_s - old_s) / old_s * 100 if old_s else 0.0
+        print(f"{recipe_id[:40]:<40} {old_s * 1000:>8.1f}ms {new_s * 1000:>8.1f}ms {delta:>+8.1f}%  {len(entry['diffs'])}")
+        for d in entry["diffs"]:
+            print(f"    {d['substep']} {d['field']}: {d['old']} -> {d['new']}")
+
+    old_total, new_total = report["old_seconds"], report["new_seconds"]
+    print(f"\ntotal parse time {old_total:.2f}s -> {new_total:.2f}s"
+          + (f" ({(new_total - old_total) / old_total * 100:+.1f}%)" if old_total else ""))
+    if report["fields"]:
+        print("changed fields: " + ", ".join(f"{k} x{v}" for k, v in sorted(report["fields"].items())))
+    else:
+        print("no semantic differences")
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "--run":
+        run_version(sys.argv[2], sys.argv[4:], sys.argv[3])
+        return
+
+    arg_parser = argparse.ArgumentParser(description="Diff parser output between two versions")
+    arg_parser.add_argument("old", help="git revision or checkout path")
+    arg_parser.add_argument("new", help="git revision or checkout path ('.' for the working tree)")
+    arg_parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="recipe record or directory of records")
+    arg_parser.add_argument("--json", help="also write the full report here")
+    args = arg_parser.parse_args()
+
+    corpus_files = collect_corpus(args.corpus)
+    if not corpus_files:
+        print(f"No recipe records found in {args.corpus}")
+        sys.exit(1)
+
+    old_results = parse_with(args.old, corpus_files)
+    new_results = parse_with(args.new, corpus_files)
+    report = compare(old_results, new_results)
+    print_report(report, args.old, args.new)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()
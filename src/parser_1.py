@@ -16,12 +16,17 @@
 """
 import json
 import re
+import functools
 from typing import List, Dict
-import spacy
-from spacy.matcher import Matcher
 from rapidfuzz import fuzz
-
-nlp = spacy.load("en_core_web_sm")
+from spacy.matcher import PhraseMatcher
+from spacy.tokens import Span
+from spacy.util import filter_spans
+import os
+import nlp_pool
+import resources
+import recipe_store
+import actionable_classifier
 
 COOKING_VERBS = ["mix", "bake", "grill", "stir", "preheat", "add", "chop",
                  "saute", "boil", "fry", "sprinkle", "layer", "remove",
@@ -37,8 +42,22 @@ NON_ACTIONABLE_PATTERNS = [ #includes patterns for observation, warning, and adv
     "as it", "it will", "it should"
 ]
 
+COMMON_METHODS = [
+    "bake", "boil", "simmer", "fry", "stir", "mix", "blend", "chop",
+    "saute", "roast", "grill", "whisk", "knead", "marinate", "sear",
+    "preheat", "steam", "broil"
+]
+
+# "classifier": check_actionable asks actionable_classifier first; "parse": spaCy rules only
+ACTIONABLE_MODE = os.environ.get("RECIPE_ACTIONABLE", "classifier")
+
+# Minimum rapidfuzz partial_ratio for an ingredient to count as mentioned
+INGREDIENT_MATCH_THRESHOLD = 70
+
 ingredient_set = {}
 
+_term_matchers = {}
+
 
 def load_list_from_file(filepath: str) -> List[str]:
     """Load items (ingredients or tools) from a text file."""
@@ -59,26 +78,66 @@ def extract_ingredients(step: str, ingredient_data: List[Dict]) -> List[Dict]:
     for ing in ingredient_data:
         ing_name_norm = normalize_ingredient(ing)
         score = fuzz.partial_ratio(ing_name_norm, step_lower)
-        if score >= 70:
+        if score >= INGREDIENT_MATCH_THRESHOLD:
             results.append(ing)
     return results
 
 
-def extract_tools(step: str, tools: List[str]) -> List[str]:
+def get_term_matcher(tools: List[str]) -> PhraseMatcher:
+    """
+    Return a PhraseMatcher over the given tools, the tools in
+    common_cooking_tools.txt and COMMON_METHODS, built once per tool list.
+
+    Matching is token-level on lowercase text, so "pan" no longer hits
+    "pancake", and every term is found in a single pass over the step.
+    Match ids are "TOOL:<term>" / "METHOD:<term>".
+    """
+    key = tuple(tools)
+    matcher = _term_matchers.get(key)
+    if matcher is not None:
+        return matcher
+
+    nlp = nlp_pool.get_nlp()
+    matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+    tool_names = dict.fromkeys(list(tools) + list(resources.get_cooking_tools()))
+    for tool in tool_names:
+        variants = [tool] if tool.endswith("s") else [tool, tool + "s"]
+        matcher.add("TOOL:" + tool, list(nlp.tokenizer.pipe(variants)))
+    for method in COMMON_METHODS:
+        matcher.add("METHOD:" + method, [nlp.make_doc(method)])
+
+    _term_matchers[key] = matcher
+    return matcher
+
+
+def match_terms(step, tools: List[str]) -> Dict[str, List[str]]:
+    """
+    Return {"TOOL": [...], "METHOD": [...]} for a step (text or spaCy Doc),
+    in order of appearance. When tool matches overlap, the longest
+    one wins.
+    """
+    doc = nlp_pool.get_nlp().make_doc(step) if isinstance(step, str) else step
+    strings = doc.vocab.strings
+
+    spans = {"TOOL": [], "METHOD": []}
+    for match_id, start, end in get_term_matcher(tools)(doc):
+        label, term = strings[match_id].split(":", 1)
+        spans[label].append(Span(doc, start, end, label=term))
+
+    found = {}
+    for label, label_spans in spans.items():
+        found[label] = list(dict.fromkeys(span.label_ for span in filter_spans(label_spans)))
+    return found
+
+
+def extract_tools(step, tools: List[str]) -> List[str]:
     """Return list of tools mentioned in the step."""
-    step_lower = step.lower()
-    return [t for t in tools if t in step_lower]
+    return match_terms(step, tools)["TOOL"]
 
 
-def extract_methods(step: str) -> List[str]:
+def extract_methods(step, tools: List[str] = ()) -> List[str]:
     """Extract common cooking methods."""
-    common_methods = [
-        "bake", "boil", "simmer", "fry", "stir", "mix", "blend", "chop",
-        "saute", "roast", "grill", "whisk", "knead", "marinate", "sear",
-        "preheat", "steam", "broil"
-    ]
-    step_lower = step.lower()
-    return [m for m in common_methods if re.search(rf"\b{m}\b", step_lower)]
+    return match_terms(step, tools)["METHOD"]
 
 
 def extract_time(step: str) -> Dict:
@@ -91,6 +150,25 @@ def extract_time(step: str) -> Dict:
     return {}
 
 
+_DURATION_UNITS = {"second": 1, "minute": 60, "hour": 3600}
+_DURATION_PART = re.compile(r'(\d+(?:\s+\d+/\d+)?|\d+/\d+|\d+\.\d+)\s*(seconds?|minutes?|hours?)')
+
+
+def parse_duration_seconds(duration: str) -> int:
+    """Total seconds in an extract_time duration string, e.g. "20 minutes, 5 minutes" -> 1500."""
+    total = 0.0
+    for amount, unit in _DURATION_PART.findall(duration.lower()):
+        value = 0.0
+        for part in amount.split():
+            if "/" in part:
+                num, den = part.split("/")
+                value += int(num) / int(den)
+            else:
+                value += float(part)
+        total += value * _DURATION_UNITS[unit.rstrip("s")]
+    return int(round(total))
+
+
 def extract_temperature(step: str, ingredients: List[str]) -> Dict:
     """Extract temperature info (oven or ingredient-specific)."""
     temp_pattern = re.compile(r'(\d{2,3})\s*(?:°|degrees)\s*[cf]', re.IGNORECASE)
@@ -135,25 +213,30 @@ def extract_temperature(step: str, ingredients: List[str]) -> Dict:
 
     return result
 
-def get_ingredient_amounts(ingredients):
-    final = []
-    with open("src/recipe.json", "r") as f:
-        ingredients_data = json.load(f)["ingredients"]
-    for ing_data in ingredients_data:
-        if ing_data["name"] in ingredients:
-            final.append(ing_data)
-    return final
+def get_ingredient_amounts(ingredients, ingredients_data=None):
+    """
+    Return the {qty, unit, name} dicts for the given ingredient names.
+    ingredients_data is the recipe's ingredient list; pass it in when parsing many
+    steps (recipe_parser does). If omitted, the current recipe is read from the
+    recipe store, fresh on every call.
+    """
+    if ingredients_data is None:
+        ingredients_data = recipe_store.get_store().get_record(recipe_store.LEGACY_ID)["ingredients"]
+    wanted = set(ingredients)
+    return [ing_data for ing_data in ingredients_data if ing_data["name"] in wanted]
 
-def parse_step(step_number: int, step: str, ingredients: List[str], tools: List[str]) -> Dict:
+def parse_step(step_number: int, step: str, ingredients: List[str], tools: List[str], ingredients_data: List[Dict] = None) -> Dict:
     """Parse a single recipe step into a structured dict."""
+    doc = nlp_pool.parse(step.strip())
     step_ingredients = extract_ingredients(step, ingredients)
-    step_tools = extract_tools(step, tools)
-    methods = extract_methods(step)
+    terms = match_terms(doc, tools)
+    step_tools = terms["TOOL"]
+    methods = terms["METHOD"]
     time_info = extract_time(step)
     temp_info = extract_temperature(step, step_ingredients)
 
     # add structured action tags using spaCy
-    actions = extract_actions_rule_based(step, ingredients, COOKING_VERBS, step_tools)
+    actions = extract_actions_rule_based(step, ingredients, COOKING_VERBS, step_tools, doc=doc)
 
     return {
         "step_number": step_number,
@@ -161,20 +244,25 @@ def parse_step(step_number: int, step: str, ingredients: List[str], tools: List[
         "actions": actions,
         "time": time_info if time_info else {},
         "temperature": temp_info if temp_info else {},
-        "actionable": check_actionable(step),
+        "actionable": check_actionable(step, doc=doc),
         "notes": [],
-        "ingredients": get_ingredient_amounts(step_ingredients)
+        "ingredients": get_ingredient_amounts(step_ingredients, ingredients_data)
     }
 
 
-def extract_actions_rule_based(text, ingredients, cooking_verbs, tools_list):
-    matcher = Matcher(nlp.vocab)
-    doc = nlp(text)
+def extract_actions_rule_based(text, ingredients, cooking_verbs, tools_list, doc=None):
+    """
+    tools_list is the step's tools (from match_terms), so no second scan is
+    needed here. Pass doc to reuse an existing parse of text.
+    """
+    matcher = nlp_pool.get_matcher()
+    if doc is None:
+        doc = nlp_pool.parse(text)
     actions = []
     # print(matcher(doc))
     
     ingredients_found = find_ingredients_in_text(text, ingredients, matcher)
-    tools_found = [tool for tool in tools_list if tool in text.lower()]
+    tools_found = tools_list
 
     for token in doc:
         verb_lemma = token.lemma_.lower()
@@ -187,7 +275,9 @@ def extract_actions_rule_based(text, ingredients, cooking_verbs, tools_list):
 
     return actions
 
+@functools.lru_cache(maxsize=16384)
 def normalize_ingredient(name: str) -> str:
+    # Cached: every step of a recipe normalizes the same ingredient names again
     # Lowercase
     name = name.lower()
     # Remove things like "shredded", "chopped", "(16 ounce) package", "or to taste"
@@ -211,7 +301,7 @@ def find_ingredients_in_text(text, ingredients, matcher):
         # Fuzzy match the ingredient against the step text
         score = fuzz.partial_ratio(ingredient_lower, step_lower)
 
-        if score >= 70:
+        if score >= INGREDIENT_MATCH_THRESHOLD:
             matches.append((ingredient, score))
             # print(ingredient + " " + str(score))
 
@@ -234,16 +324,29 @@ def find_ingredients_in_text(text, ingredients, matcher):
     #     # matcher.add(text_lower, [pattern])
     # return found
 
-def parse_step_main(step, tools, ingredients):
-    parsed = parse_step(1, step, ingredients, tools)
+def parse_step_main(step, tools, ingredients, ingredients_data=None):
+    parsed = parse_step(1, step, ingredients, tools, ingredients_data)
     #print(json.dumps(parsed, indent=4))
     return parsed
 
-def check_actionable(step: str) -> bool:
+def check_actionable(step: str, doc=None) -> bool:
+    """
+    Classify a recipe step. The trained classifier answers when it is
+    confident; otherwise (or with RECIPE_ACTIONABLE=parse) the spaCy rules
+    below decide. Pass doc to reuse an existing parse of the step.
+    """
+    if ACTIONABLE_MODE == "classifier":
+        decision = actionable_classifier.classify(step)
+        if decision is not None:
+            return decision
+    if doc is None:
+        doc = nlp_pool.parse(step.strip())
+    return check_actionable_rules(step, doc)
+
+def check_actionable_rules(step: str, doc) -> bool:
     """
     Classify a recipe step using spaCy, with fallback = actionable.
     """
-    doc = nlp(step.strip())
     lower = step.lower().strip()
 
     # --- 1) Non-actionable pattern detection ---
@@ -283,14 +386,14 @@ def main():
     # tools_file = sys.argv[2]
     # step_sentence = sys.argv[3]
 
-    with open("src/recipe.json", "r") as f:
+    with open(os.path.join(resources.SRC_DIR, "recipe.json"), "r") as f:
         data = json.load(f)
 
     ingredients = [item["name"] for item in data["ingredients"]]
     # print("*********ingredients:", ingredients)
 
     # #ingredients = load_list_from_file(ingredients_file)
-    tools_file = 'src/tools.txt'
+    tools_file = os.path.join(resources.SRC_DIR, 'tools.txt')
     tools = load_list_from_file(tools_file)
 
     # parsed = parse_step(1, step_sentence, ingredients, tools)
@@ -317,7 +420,7 @@ def main():
     for step in testing_steps:
         actionable = check_actionable(step)
         if (actionable):
-            parse_step_main(step, tools, ingredients)
+            parse_step_main(step, tools, ingredients, data["ingredients"])
         else:
             print(step + ": Non-actionable step, probably want to append to the previous step in a 'non-actionable' line\n")
 
@@ -0,0 +1,130 @@
+"""
+Pre-forking worker mode: load the read-only resources (spaCy model,
+culinary dictionary, cooking tools, substitutions) once in the parent,
+then fork the query/parse workers so they share those pages copy-on-write.
+
+Run `python3 src/prefork.py --workers 4` to compare per-worker memory with
+and without the shared preload.
+"""
+import os
+import sys
+import argparse
+import resources
+
+SAMPLE_STEP = "Preheat the oven to 350 degrees F (175 degrees C)."
+
+
+def read_memory() -> dict:
+    """
+    Return this process's memory in kB: rss, pss (rss with shared pages split
+    between the processes mapping them) and private (pages only we hold).
+    """
+    mem = {"rss": 0, "pss": 0, "private": 0}
+    try:
+        with open("/proc/self/smaps_rollup", "r") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                value = rest.split()
+                if not value or not value[0].isdigit():
+                    continue
+                kb = int(value[0])
+                if key == "Rss":
+                    mem["rss"] = kb
+                elif key == "Pss":
+                    mem["pss"] = kb
+                elif key in ("Private_Clean", "Private_Dirty"):
+                    mem["private"] += kb
+    except FileNotFoundError:
+        # Not Linux: max RSS is the best we have (kB on Linux, bytes on macOS)
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        mem["rss"] = rss // 1024 if sys.platform == "darwin" else rss
+    return mem
+
+
+def serve(worker, workers=4, preload=True, use_nlp=True):
+    """
+    Fork `workers` children that each run worker(index) and exit.
+    With preload=True the shared resources are loaded in this (parent)
+    process before forking. Returns the list of child pids.
+    """
+    if preload:
+        resources.preload(nlp=use_nlp)
+
+    pids = []
+    for i in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                worker(i)
+            except Exception as e:
+                print(f"worker {i} failed: {e}", file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        pids.append(pid)
+    return pids
+
+
+def wait_all(pids):
+    for pid in pids:
+        os.waitpid(pid, 0)
+
+
+def measure(workers=4, preload=True, use_nlp=True) -> list:
+    """Run `workers` sample workers and return the memory each one reported."""
+    read_fd, write_fd = os.pipe()
+
+    def worker(i):
+        os.close(read_fd)
+        # Touch every resource the way the query and parse paths do
+        if use_nlp:
+            resources.get_nlp()(SAMPLE_STEP)
+        resources.get_substitutions()
+        resources.get_culinary_dict()
+        resources.get_cooking_tools()
+        mem = read_memory()
+        os.write(write_fd, f"{mem['rss']} {mem['pss']} {mem['private']}\n".encode())
+
+    pids = serve(worker, workers, preload, use_nlp)
+    os.close(write_fd)
+    with os.fdopen(read_fd, "r") as f:
+        lines = f.read().split("\n")
+    wait_all(pids)
+
+    results = []
+    for line in lines:
+        if line.strip():
+            rss, pss, private = (int(v) for v in line.split())
+            results.append({"rss": rss, "pss": pss, "private": private})
+    return results
+
+
+def _report(label, results):
+    n = max(len(results), 1)
+    rss = sum(r["rss"] for r in results) / n
+    pss = sum(r["pss"] for r in results) / n
+    private = sum(r["private"] for r in results) / n
+    print(f"{label:<22} {rss / 1024:>10.1f} {pss / 1024:>10.1f} {private / 1024:>12.1f}")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Per-worker memory with and without preloading")
+    arg_parser.add_argument("--workers", type=int, default=4)
+    arg_parser.add_argument("--no-nlp", action="store_true", help="skip the spaCy model")
+    args = arg_parser.parse_args()
+    use_nlp = not args.no_nlp
+
+    # "before" has to run first: once the parent preloads, it can't unload
+    before = measure(args.workers, preload=False, use_nlp=use_nlp)
+    after = measure(args.workers, preload=True, use_nlp=use_nlp)
+
+    print(f"{args.workers} workers, averages per worker (MB)")
+    print(f"{'mode':<22} {'RSS':>10} {'PSS':>10} {'private':>12}")
+    _report("load in each worker", before)
+    _report("preload + fork (COW)", after)
+
+
+if __name__ == "__main__":
+    main()
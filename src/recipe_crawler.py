@@ -0,0 +1,335 @@
+"""
+Crawl recipe category pages or sitemaps, discover recipe urls and feed
+them through scrape -> parse -> recipe store as a streaming pipeline.
+Which urls are recipes or categories, and how a page is extracted, comes
+from the site adapter for each url's host (site_adapters.py), so seeds
+from several sites can be crawled in one run.
+
+    discovery (1 thread)   walks sitemaps / category pages breadth-first
+       | recipe_queue
+    scrapers (N threads)   fetch + extract each recipe page, drop near-duplicates
+       | parse_queue
+    parsers (M threads)    get_parsed_steps, then RecipeStore.put; ingredient
+                           names are added to the ingredient catalog
+
+Recipe urls are normalized before de-duplication (print= added by
+fetch_soup, tracking params, fragments and trailing slashes are dropped),
+and recipes already in the store are skipped. Every request to a host
+waits for that host's rate limit, and urls the host's robots.txt disallows
+are never fetched (a missing robots.txt allows everything). Scraped recipes that are near-duplicates
+of one already in the library (near_duplicates.py) are linked to it (or,
+with --duplicates skip, just dropped) instead of being parsed and stored.
+
+Usage:
+    python3 src/recipe_crawler.py SEED [SEED ...] [--max-recipes N] [--delay S]
+    python3 src/recipe_crawler.py --mirror DIR sitemap.xml   # serve DIR locally, seeds relative to it
+"""
+import re
+import sys
+import time
+import queue
+import argparse
+import threading
+import functools
+import http.server
+from urllib import robotparser
+from urllib.parse import urlsplit, urlunsplit, urljoin, parse_qsl, urlencode
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+import nlp_pool
+import ingredient_catalog
+import near_duplicates
+import recipe_parser
+import recipe_scraper
+import recipe_store
+import site_adapters
+
+DROP_PARAMS = {"print"}
+DROP_PARAM_PREFIXES = ("utm_",)
+_LOC = re.compile(r"<loc>\s*([^<\s]+)\s*</loc>", re.I)
+STORE_BATCH = 16  # parsed recipes saved per store.put_many (one transaction with RECIPE_DB)
+_DONE = object()
+
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a url for de-duplication."""
+    parts = urlsplit(url.strip())
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+             if k not in DROP_PARAMS and not k.startswith(DROP_PARAM_PREFIXES)]
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(sorted(query)), ""))
+
+
+def is_recipe_url(url: str) -> bool:
+    return site_adapters.adapter_for(url).is_recipe_url(url)
+
+
+def is_category_url(url: str) -> bool:
+    return site_adapters.adapter_for(url).is_category_url(url)
+
+
+def is_sitemap(url: str, text: str) -> bool:
+    head = text.lstrip()[:200].lower()
+    return url.lower().endswith(".xml") or "<urlset" in head or "<sitemapindex" in head
+
+
+class HostRateLimiter:
+    """Keeps at least `delay` seconds between requests to the same host."""
+
+    def __init__(self, delay: float):
+        self.delay = delay
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.delay
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Crawler:
+    def __init__(self, seeds, store=None, delay=1.0, max_pages=200, max_recipes=None,
+                 scrapers=4, parsers=1, same_host=True, duplicates="link"):
+        self.seeds = [normalize_url(s) for s in seeds]
+        self.hosts = {urlsplit(s).netloc for s in self.seeds}
+        self.same_host = same_host
+        self.store = store or recipe_store.get_store()
+        self.limiter = HostRateLimiter(delay)
+        self.max_pages = max_pages
+        self.max_recipes = max_recipes
+        self.scrapers = scrapers
+        self.parsers = parsers
+        self.dedup = near_duplicates.Deduplicator(self.store, duplicates)
+
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=max(scrapers, 4))
+        self.http.mount("http://", adapter)
+        self.http.mount("https://", adapter)
+
+        self.recipe_queue = queue.Queue(maxsize=scrapers * 4)
+        self.parse_queue = queue.Queue(maxsize=parsers * 4)
+        self.seen_recipes = set()
+        self.robots = {}  # host -> RobotFileParser
+        self._robots_lock = threading.Lock()
+        self.stats = {"pages": 0, "discovered": 0, "skipped": 0, "blocked": 0, "scraped": 0, "duplicates": 0,
+                      "stored": 0, "failed": 0}
+        self._stats_lock = threading.Lock()
+
+    def _count(self, key, n=1):
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _get(self, url) -> str:
+        self.limiter.wait(url)
+        resp = self.http.get(url, timeout=20)
+        resp.raise_for_status()
+        return resp.text
+
+    def allowed(self, url) -> bool:
+        """Whether the host's robots.txt (fetched once per host) lets us fetch url."""
+        parts = urlsplit(url)
+        with self._robots_lock:
+            rules = self.robots.get(parts.netloc)
+            if rules is None:
+                rules = robotparser.RobotFileParser()
+                try:
+                    rules.parse(self._get(f"{parts.scheme}://{parts.netloc}/robots.txt").splitlines())
+                except requests.RequestException:
+                    rules.allow_all = True
+                self.robots[parts.netloc] = rules
+        return rules.can_fetch(self.http.headers["User-Agent"], url)
+
+    # ---------------- discovery ----------------
+    def discover(self):
+        """Breadth-first walk of sitemaps / category pages, queueing new recipe urls."""
+        frontier = list(self.seeds)
+        visited = set()
+        try:
+            while frontier and self.stats["pages"] < self.max_pages:
+                url = frontier.pop(0)
+                if url in visited:
+                    continue
+                visited.add(url)
+                if is_recipe_url(url):
+                    self._queue_recipe(url)
+                    continue
+                if not self.allowed(url):
+                    self._count("blocked")
+                    continue
+                try:
+                    text = self._get(url)
+                except requests.RequestException as e:
+                    print(f"  could not fetch {url}: {e}", file=sys.stderr)
+                    continue
+                self._count("pages")
+
+                if is_sitemap(url, text):
+                    links = [urljoin(url, loc) for loc in _LOC.findall(text)]
+                else:
+                    soup = BeautifulSoup(text, "html.parser")
+                    links = [urljoin(url, a["href"]) for a in soup.find_all("a", href=True)]
+
+                for link in links:
+                    link = normalize_url(link)
+                    if self.same_host and urlsplit(link).netloc not in self.hosts:
+                        continue
+                    if is_recipe_url(link):
+                        if not self._queue_recipe(link):
+                            return
+                    elif link not in visited and (is_category_url(link) or link.endswith(".xml")):
+                        frontier.append(link)
+        finally:
+            for _ in range(self.scrapers):
+                self.recipe_queue.put(_DONE)
+
+    def _queue_recipe(self, url) -> bool:
+        """Queue a recipe url unless seen; returns False once max_recipes is reached."""
+        if url in self.seen_recipes:
+            return True
+        if self.max_recipes is not None and len(self.seen_recipes) >= self.max_recipes:
+            return False
+        self.seen_recipes.add(url)
+        self._count("discovered")
+        if not self.allowed(url):
+            self._count("blocked")
+            return True
+        recipe_id = recipe_store.recipe_id_for_url(url)
+        if recipe_id in self.store or self.dedup.is_known_duplicate(recipe_id):
+            self._count("skipped")
+            return True
+        self.recipe_queue.put(url)
+        return True
+
+    # ---------------- pipeline stages ----------------
+    def scrape_worker(self):
+        while True:
+            url = self.recipe_queue.get()
+            if url is _DONE:
+                return
+            try:
+                self.limiter.wait(url)
+                data = recipe_scraper.scrape(url, self.http)
+            except Exception as e:
+                self._count("failed")
+                print(f"  scrape failed {url}: {e}", file=sys.stderr)
+                continue
+            if not data["steps"]:
+                self._count("failed")
+                print(f"  no steps found at {url}", file=sys.stderr)
+                continue
+            self._count("scraped")
+            match = self.dedup.check(recipe_store.recipe_id_for_url(url), data)
+            if match:
+                self._count("duplicates")
+                print(f"  {url} is a near-duplicate of {match[0]} ({match[1]:.2f})", file=sys.stderr)
+                continue
+            self.parse_queue.put((url, data))
+
+    def parse_worker(self):
+        tools = recipe_parser.load_tools()
+        batch = []
+        while True:
+            item = self.parse_queue.get()
+            if item is _DONE:
+                self._store(batch)
+                return
+            url, data = item
+            try:
+                steps = recipe_parser.get_parsed_steps(data, tools)
+                ingredient_catalog.get_catalog().resolve_all(item["name"] for item in data["ingredients"])
+                batch.append((recipe_store.recipe_id_for_url(url), data, steps, url))
+            except Exception as e:
+                self._count("failed")
+                self.dedup.failed(recipe_store.recipe_id_for_url(url))
+                print(f"  parse failed {url}: {e}", file=sys.stderr)
+            # save in batches while recipes keep coming, right away when the queue runs dry
+            if len(batch) >= STORE_BATCH or (batch and self.parse_queue.empty()):
+                self._store(batch)
+                batch = []
+
+    def _store(self, batch):
+        if not batch:
+            return
+        try:
+            self.store.put_many(batch)
+            self._count("stored", len(batch))
+            self.dedup.stored(recipe_id for recipe_id, *_ in batch)
+        except Exception as e:
+            self._count("failed", len(batch))
+            for recipe_id, *_ in batch:
+                self.dedup.failed(recipe_id)
+            print(f"  could not store {len(batch)} recipes: {e}", file=sys.stderr)
+
+    def run(self):
+        nlp_pool.warm()
+        upstream = [threading.Thread(target=self.discover, daemon=True)]
+        upstream += [threading.Thread(target=self.scrape_worker, daemon=True) for _ in range(self.scrapers)]
+        parsers = [threading.Thread(target=self.parse_worker, daemon=True) for _ in range(self.parsers)]
+        for t in upstream + parsers:
+            t.start()
+        for t in upstream:
+            t.join()
+        for _ in parsers:
+            self.parse_queue.put(_DONE)
+        for t in parsers:
+            t.join()
+        ingredient_catalog.get_catalog().save()
+        self.dedup.save()
+        return self.stats
+
+
+def serve_mirror(directory, site="allrecipes"):
+    """
+    Serve a local mirror / fixture directory on 127.0.0.1, scraped with the
+    given site's adapter; returns (server, base url).
+    """
+    handler = functools.partial(_QuietHandler, directory=directory)
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"127.0.0.1:{server.server_address[1]}"
+    site_adapters.register_host(host, site)
+    return server, f"http://{host}/"
+
+
+class _QuietHandler(http.server.SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Discover and ingest recipes from category pages or sitemaps")
+    arg_parser.add_argument("seeds", nargs="+", help="category page or sitemap urls")
+    arg_parser.add_argument("--mirror", help="serve this directory locally; seeds are relative to it")
+    arg_parser.add_argument("--mirror-site", default="allrecipes", help="site adapter for the mirrored pages")
+    arg_parser.add_argument("--delay", type=float, default=1.0, help="seconds between requests per host")
+    arg_parser.add_argument("--max-pages", type=int, default=200)
+    arg_parser.add_argument("--max-recipes", type=int, default=None)
+    arg_parser.add_argument("--scrapers", type=int, default=4)
+    arg_parser.add_argument("--parsers", type=int, default=1)
+    arg_parser.add_argument("--duplicates", choices=["link", "skip", "keep"], default="link",
+                            help="near-duplicates of stored recipes: link them to the original, skip them, "
+                                 "or keep (parse and store) them anyway")
+    args = arg_parser.parse_args()
+
+    seeds = args.seeds
+    server = None
+    if args.mirror:
+        server, base = serve_mirror(args.mirror, args.mirror_site)
+        seeds = [urljoin(base, s) for s in seeds]
+
+    crawler = Crawler(seeds, delay=args.delay, max_pages=args.max_pages, max_recipes=args.max_recipes,
+                      scrapers=args.scrapers, parsers=args.parsers, duplicates=args.duplicates)
+    start = time.perf_counter()
+    stats = crawler.run()
+    print(f"done in {time.perf_counter() - start:.1f}s: " + ", ".join(f"{k} {v}" for k, v in stats.items()))
+    if server:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
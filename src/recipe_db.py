@@ -0,0 +1,312 @@
+"""
+SQLite recipe repository: scraped records, their ingredients and steps, and
+parsed steps in one database file instead of one pair of JSON files per
+recipe.
+
+Tables:
+    recipes       id, url, title, the scraped record (JSON), parser version
+    ingredients   recipe id, position, name, qty, unit, canonical key
+    steps         recipe id, position, step/sub number, text
+    parsed_steps  recipe id, position, parsed step (JSON)
+
+with indexes for lookup by url, title and canonical ingredient. The
+database runs in WAL mode: every thread reads through its own connection
+while one writer connection (behind a lock) commits, so readers never wait
+for ingestion. put_many() stores a whole batch in one transaction.
+
+recipe_store.RecipeStore uses this repository when RECIPE_DB names a
+database file; recipe_store.LIBRARY_DIR files are used otherwise.
+
+Usage:
+    python3 src/recipe_db.py import                     # copy src/library (and src/recipe.json) into the database
+    python3 src/recipe_db.py find --ingredient ricotta  # also --url URL, --title TEXT
+    python3 src/recipe_db.py --db /tmp/r.db benchmark 5000
+"""
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import step_records
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+# a relative RECIPE_DB is taken relative to src/, like the library itself
+DB_FILE = os.path.join(SRC_DIR, os.environ["RECIPE_DB"]) if os.environ.get("RECIPE_DB") else ""
+DEFAULT_DB_FILE = os.path.join(SRC_DIR, "library", "recipes.db")
+BULK_SIZE = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recipes (
+    id TEXT PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    record TEXT NOT NULL,
+    parser_version TEXT,
+    parsed INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingredients (
+    recipe_id TEXT NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    qty TEXT,
+    unit TEXT,
+    canonical TEXT,
+    PRIMARY KEY (recipe_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS steps (
+    recipe_id TEXT NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    step_number INTEGER,
+    sub_number TEXT,
+    text TEXT NOT NULL,
+    PRIMARY KEY (recipe_id, position)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS parsed_steps (
+    recipe_id TEXT NOT NULL REFERENCES recipes(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (recipe_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS recipes_url ON recipes (url);
+CREATE INDEX IF NOT EXISTS recipes_title ON recipes (title COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS ingredients_canonical ON ingredients (canonical);
+"""
+
+
+class RecipeRepository:
+    def __init__(self, path=None):
+        self.path = path or DB_FILE or DEFAULT_DB_FILE
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writer = self._connect(check_same_thread=False)
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.executescript(SCHEMA)
+
+    def _connect(self, check_same_thread=True):
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=check_same_thread)
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        return db
+
+    def _reader(self):
+        """This thread's read connection."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = self._local.db = self._connect()
+        return db
+
+    # ---------------- reads ----------------
+    def get(self, recipe_id):
+        """(record, parsed step dicts) of a parsed recipe, or None."""
+        db = self._reader()
+        row = db.execute("SELECT record, parsed FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        if row is None or not row[1]:
+            return None
+        steps = [json.loads(data) for (data,) in db.execute(
+            "SELECT data FROM parsed_steps WHERE recipe_id = ? ORDER BY position", (recipe_id,))]
+        return json.loads(row[0]), steps
+
+    def get_record(self, recipe_id):
+        """The scraped record, parsed or not, or None."""
+        row = self._reader().execute("SELECT record FROM recipes WHERE id = ?", (recipe_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def version(self, recipe_id):
+        """(updated time, parser version) of a stored recipe, or None; changes on every put."""
+        row = self._reader().execute("SELECT updated, parser_version FROM recipes WHERE id = ?",
+                                     (recipe_id,)).fetchone()
+        return tuple(row) if row else None
+
+    def __contains__(self, recipe_id):
+        return self._reader().execute("SELECT 1 FROM recipes WHERE id = ? AND parsed = 1",
+                                      (recipe_id,)).fetchone() is not None
+
+    def __len__(self):
+        return self._reader().execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def ids(self) -> list:
+        return [r for (r,) in self._reader().execute("SELECT id FROM recipes ORDER BY id")]
+
+    def find_by_url(self, url):
+        row = self._reader().execute("SELECT id FROM recipes WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def find_by_title(self, text) -> list:
+        """Ids of recipes whose title starts with text (case-insensitive)."""
+        # a prefix pattern bound as-is lets SQLite range-scan the NOCASE title index
+        pattern = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return [r for (r,) in self._reader().execute(
+            "SELECT id FROM recipes WHERE title LIKE ? ESCAPE '\\' ORDER BY title COLLATE NOCASE", (pattern,))]
+
+    def find_by_ingredient(self, name) -> list:
+        """
+        Ids of recipes using an ingredient, matched on its canonical key
+        (indexed), else on keys containing it ("mozzarella").
+        """
+        from ingredient_catalog import canonical_key
+        key = canonical_key(name)
+        db = self._reader()
+        found = [r for (r,) in db.execute(
+            "SELECT DISTINCT recipe_id FROM ingredients WHERE canonical = ? ORDER BY recipe_id", (key,))]
+        if not found and key:
+            found = [r for (r,) in db.execute(
+                "SELECT DISTINCT recipe_id FROM ingredients WHERE canonical LIKE ? ORDER BY recipe_id", (f"%{key}%",))]
+        return found
+
+    # ---------------- writes ----------------
+    def put(self, recipe_id, record, steps=None, url=None, parser_version=None):
+        """Store a record and, if given, its parsed step dicts (replacing any earlier copy)."""
+        self.put_many([(recipe_id, record, steps, url, parser_version)])
+
+    def put_many(self, items):
+        """Store (recipe_id, record, steps or None, url, parser_version) tuples in one transaction."""
+        from ingredient_catalog import canonical_key
+        recipes, ingredients, steps, parsed = [], [], [], []
+        now = time.time()
+        for recipe_id, record, parsed_steps, url, version in items:
+            recipes.append((recipe_id, url, record.get("title"),
+                            json.dumps(record, ensure_ascii=False), version, parsed_steps is not None, now))
+            ingredients += [(recipe_id, i, item["name"], item.get("qty"), item.get("unit"), canonical_key(item["name"]))
+                            for i, item in enumerate(record.get("ingredients", []))]
+            subs = [(step.get("step_number"), sub) for step in record.get("steps", []) for sub in step.get("substeps", [])]
+            steps += [(recipe_id, i, number, sub.get("sub_number"), sub["text"]) for i, (number, sub) in enumerate(subs)]
+            if parsed_steps is not None:
+                parsed += [(recipe_id, i, json.dumps(step, ensure_ascii=False))
+                           for i, step in enumerate(step_records.steps_to_json(parsed_steps))]
+        ids = [(item[0],) for item in items]
+        with self._write_lock, self._writer:
+            for table in ("ingredients", "steps", "parsed_steps"):
+                self._writer.executemany(f"DELETE FROM {table} WHERE recipe_id = ?", ids)
+            # a re-put without a url (e.g. a re-parse) keeps the url stored earlier
+            self._writer.executemany(
+                "INSERT INTO recipes VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                "url = COALESCE(excluded.url, url), title = excluded.title, record = excluded.record, "
+                "parser_version = excluded.parser_version, parsed = excluded.parsed, updated = excluded.updated",
+                recipes)
+            self._writer.executemany("INSERT INTO ingredients VALUES (?, ?, ?, ?, ?, ?)", ingredients)
+            self._writer.executemany("INSERT INTO steps VALUES (?, ?, ?, ?, ?)", steps)
+            self._writer.executemany("INSERT INTO parsed_steps VALUES (?, ?, ?)", parsed)
+
+    def delete(self, recipe_id):
+        with self._write_lock, self._writer:
+            self._writer.execute("DELETE FROM recipes WHERE id = ?", (recipe_id,))
+
+    def close(self):
+        self._writer.close()
+
+
+_repository = None
+_repository_lock = threading.Lock()
+
+
+def get_repository(path=None) -> RecipeRepository:
+    """Process-wide repository for RECIPE_DB (or the given path)."""
+    global _repository
+    with _repository_lock:
+        if _repository is None or (path and _repository.path != path):
+            _repository = RecipeRepository(path)
+    return _repository
+
+
+def import_files(repository, library_dir, legacy=True):
+    """Copy a file library (and the legacy src/recipe.json pair) into the repository; returns the count."""
+    import recipe_store
+    files = recipe_store.RecipeStore(library_dir, compact=False)
+    ids = ([recipe_store.LEGACY_ID] if legacy else []) + sorted(files.record_ids())
+    batch, count = [], 0
+    for recipe_id in ids:
+        try:
+            entry = files.get(recipe_id)
+            batch.append((recipe_id, entry.recipe, entry.steps, None, None))
+        except KeyError:
+            record_path = files._paths(recipe_id)[0]
+            if not os.path.exists(record_path):
+                continue
+            with open(record_path, "r", encoding="utf-8") as f:
+                batch.append((recipe_id, json.load(f), None, None, None))  # scraped, not parsed yet
+        if len(batch) >= BULK_SIZE:
+            repository.put_many(batch)
+            count += len(batch)
+            batch = []
+    repository.put_many(batch)
+    return count + len(batch)
+
+
+def benchmark(repository, n):
+    """Bulk vs one-at-a-time inserts of n copies of the legacy recipe, then concurrent reads."""
+    import recipe_store
+    entry = recipe_store.RecipeStore(compact=False).get(recipe_store.LEGACY_ID)
+    items = [(f"bench-{i}", entry.recipe, entry.steps, f"https://example.com/recipe/{i}", None) for i in range(n)]
+    start = time.perf_counter()
+    singles = max(1, n // 10)
+    for item in items[:singles]:
+        repository.put(*item)
+    single = (time.perf_counter() - start) / singles
+    start = time.perf_counter()
+    for i in range(0, n, BULK_SIZE):
+        repository.put_many(items[i:i + BULK_SIZE])
+    bulk = (time.perf_counter() - start) / n
+    print(f"insert one at a time: {single * 1e3:.2f} ms per recipe; put_many: {bulk * 1e3:.2f} ms per recipe "
+          f"({single / bulk:.0f}x)")
+
+    def read(k):
+        for i in range(k, n, 8):
+            repository.get(f"bench-{i}")
+    start = time.perf_counter()
+    threads = [threading.Thread(target=read, args=(k,)) for k in range(8)]
+    writer = threading.Thread(target=lambda: repository.put_many(items[:BULK_SIZE]))
+    for t in threads + [writer]:
+        t.start()
+    for t in threads + [writer]:
+        t.join()
+    print(f"8 readers + 1 writer: {n} gets in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    found = repository.find_by_ingredient("shredded mozzarella cheese")
+    print(f"find_by_ingredient: {len(found)} recipes in {(time.perf_counter() - start) * 1e3:.1f} ms")
+
+
+def main():
+    import recipe_store
+    arg_parser = argparse.ArgumentParser(description="SQLite recipe repository")
+    arg_parser.add_argument("--db", default=DB_FILE or DEFAULT_DB_FILE)
+    sub = arg_parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="copy a file library into the database")
+    imp.add_argument("--library", default=recipe_store.LIBRARY_DIR)
+    find = sub.add_parser("find", help="look recipes up by url, title or ingredient")
+    find.add_argument("--url")
+    find.add_argument("--title", help="title prefix")
+    find.add_argument("--ingredient")
+    bench = sub.add_parser("benchmark", help="time bulk inserts and concurrent reads")
+    bench.add_argument("n", type=int)
+    args = arg_parser.parse_args()
+
+    repository = RecipeRepository(args.db)
+    if args.command == "import":
+        start = time.perf_counter()
+        count = import_files(repository, args.library)
+        print(f"imported {count} recipes into {args.db} in {time.perf_counter() - start:.1f}s")
+    elif args.command == "find":
+        if args.url:
+            found = [r for r in [repository.find_by_url(args.url)] if r]
+        elif args.title:
+            found = repository.find_by_title(args.title)
+        elif args.ingredient:
+            found = repository.find_by_ingredient(args.ingredient)
+        else:
+            sys.exit("give --url, --title or --ingredient")
+        for recipe_id in found:
+            print(f"{recipe_id}: {repository.get_record(recipe_id).get('title')}")
+    elif args.n < 1:
+        sys.exit("benchmark needs at least 1 recipe")
+    else:
+        benchmark(repository, args.n)
+
+
+if __name__ == "__main__":
+    main()
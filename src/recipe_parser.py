@@ -1,39 +1,92 @@
+import os
+import sys
 import json
+import hashlib
+import inspect
+import nlp_pool
+import parser_1
+import resources
+import recipe_store
+import actionable_classifier
 from parser_1 import load_list_from_file, parse_step_main
 
+TOOLS_FILE = os.path.join(recipe_store.SRC_DIR, 'tools.txt')
+
 def load_tools():
-    tools_file = 'src/tools.txt'
-    tools = load_list_from_file(tools_file)
+    """The parser's tool list: the knowledge base's, if built, else tools.txt."""
+    tools = resources.load_kb_artifact("tools")
+    if tools is None:
+        tools = load_list_from_file(TOOLS_FILE)
     return tools
 
-def load_ingredients():
-    with open("src/recipe.json", "r") as f:
-        data = json.load(f)
+def load_recipe(recipe_id=recipe_store.LEGACY_ID):
+    return recipe_store.get_store().get_record(recipe_id)
+
+def load_ingredients(data=None):
+    if data is None:
+        data = load_recipe()
 
     ingredients = [item["name"] for item in data["ingredients"]]
     return ingredients
 
-def load_steps():
-    with open("src/recipe.json", "r") as f:
-        data = json.load(f)
+def load_steps(data=None):
+    if data is None:
+        data = load_recipe()
 
     text = []
     #sub_steps = [{"substeps": item["substeps"], "step_number": step for item in data["steps"]]
     for sub in data["steps"]:
         for i in range(len(sub["substeps"])):
-            text.append({ "step_number": sub["step_number"], "substep_number": sub["substeps"][i]["sub_number"], "text": sub["substeps"][i]["text"] })   
+            text.append({ "step_number": sub["step_number"], "substep_number": sub["substeps"][i]["sub_number"], "text": sub["substeps"][i]["text"] })
     return text
 
-def get_parsed_steps():
-    steps = load_steps()
-    tools = load_tools()
-    ingredients = load_ingredients()
+def parser_version(tools=None):
+    """
+    Hash of everything that changes parser output: the parser source, its
+    tunables (COOKING_VERBS, NON_ACTIONABLE_PATTERNS, the ingredient match
+    threshold, ...), the tool list and the actionable classifier in use.
+    Stored next to parsed output so a re-parse can skip recipes already
+    parsed by this exact version.
+    """
+    if tools is None:
+        tools = load_tools()
+    h = hashlib.sha256()
+    h.update(inspect.getsource(parser_1).encode("utf-8"))
+    h.update(inspect.getsource(get_parsed_steps).encode("utf-8"))
+    h.update(json.dumps([
+        parser_1.COOKING_VERBS,
+        parser_1.NON_ACTIONABLE_PATTERNS,
+        parser_1.COMMON_METHODS,
+        parser_1.INGREDIENT_MATCH_THRESHOLD,
+        tools,
+        parser_1.ACTIONABLE_MODE,
+        actionable_classifier.model_version(),
+    ]).encode("utf-8"))
+    return h.hexdigest()[:16]
+
+def get_parsed_steps(data=None, tools=None):
+    """
+    Parse a recipe record (recipe.json format) into the parsed step list.
+    With no arguments, parses the recipe stored as recipe_store.LEGACY_ID
+    (src/recipe.json) using the tool list.
+    """
+    if data is None:
+        data = load_recipe()
+    if tools is None:
+        tools = load_tools()
+    steps = load_steps(data)
+    ingredients = load_ingredients(data)
     parsed_steps = []
     prev = -1
 
     i = 1
     for step in steps:
-        parsed_step = parse_step_main(step['text'], tools, ingredients)
+        if parsed_steps and parser_1.ACTIONABLE_MODE == "classifier" \
+                and actionable_classifier.classify(step['text']) is False:
+            # a confident note only keeps its text, so skip the full parse
+            parsed_steps[i-2]["notes"].append(step['text'].strip())
+            continue
+        parsed_step = parse_step_main(step['text'], tools, ingredients, data["ingredients"])
         if parsed_step["actionable"]:
             parsed_step["step_number"] = i
             parsed_step["substep_number"] = step["substep_number"]
@@ -49,9 +102,10 @@ def get_parsed_steps():
     return parsed_steps
 
 def main():
-    data = get_parsed_steps()
-    with open("src/parsed_recipes.json", "w") as f:
-        json.dump(data, f, indent=4, ensure_ascii=False)
+    recipe_id = sys.argv[1] if len(sys.argv) > 1 else recipe_store.LEGACY_ID
+    nlp_pool.warm()
+    record = load_recipe(recipe_id)
+    recipe_store.get_store().put(recipe_id, record, get_parsed_steps(record))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,274 @@
+"""
+Recipe store: scraped records and their parsed steps, keyed by recipe id.
+
+Each recipe lives in its own files under src/library (the layout
+reprocess.py re-parses):
+    src/library/<recipe_id>.json          scraped record (recipe.json format)
+    src/library/parsed/<recipe_id>.json   parsed steps
+
+Loaded recipes are kept in an LRU cache, so many sessions over the same
+popular recipes share one in-memory copy. Entries are read-only: handlers
+must never mutate a recipe or its steps. Steps are held as compact
+step_records.ParsedStep records unless RECIPE_STORE_COMPACT=0.
+
+A cached recipe is checked against its files' mtimes (or its database row)
+at most every RECIPE_STORE_CHECK seconds, so a recipe re-parsed by another
+process (reprocess.py, the crawler) is reloaded as a new generation.
+
+The legacy single-recipe files (src/recipe.json, src/parsed_recipes.json)
+are still available under the id LEGACY_ID.
+
+With RECIPE_DB set to a database file, recipes are kept in that SQLite
+database (recipe_db.RecipeRepository) instead of the JSON files.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import itertools
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import step_records
+import answer_cache
+import recipe_db
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))  # paths don't depend on the working directory
+LIBRARY_DIR = os.path.join(SRC_DIR, "library")
+LEGACY_FILES = (os.path.join(SRC_DIR, "recipe.json"), os.path.join(SRC_DIR, "parsed_recipes.json"))
+LEGACY_ID = "current"
+CACHE_SIZE = int(os.environ.get("RECIPE_STORE_CACHE", "256"))
+COMPACT = os.environ.get("RECIPE_STORE_COMPACT", "1") != "0"
+CHECK_INTERVAL = float(os.environ.get("RECIPE_STORE_CHECK", "1.0"))
+
+_generations = itertools.count(1)
+
+
+def recipe_id_for_url(url: str) -> str:
+    """Stable id for a recipe url, e.g. allrecipes-218091."""
+    parts = urlsplit(url.strip())
+    host = parts.netloc.lower().removeprefix("www.")
+    m = re.search(r"/recipe/(\d+)", parts.path)
+    if m:
+        return f"{host.split('.')[0]}-{m.group(1)}"
+    digest = hashlib.sha1((host + parts.path.rstrip("/")).encode("utf-8")).hexdigest()[:12]
+    return f"{host.split('.')[0] or 'recipe'}-{digest}"
+
+
+class RecipeEntry:
+    """
+    One recipe as served to sessions: the scraped record, its parsed steps
+    and `derived`, a dict where per-recipe precomputed data (e.g. the
+    context tracker's step referents) is cached alongside the recipe.
+    `generation` is unique per load, so caches keyed on it never mix up a
+    recipe's old and re-parsed steps. `version` is what was on disk when it
+    was loaded (see RecipeStore._version).
+    """
+    __slots__ = ("recipe_id", "recipe", "steps", "derived", "generation", "version", "checked")
+
+    def __init__(self, recipe_id, recipe, steps, version=None):
+        self.recipe_id = recipe_id
+        self.recipe = recipe
+        self.steps = steps
+        self.derived = {}
+        self.generation = next(_generations)
+        self.version = version
+        self.checked = time.monotonic()
+
+
+class RecipeStore:
+    def __init__(self, library_dir=LIBRARY_DIR, cache_size=CACHE_SIZE, compact=COMPACT, db=None):
+        self.library_dir = library_dir
+        self.db = db  # recipe_db.RecipeRepository, or None for the JSON files
+        self.cache_size = cache_size
+        self.compact = compact
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _paths(self, recipe_id):
+        if recipe_id == LEGACY_ID:
+            return LEGACY_FILES
+        return (os.path.join(self.library_dir, recipe_id + ".json"),
+                os.path.join(self.library_dir, "parsed", recipe_id + ".json"))
+
+    def get(self, recipe_id) -> RecipeEntry:
+        """
+        Return the recipe entry, loading it into the LRU cache if needed, or
+        reloading it if it changed on disk. Raises KeyError if unknown.
+        """
+        with self._lock:
+            entry = self._cache.get(recipe_id)
+            if entry is not None:
+                self._cache.move_to_end(recipe_id)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if entry is not None and not self._changed(entry):
+            return entry
+
+        version = self._version(recipe_id)
+        loaded = self.db.get(recipe_id) if self.db is not None else None
+        if loaded is None and (self.db is None or recipe_id == LEGACY_ID):
+            loaded = self._load_files(recipe_id)
+        if loaded is None:
+            if entry is not None:
+                return entry  # e.g. re-scraped but not parsed yet: keep serving the parsed copy
+            raise KeyError(recipe_id)
+        recipe, steps = loaded
+        if self.compact:
+            steps = step_records.steps_from_json(steps)
+
+        if entry is not None:
+            answer_cache.invalidate_recipe(recipe_id)  # re-parsed by another process
+        entry = RecipeEntry(recipe_id, recipe, steps, version)
+        self._remember(entry)
+        return entry
+
+    def _version(self, recipe_id):
+        """The stored recipe's database version, or its files' mtimes; None if it isn't stored."""
+        if self.db is not None:
+            version = self.db.version(recipe_id)
+            if version is not None or recipe_id != LEGACY_ID:
+                return version
+        try:
+            return tuple(os.stat(path).st_mtime_ns for path in self._paths(recipe_id))
+        except FileNotFoundError:
+            return None
+
+    def _changed(self, entry) -> bool:
+        """Whether a cached entry is out of date, checked at most every CHECK_INTERVAL seconds."""
+        now = time.monotonic()
+        if now - entry.checked < CHECK_INTERVAL:
+            return False
+        entry.checked = now
+        version = self._version(entry.recipe_id)
+        return version is not None and version != entry.version
+
+    def _load_files(self, recipe_id):
+        recipe_path, parsed_path = self._paths(recipe_id)
+        try:
+            with open(recipe_path, "r", encoding="utf-8") as f:
+                recipe = json.load(f)
+            with open(parsed_path, "r", encoding="utf-8") as f:
+                return recipe, json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def put(self, recipe_id, recipe, steps, url=None) -> RecipeEntry:
+        """Save a recipe and its parsed steps and cache them."""
+        return self.put_many([(recipe_id, recipe, steps, url)])[0]
+
+    def put_many(self, items) -> list:
+        """
+        Save (recipe_id, recipe, steps, url) tuples; with a database, all in
+        one transaction (batch ingestion).
+        """
+        if self.db is not None:
+            self.db.put_many([(recipe_id, recipe, steps, url, None) for recipe_id, recipe, steps, url in items])
+        else:
+            for recipe_id, recipe, steps, _ in items:
+                recipe_path, parsed_path = self._paths(recipe_id)
+                os.makedirs(os.path.dirname(parsed_path), exist_ok=True)
+                _write_json(recipe_path, recipe)
+                _write_json(parsed_path, step_records.steps_to_json(steps))
+        entries = []
+        for recipe_id, recipe, steps, _ in items:
+            if self.compact:
+                steps = step_records.steps_from_json(step_records.steps_to_json(steps))
+            entry = RecipeEntry(recipe_id, recipe, steps, self._version(recipe_id))
+            self._remember(entry)
+            answer_cache.invalidate_recipe(recipe_id)
+            entries.append(entry)
+        return entries
+
+    def get_record(self, recipe_id) -> dict:
+        """The scraped record of a recipe, parsed or not. Raises KeyError if unknown."""
+        record = self.db.get_record(recipe_id) if self.db is not None else None
+        if record is None and (self.db is None or recipe_id == LEGACY_ID):
+            try:
+                with open(self._paths(recipe_id)[0], "r", encoding="utf-8") as f:
+                    record = json.load(f)
+            except FileNotFoundError:
+                pass
+        if record is None:
+            raise KeyError(recipe_id)
+        return record
+
+    def put_record(self, recipe_id, record, url=None):
+        """Save a scraped record that hasn't been parsed yet."""
+        if self.db is not None:
+            self.db.put(recipe_id, record, url=url)
+        else:
+            recipe_path = self._paths(recipe_id)[0]
+            if os.path.dirname(recipe_path):
+                os.makedirs(os.path.dirname(recipe_path), exist_ok=True)
+            _write_json(recipe_path, record)
+        self.invalidate(recipe_id)
+
+    def record_ids(self) -> list:
+        """Ids of every scraped record in the library (not LEGACY_ID)."""
+        if self.db is not None:
+            return [r for r in self.db.ids() if r != LEGACY_ID]
+        if not os.path.isdir(self.library_dir):
+            return []
+        return [name[:-5] for name in os.listdir(self.library_dir)
+                if name.endswith(".json") and not name.startswith("reprocess_")]
+
+    def records(self):
+        """(recipe id, scraped record) for every record in the library, one at a time."""
+        for recipe_id in sorted(self.record_ids()):
+            try:
+                yield recipe_id, self.get_record(recipe_id)
+            except KeyError:
+                continue  # deleted since it was listed
+
+    def invalidate(self, recipe_id):
+        """Drop a cached recipe (e.g. after it was re-parsed on disk) and the answers computed from it."""
+        with self._lock:
+            self._cache.pop(recipe_id, None)
+        answer_cache.invalidate_recipe(recipe_id)
+
+    def __contains__(self, recipe_id):
+        if recipe_id in self._cache:
+            return True
+        if self.db is not None and recipe_id in self.db:
+            return True
+        if self.db is not None and recipe_id != LEGACY_ID:
+            return False
+        return all(os.path.exists(p) for p in self._paths(recipe_id))
+
+    def _remember(self, entry):
+        with self._lock:
+            self._cache[entry.recipe_id] = entry
+            self._cache.move_to_end(entry.recipe_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+def _write_json(path, data):
+    """Write to a temp file and rename, so readers never see a half-written file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+_store = None
+
+
+def get_store() -> RecipeStore:
+    """Process-wide default store."""
+    global _store
+    if _store is None:
+        _store = RecipeStore(db=recipe_db.get_repository() if recipe_db.DB_FILE else None)
+    return _store
+
+
+def open_store(library_dir=None) -> RecipeStore:
+    """The default store, or a file store over another library directory (a tool's --library)."""
+    if library_dir is None or os.path.abspath(library_dir) == LIBRARY_DIR:
+        return get_store()
+    return RecipeStore(library_dir)
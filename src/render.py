@@ -0,0 +1,85 @@
+"""
+Output rendering for the assistant.
+
+Handlers and startup build their answers as text / Response objects and
+never print. render() writes a response to the terminal in one buffered
+write. The typewriter effect (character- or word-at-a-time output with
+pauses) is a client-side presentation option:
+
+    RECIPE_RENDER=plain        one write per response (default; headless/server)
+    RECIPE_RENDER=typewriter   the paced slow_print/word_print output
+    RECIPE_RENDER_DELAY=1.0    multiplier for the typewriter delays
+"""
+import os
+import sys
+import time
+
+MODE = os.environ.get("RECIPE_RENDER", "plain")
+_DELAY_MULTIPLIER = float(os.environ.get("RECIPE_RENDER_DELAY", "1.0"))
+
+
+class Response:
+    """
+    Output blocks plus the pacing a typewriter client should use for them.
+    Each block is (text, style, delay, pause): style is "word" or "char",
+    delay the per-word/char delay, pause the wait after the block.
+    """
+
+    def __init__(self, text=None):
+        self.blocks = []
+        if text:
+            self.add(text)
+
+    def add(self, text, style="word", delay=None, pause=0.0):
+        self.blocks.append((text, style, delay, pause))
+        return self
+
+    def text(self):
+        return "\n".join(block[0] for block in self.blocks)
+
+    def __str__(self):
+        return self.text()
+
+
+def slow_print(*args, delay=0.025):
+    text = ''.join(str(arg) for arg in args)
+    for char in text:
+        print(char, end='', flush=True)
+        time.sleep(_DELAY_MULTIPLIER*delay)
+    tactical_pause()
+    print()  # Move to the next line after printing
+
+def word_print(*args, delay=0.15):
+    text = ' '.join(str(arg) for arg in args)
+    words = text.split()
+    for word in words:
+        print(word, end=' ', flush=True)
+        time.sleep(_DELAY_MULTIPLIER*delay)
+    print()
+
+def tactical_pause(seconds = 0.35):
+    time.sleep(_DELAY_MULTIPLIER*seconds)
+
+
+def render(response, mode=None, out=None):
+    """Write a Response (or plain string) using the configured mode."""
+    if response is None or response == "":
+        return
+    if isinstance(response, str):
+        response = Response(response)
+    mode = mode or MODE
+
+    if mode == "typewriter":
+        for text, style, delay, pause in response.blocks:
+            printer = slow_print if style == "char" else word_print
+            for line in text.split("\n"):
+                if delay is None:
+                    printer(line)
+                else:
+                    printer(line, delay=delay)
+            tactical_pause(pause)
+        return
+
+    out = out or sys.stdout
+    out.write(response.text() + "\n")
+    out.flush()
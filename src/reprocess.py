@@ -0,0 +1,139 @@
+"""
+Re-run the parser over the stored recipe library without re-scraping.
+
+Records are read from the recipe store and the parsed steps written back
+through it, so this works on the library files and on a RECIPE_DB
+database alike:
+    src/library/<recipe_id>.json          scraped record (recipe.json format)
+    src/library/parsed/<recipe_id>.json   parsed steps (parsed_recipes.json format)
+    src/library/reprocess_checkpoint.json {recipe_id: {parser_version, source}}
+
+Recipes whose checkpoint entry already has the current parser_version (and
+an unchanged source record) are skipped, so an interrupted run resumes where
+it stopped and a re-run after no parser change does nothing. Workers only
+parse; the parent process does all the writing, in batches.
+
+Usage: python3 src/reprocess.py [--library DIR] [--workers N] [--force]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import multiprocessing
+import nlp_pool
+import recipe_parser
+import recipe_store
+
+LIBRARY_DIR = recipe_store.LIBRARY_DIR
+CHECKPOINT_NAME = "reprocess_checkpoint.json"
+CHECKPOINT_EVERY = 20
+
+_tools = None
+
+
+def record_digest(record):
+    return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()[:16]
+
+
+def load_checkpoint(library_dir):
+    path = os.path.join(library_dir, CHECKPOINT_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def save_checkpoint(library_dir, checkpoint):
+    """Write the checkpoint atomically so a crash never leaves it half-written."""
+    os.makedirs(library_dir, exist_ok=True)
+    path = os.path.join(library_dir, CHECKPOINT_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _init_worker(tools):
+    global _tools
+    _tools = tools
+    nlp_pool.warm()
+
+
+def reparse_record(job):
+    """Worker: parse one stored record. Returns a summary with the parsed steps."""
+    recipe_id, record, source = job
+    start = time.perf_counter()
+    try:
+        parsed = recipe_parser.get_parsed_steps(record, _tools)
+    except Exception as e:
+        return {"recipe_id": recipe_id, "error": f"{type(e).__name__}: {e}"}
+    return {"recipe_id": recipe_id, "record": record, "source": source, "steps": parsed,
+            "seconds": time.perf_counter() - start}
+
+
+def pending_jobs(store, checkpoint, version, force=False):
+    """Yield jobs for records not yet parsed by this parser version."""
+    for recipe_id, record in store.records():
+        source = record_digest(record)
+        done = checkpoint.get(recipe_id)
+        if not force and done and done.get("parser_version") == version and done.get("source") == source \
+                and recipe_id in store:
+            continue
+        yield recipe_id, record, source
+
+
+def reprocess(library_dir=LIBRARY_DIR, workers=None, force=False):
+    """Re-parse the library in parallel; returns (parsed, skipped, failed) counts."""
+    tools = recipe_parser.load_tools()
+    version = recipe_parser.parser_version(tools)
+    workers = workers or os.cpu_count() or 1
+    # fork the workers before the store opens any database connection
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(tools,)) as pool:
+        store = recipe_store.open_store(library_dir)
+        checkpoint = load_checkpoint(store.library_dir)
+        total = len(store.record_ids())
+        print(f"parser version {version}: {total} recipes in {store.db.path if store.db else store.library_dir}")
+
+        parsed = failed = 0
+        batch = []
+        start = time.perf_counter()
+        for result in pool.imap_unordered(reparse_record, pending_jobs(store, checkpoint, version, force), chunksize=4):
+            if "error" in result:
+                failed += 1
+                print(f"  {result['recipe_id']}: {result['error']}", file=sys.stderr)
+                continue
+            batch.append(result)
+            parsed += 1
+            if len(batch) >= CHECKPOINT_EVERY:
+                _save(store, batch, checkpoint, version)
+                batch = []
+                print(f"  {parsed} parsed ({parsed / (time.perf_counter() - start):.1f}/s)")
+        _save(store, batch, checkpoint, version)
+
+    skipped = total - parsed - failed
+    print(f"done in {time.perf_counter() - start:.1f}s: {parsed} parsed, {skipped} skipped, {failed} failed")
+    return parsed, skipped, failed
+
+
+def _save(store, batch, checkpoint, version):
+    """Store a batch of parsed recipes (one transaction with a database), then checkpoint them."""
+    store.put_many([(r["recipe_id"], r["record"], r["steps"], None) for r in batch])
+    for r in batch:
+        checkpoint[r["recipe_id"]] = {"parser_version": version, "source": r["source"]}
+    save_checkpoint(store.library_dir, checkpoint)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Re-parse stored recipes after parser changes")
+    arg_parser.add_argument("--library", default=LIBRARY_DIR)
+    arg_parser.add_argument("--workers", type=int, default=None)
+    arg_parser.add_argument("--force", action="store_true", help="ignore the checkpoint")
+    args = arg_parser.parse_args()
+    reprocess(args.library, args.workers, args.force)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Read-only resources shared by the query handlers and the parser.
+
+Everything here is loaded at most once per process. In the pre-forking
+server mode (see prefork.py) the parent calls preload() before forking so
+the workers share these objects copy-on-write instead of each loading
+their own copy of the spaCy model and the json/txt lookup tables.
+
+When a knowledge base has been built (kb_build.py), the glossary and tool
+tables come from its current artifacts in src/kb, which are stored in their
+final form; otherwise they are read from the hand-made files in src/. Paths
+are relative to this directory, not to the working directory.
+"""
+import os
+import json
+import gc
+import nlp_pool
+
+SRC_DIR = os.path.dirname(os.path.abspath(__file__))
+KB_MANIFEST = os.path.join(SRC_DIR, "kb", "manifest.json")
+SUBSTITUTIONS_FILE = os.path.join(SRC_DIR, "ingredient_substitutions.json")
+DICTIONARY_FILE = os.path.join(SRC_DIR, "culinary_dictionary.json")
+COOKING_TOOLS_FILE = os.path.join(SRC_DIR, "common_cooking_tools.txt")
+
+_kb_manifest = None
+_substitutions = None
+_culinary_dict = None
+_cooking_tools = None
+
+
+def get_nlp():
+    """Return the shared spaCy pipeline (configured in nlp_pool)."""
+    return nlp_pool.get_nlp()
+
+
+def load_kb_artifact(name):
+    """Data of the current knowledge-base artifact `name`, or None if none was built."""
+    global _kb_manifest
+    if _kb_manifest is None:
+        _kb_manifest = {"artifacts": {}}
+        if os.path.exists(KB_MANIFEST):
+            with open(KB_MANIFEST, "r", encoding="utf-8") as f:
+                _kb_manifest = json.load(f)
+    artifact = _kb_manifest["artifacts"].get(name)
+    if artifact is None:
+        return None
+    with open(os.path.join(os.path.dirname(KB_MANIFEST), artifact["file"]), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def get_substitutions():
+    """
+    Return {ingredient (lowercase): substitution} from ingredient_substitutions.json.
+    """
+    global _substitutions
+    if _substitutions is None:
+        subs = {}
+        with open(SUBSTITUTIONS_FILE, "r") as f:
+            data = json.load(f)
+
+        # Expecting a list of objects
+        for entry in data:
+            ingredient = entry.get("ingredient")
+            substitution = entry.get("substitution")
+
+            if not ingredient or not substitution:
+                continue  # skip incomplete rows
+
+            subs[ingredient.lower()] = substitution
+        _substitutions = subs
+    return _substitutions
+
+
+def get_culinary_dict():
+    """Return the {term: definition} culinary glossary."""
+    global _culinary_dict
+    if _culinary_dict is None:
+        _culinary_dict = load_kb_artifact("dictionary_index")
+    if _culinary_dict is None:
+        with open(DICTIONARY_FILE, "r", encoding="utf-8") as f:
+            _culinary_dict = json.load(f)
+    return _culinary_dict
+
+
+def get_cooking_tools():
+    """Return {tool name (lowercase): description} from common_cooking_tools.txt."""
+    global _cooking_tools
+    if _cooking_tools is None:
+        _cooking_tools = load_kb_artifact("tool_index")
+    if _cooking_tools is None:
+        tools = {}
+        with open(COOKING_TOOLS_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                if ':' in line:
+                    name, desc = line.split(':', 1)
+                    tools[name.strip().lower()] = desc.strip()
+        _cooking_tools = tools
+    return _cooking_tools
+
+
+def preload(nlp=True):
+    """
+    Load every shared resource now and move them out of the GC's reach.
+
+    gc.freeze() puts the loaded objects in the permanent generation, so the
+    collector never writes to their headers in a forked child; otherwise the
+    first full collection in each worker would copy most of the shared pages.
+    """
+    if nlp:
+        nlp_pool.warm()
+    get_substitutions()
+    get_culinary_dict()
+    get_cooking_tools()
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,116 @@
+"""
+Rule-based sentence segmenter for recipe directions.
+
+Splitting on every ". " breaks "approx. 5 min." and "9x13-in. pan" into
+bogus substeps, and each substep then costs a spaCy parse and an
+ingredient match in recipe_parser. Here a candidate boundary ([.!?] then
+whitespace) only splits when
+  - it isn't inside parentheses, e.g. "(about 10 min. per side)",
+  - the next word doesn't start lowercase, and
+  - the word before isn't an abbreviation; unit abbreviations ("min.",
+    "in.", "oz.") still end a sentence when a capitalized word follows,
+    titles and "approx." never do.
+
+Usage:
+    python3 src/segmenter.py      # accuracy on the fixture + timing vs the old regex
+"""
+import os
+import re
+import json
+import time
+import functools
+
+# Can end a sentence ("Bake 20 min. Let cool.")
+UNIT_ABBREVIATIONS = {
+    "min", "mins", "hr", "hrs", "sec", "secs", "in", "ins", "ft", "oz", "fl", "lb", "lbs", "tbsp", "tbs",
+    "tsp", "pkg", "pkgs", "qt", "qts", "pt", "pts", "gal", "doz", "env", "cm", "mm", "ml", "kg", "deg",
+    "temp", "etc",
+}
+# Never end a sentence
+TITLE_ABBREVIATIONS = {"approx", "appx", "e.g", "i.e", "vs", "no", "nos", "st", "mt", "dr", "mr", "mrs",
+                       "ms", "sq", "lg", "med", "sm", "ca", "cf", "fig", "max"}
+
+_BOUNDARY = re.compile(r"[.!?]+[\"')\]]*\s+")
+_LAST_WORD = re.compile(r"(?<![A-Za-z.])([A-Za-z][A-Za-z.]*)\.$")
+
+
+def _is_boundary(text, start, end, depth) -> bool:
+    if depth > 0:
+        return False
+    following = text[end:end + 1]
+    if following.islower():
+        return False
+    if text[start] != ".":
+        return True
+    m = _LAST_WORD.search(text, max(0, start - 12), start + 1)
+    if not m:
+        return True
+    word = m.group(1).lower()
+    if word in TITLE_ABBREVIATIONS:
+        return False
+    if word in UNIT_ABBREVIATIONS:
+        return following.isupper()
+    return True
+
+
+@functools.lru_cache(maxsize=8192)
+def _split(text):
+    sentences = []
+    start = 0
+    depth = 0
+    scanned = 0
+    for m in _BOUNDARY.finditer(text):
+        chunk = text[scanned:m.start()]
+        depth += chunk.count("(") - chunk.count(")")
+        scanned = m.start()
+        if _is_boundary(text, m.start(), m.end(), depth):
+            sentence = text[start:m.end()].strip()
+            if sentence:
+                sentences.append(sentence)
+            start = m.end()
+    tail = text[start:].strip()
+    if tail:
+        sentences.append(tail)
+    return tuple(sentences)
+
+
+def split_sentences(text: str) -> list:
+    """Sentences of one direction paragraph."""
+    return list(_split(text.strip()))
+
+
+def split_batch(texts) -> list:
+    """split_sentences over many paragraphs; repeated paragraphs are split once."""
+    return [list(_split(t.strip())) for t in texts]
+
+
+_OLD_SPLIT = re.compile(r"(?<=[.!?])\s+")
+
+
+def _old_split(text):
+    return [s.strip() for s in _OLD_SPLIT.split(text) if s.strip()]
+
+
+def main():
+    with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "segmenter_cases.json"), "r", encoding="utf-8") as f:
+        cases = json.load(f)
+
+    for label, split in [("regex", _old_split), ("segmenter", split_sentences)]:
+        correct = sum(split(c["text"]) == c["sentences"] for c in cases)
+        produced = sum(len(split(c["text"])) for c in cases)
+        print(f"{label:10s} {correct}/{len(cases)} paragraphs split correctly, {produced} substeps "
+              f"(expected {sum(len(c['sentences']) for c in cases)})")
+        for c in cases:
+            if split(c["text"]) != c["sentences"] and label == "segmenter":
+                print(f"    wrong: {c['text']!r} -> {split(c['text'])}")
+
+    texts = [f"{c['text']} ({i})" for i in range(2000) for c in cases]  # distinct, so the cache doesn't help
+    for label, split in [("regex", _old_split), ("segmenter", lambda t: list(_split(t.strip())))]:
+        start = time.perf_counter()
+        for t in texts:
+            split(t)
+        print(f"{label:10s} {(time.perf_counter() - start) / len(texts) * 1e6:.1f} us per paragraph")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Cooking sessions. Each session is bound to one recipe from the recipe
+store and keeps its own position in it, so several users can cook
+different recipes on the same host without sharing any state.
+"""
+import uuid
+import threading
+import timers
+import recipe_store
+import answer_cache
+from context_tracker import ContextTracker
+from render import render
+
+
+class Session:
+    def __init__(self, recipe_id, store=None, session_id=None):
+        self.session_id = session_id or uuid.uuid4().hex[:12]
+        self.store = store or recipe_store.get_store()
+        self.idx = 1
+        self.notify = render  # where timer alerts go; speech mode also speaks them
+        self.answers = answer_cache.AnswerCache("session", answer_cache.SESSION_CACHE_SIZE)
+        self.bind(recipe_id)
+
+    def bind(self, recipe_id):
+        """Switch this session to another recipe and restart at step 1."""
+        entry = self.store.get(recipe_id)
+        self.entry = entry
+        self.recipe_id = recipe_id
+        self.recipe = entry.recipe
+        self.steps = entry.steps
+        self.idx = 1
+        self.context = ContextTracker(self)
+
+    def refresh(self):
+        """Pick up the recipe if it was re-parsed since this session loaded it, keeping the position."""
+        entry = self.store.get(self.recipe_id)
+        if entry is not self.entry:
+            self.entry = entry
+            self.recipe = entry.recipe
+            self.steps = entry.steps
+            self.idx = max(1, min(self.idx, len(entry.steps)))
+
+    def current_step(self):
+        return self.steps[self.idx - 1]
+
+    @property
+    def total_steps(self):
+        return self.steps[-1]["step_number"] if self.steps else 0
+
+
+class SessionManager:
+    """Thread-safe registry of live sessions."""
+
+    def __init__(self, store=None):
+        self.store = store or recipe_store.get_store()
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def create(self, recipe_id, session_id=None) -> Session:
+        session = Session(recipe_id, self.store, session_id)
+        with self._lock:
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id) -> Session:
+        return self._sessions[session_id]
+
+    def close(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        timers.end_session(session_id)
+
+    def __len__(self):
+        return len(self._sessions)
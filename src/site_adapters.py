@@ -0,0 +1,342 @@
+"""
+Site adapters for recipe_scraper: one extractor per recipe site, picked by
+hostname with a dict lookup.
+
+An adapter knows its site's print view, which urls are recipes or category
+pages (for recipe_crawler), and the CSS selectors for title, details,
+ingredients and steps. Selectors are compiled once with soupsieve when
+the adapter is registered, not on every page. Whatever the selectors
+miss, and every site without an adapter, comes from the page's
+schema.org Recipe JSON-LD, which most recipe sites embed. So a batch can
+mix sites, and each page is parsed once by the extractor for its host.
+
+Adding a site:
+    register(SelectorAdapter("mysite", hosts=["mysite.com"], selectors={...}))
+or, for a local mirror of a known site, register_host("127.0.0.1:8000", "allrecipes").
+
+Usage:
+    python3 src/site_adapters.py PAGE.html [PAGE.html ...] [--host allrecipes.com]
+"""
+import re
+import sys
+import json
+import time
+import argparse
+from urllib.parse import urlsplit
+import soupsieve
+from bs4 import BeautifulSoup
+from segmenter import split_sentences
+
+# Labels observed in the HTML
+_LABEL_MAP = {
+    "prep time": "prep_time",
+    "cook time": "cook_time",
+    "additional time": "additional_time",
+    "total time": "total_time",
+    "servings": "yield",
+}
+_JSON_LD_TIMES = {"prepTime": "prep_time", "cookTime": "cook_time", "totalTime": "total_time"}
+_ISO_DURATION = re.compile(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?", re.I)
+_QTY = re.compile(r"^\s*([\d½⅓⅔¼¾⅛⅜⅝⅞./]+(?:\s+[\d½⅓⅔¼¾⅛⅜⅝⅞/]+)?(?:\s*(?:-|to)\s*[\d½⅓⅔¼¾⅛/.]+)?)\s*")
+UNITS = {"cup", "cups", "tablespoon", "tablespoons", "tbsp", "teaspoon", "teaspoons", "tsp", "pound", "pounds",
+         "lb", "lbs", "ounce", "ounces", "oz", "gram", "grams", "g", "kg", "ml", "l", "liter", "liters", "pinch",
+         "dash", "clove", "cloves", "slice", "slices", "can", "cans", "package", "packages", "stick", "sticks",
+         "quart", "quarts", "pint", "pints", "large", "medium", "small", "sprig", "sprigs", "bunch", "head"}
+
+
+def empty_record() -> dict:
+    return {"title": None, "prep_time": None, "cook_time": None, "additional_time": None,
+            "total_time": None, "yield": None, "ingredients": [], "steps": []}
+
+
+def make_steps(texts) -> list:
+    """recipe.json steps (with sentence substeps) from the text of each direction."""
+    steps = []
+    for text in texts:
+        text = text.strip()
+        if not text:
+            continue
+        i = len(steps) + 1
+        substeps = [{"sub_number": f"{i}.{j}", "text": s} for j, s in enumerate(split_sentences(text), start=1)]
+        steps.append({"step_number": i, "text": text, "substeps": substeps})
+    return steps
+
+
+def split_ingredient(line: str) -> dict:
+    """ "1 (16 ounce) package lasagna noodles" -> {qty: "1", unit: "(16 ounce) package", name: "lasagna noodles"}."""
+    line = " ".join(line.split())
+    qty = unit = ""
+    m = _QTY.match(line)
+    if m:
+        qty, line = m.group(1).strip(), line[m.end():]
+    package = re.match(r"(\([^)]*\)\s*)?(\S+)\s+", line)
+    if package and package.group(2).lower().rstrip(".") in UNITS:
+        unit, line = line[:package.end()].strip(), line[package.end():]
+    return {"qty": qty, "unit": unit, "name": line.strip()}
+
+
+class JsonLdAdapter:
+    """Reads the schema.org Recipe JSON-LD block; the fallback for every site."""
+
+    name = "json-ld"
+
+    def __init__(self, name=None, hosts=(), print_param=None, recipe_path=r"/recipes?/[^/]*[a-z][^/]*",
+                 category_path=r"/(recipes|category|categories|collections?)/?$"):
+        self.name = name or self.name
+        self.hosts = [h.lower().removeprefix("www.") for h in hosts]
+        self.print_param = print_param
+        self.recipe_path = re.compile(recipe_path)
+        self.category_path = re.compile(category_path)
+
+    def page_url(self, url: str) -> str:
+        """The url to fetch: the site's print view if it has one."""
+        if self.print_param and self.print_param + "=" not in url:
+            url += ("&" if "?" in url else "?") + self.print_param + "="
+        return url
+
+    def is_recipe_url(self, url: str) -> bool:
+        return bool(self.recipe_path.search(urlsplit(url).path))
+
+    def is_category_url(self, url: str) -> bool:
+        return bool(self.category_path.search(urlsplit(url).path))
+
+    def extract(self, soup: BeautifulSoup) -> dict:
+        return self.extract_json_ld(soup)
+
+    def extract_json_ld(self, soup: BeautifulSoup) -> dict:
+        record = empty_record()
+        data = find_json_ld_recipe(soup)
+        if data is None:
+            return record
+        record["title"] = _text(data.get("name"))
+        for key, field in _JSON_LD_TIMES.items():
+            record[field] = format_iso_duration(data.get(key))
+        servings = data.get("recipeYield")
+        if isinstance(servings, list):
+            servings = servings[0] if servings else None
+        record["yield"] = re.sub(r"\s*servings?$", "", str(servings), flags=re.I) if servings else None
+        record["ingredients"] = [split_ingredient(_text(line)) for line in data.get("recipeIngredient", []) if _text(line)]
+        record["steps"] = make_steps(_instruction_texts(data.get("recipeInstructions", [])))
+        return record
+
+
+class SelectorAdapter(JsonLdAdapter):
+    """
+    Extracts with the site's CSS selectors (compiled once here) and fills
+    anything they don't find from JSON-LD. Selector keys: title,
+    detail_row / detail_label / detail_value, ingredient (one per line)
+    with ingredient_qty / ingredient_unit / ingredient_name inside it,
+    step (one per direction) with step_text inside it.
+    """
+
+    def __init__(self, name, hosts, selectors, **kwargs):
+        super().__init__(name, hosts, **kwargs)
+        self.selectors = {key: soupsieve.compile(css) for key, css in selectors.items()}
+
+    def _one(self, key, tag):
+        selector = self.selectors.get(key)
+        return selector.select_one(tag) if selector else None
+
+    def _all(self, key, tag):
+        selector = self.selectors.get(key)
+        return selector.select(tag) if selector else []
+
+    def extract(self, soup: BeautifulSoup) -> dict:
+        record = empty_record()
+        record.update(self.extract_meta(soup))
+        record["ingredients"] = self.extract_ingredients(soup)
+        record["steps"] = self.extract_steps(soup)
+        if not record["ingredients"] or not record["steps"] or not record["title"]:
+            fallback = self.extract_json_ld(soup)
+            for key, value in fallback.items():
+                if not record[key]:
+                    record[key] = value
+        return record
+
+    def extract_meta(self, soup: BeautifulSoup) -> dict:
+        """Title and times/yield from the details rows."""
+        meta = {}
+        title_el = self._one("title", soup)
+        if title_el:
+            meta["title"] = title_el.get_text(" ", strip=True) or None
+
+        for row in self._all("detail_row", soup):
+            label_el = self._one("detail_label", row)
+            value_el = self._one("detail_value", row)
+            if not label_el or not value_el:
+                continue
+            label = re.sub(r":\s*$", "", label_el.get_text(" ", strip=True).lower())
+            key = _LABEL_MAP.get(label)
+            if not key:
+                continue
+            value = value_el.get_text(" ", strip=True)
+            if value:
+                meta[key] = value
+        return meta
+
+    def extract_ingredients(self, soup: BeautifulSoup) -> list:
+        """Ingredients as {qty, unit, name} from the structured list."""
+        items = []
+        for item in self._all("ingredient", soup):
+            qty_el = self._one("ingredient_qty", item)
+            unit_el = self._one("ingredient_unit", item)
+            name_el = self._one("ingredient_name", item)
+
+            qty = qty_el.get_text(strip=True) if qty_el else None
+            unit = unit_el.get_text(strip=True) if unit_el else None
+            name = name_el.get_text(" ", strip=True) if name_el else None
+
+            if name:
+                items.append({"qty": qty, "unit": unit, "name": name})
+        return items
+
+    def extract_steps(self, soup: BeautifulSoup) -> list:
+        """Ordered steps, each split into sentence-level substeps."""
+        texts = []
+        for li in self._all("step", soup):
+            p = self._one("step_text", li)
+            texts.append((p.get_text(" ", strip=True) if p else li.get_text(" ", strip=True)).strip())
+        return make_steps(texts)
+
+
+# ------------------------------------------------------------
+# JSON-LD helpers
+# ------------------------------------------------------------
+def find_json_ld_recipe(soup: BeautifulSoup):
+    """The first schema.org Recipe object in the page's JSON-LD blocks, or None."""
+    for script in soup.find_all("script", type="application/ld+json"):
+        try:
+            data = json.loads(script.string or "")
+        except ValueError:
+            continue
+        found = _find_recipe(data)
+        if found is not None:
+            return found
+    return None
+
+
+def _find_recipe(data):
+    if isinstance(data, list):
+        for item in data:
+            found = _find_recipe(item)
+            if found is not None:
+                return found
+        return None
+    if not isinstance(data, dict):
+        return None
+    types = data.get("@type", [])
+    if "Recipe" in (types if isinstance(types, list) else [types]):
+        return data
+    return _find_recipe(data.get("@graph", []))
+
+
+def _instruction_texts(instructions):
+    """Direction texts from a string, HowToStep / HowToSection objects or lists of them."""
+    if isinstance(instructions, str):
+        return [line for line in instructions.splitlines() if line.strip()]
+    texts = []
+    for item in instructions if isinstance(instructions, list) else [instructions]:
+        if isinstance(item, str):
+            texts.append(item)
+        elif isinstance(item, dict):
+            if "itemListElement" in item:
+                texts.extend(_instruction_texts(item["itemListElement"]))
+            elif item.get("text") or item.get("name"):
+                texts.append(_text(item.get("text") or item.get("name")))
+    return texts
+
+
+def _text(value) -> str:
+    """Plain text of a JSON-LD string (some sites put HTML or entities in it)."""
+    if not value:
+        return ""
+    value = str(value)
+    if "<" in value or "&" in value:
+        value = BeautifulSoup(value, "html.parser").get_text(" ")
+    return " ".join(value.split())
+
+
+def format_iso_duration(value):
+    """ "PT1H20M" -> "1 hr 20 mins" (the way Allrecipes writes times), or None."""
+    m = _ISO_DURATION.fullmatch(value.strip()) if isinstance(value, str) else None
+    if not m or not any(m.groups()):
+        return None
+    days, hours, minutes = (int(g) if g else 0 for g in m.groups())
+    hours += days * 24
+    parts = []
+    if hours:
+        parts.append(f"{hours} hr" + ("s" if hours > 1 else ""))
+    if minutes:
+        parts.append(f"{minutes} min" + ("s" if minutes > 1 else ""))
+    return " ".join(parts) or None
+
+
+# ------------------------------------------------------------
+# Registry
+# ------------------------------------------------------------
+JSON_LD = JsonLdAdapter()
+_by_host = {}
+_by_name = {}
+
+
+def register(adapter):
+    _by_name[adapter.name] = adapter
+    for host in adapter.hosts:
+        _by_host[host] = adapter
+    return adapter
+
+
+def register_host(host: str, adapter_name: str):
+    """Serve another host (e.g. a local mirror) with a registered adapter."""
+    _by_host[host.lower().removeprefix("www.")] = _by_name[adapter_name]
+
+
+def adapter_for(url: str):
+    """The adapter for a url's host (or its parent domain), else the JSON-LD adapter."""
+    host = urlsplit(url).netloc.lower().removeprefix("www.")
+    adapter = _by_host.get(host)
+    if adapter is None and host.count(".") > 1:
+        adapter = _by_host.get(host.split(".", 1)[1])
+    return adapter or JSON_LD
+
+
+ALLRECIPES = register(SelectorAdapter(
+    "allrecipes", hosts=["allrecipes.com"], print_param="print",
+    recipe_path=r"/recipe/\d+", category_path=r"/recipes/\d+",
+    selectors={
+        "title": "h1",
+        "detail_row": ".mm-recipes-details__item",
+        "detail_label": ".mm-recipes-details__label",
+        "detail_value": ".mm-recipes-details__value",
+        "ingredient": "ul.mm-recipes-structured-ingredients__list li.mm-recipes-structured-ingredients__list-item",
+        "ingredient_qty": "span[data-ingredient-quantity='true']",
+        "ingredient_unit": "span[data-ingredient-unit='true']",
+        "ingredient_name": "span[data-ingredient-name='true']",
+        "step": "div.mm-recipes-steps ol[class*='mntl-sc-block-group--OL'] > li",
+        "step_text": "p",
+    },
+))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Extract recipe records from saved pages")
+    arg_parser.add_argument("pages", nargs="+", help="saved HTML pages")
+    arg_parser.add_argument("--host", default="", help="site the pages come from, e.g. allrecipes.com")
+    arg_parser.add_argument("--repeat", type=int, default=1, help="extract each page N times for timing")
+    args = arg_parser.parse_args()
+
+    adapter = adapter_for(f"https://{args.host}/")
+    for path in args.pages:
+        with open(path, "r", encoding="utf-8") as f:
+            soup = BeautifulSoup(f.read(), "html.parser")
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            record = adapter.extract(soup)
+        elapsed = (time.perf_counter() - start) / args.repeat
+        print(f"{path} [{adapter.name}, {elapsed * 1e3:.2f} ms]: {record['title']!r}, "
+              f"{len(record['ingredients'])} ingredients, {len(record['steps'])} steps", file=sys.stderr)
+        print(json.dumps(record, indent=4, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
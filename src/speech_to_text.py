@@ -2,6 +2,7 @@
 # speech to text and text to speech
 
 
+import queue
 import speech_recognition as sr
 import pyttsx3 
 from main import *
@@ -9,6 +10,9 @@ from main import *
 # Initialize the recognizer 
 r = sr.Recognizer() 
 
+# seconds to wait for speech before checking for timer alerts again
+ALERT_POLL = 1.0
+
 # Function to convert text to
 # speech
 def speak_text(command):
@@ -18,10 +22,9 @@ def speak_text(command):
     engine.say(command) 
     engine.runAndWait()
     
-def main_speech_to_text():
+def main_speech_to_text(session):
     # Loop infinitely for user to
     # speak
-    idx = 1
     combined = re.compile(
         r"\b("
             r"next|forward|advance|"
@@ -31,7 +34,18 @@ def main_speech_to_text():
         r")\b"
     )
 
+    # timers fire on another thread; pyttsx3 isn't thread-safe, so alerts are
+    # queued and spoken by this loop between listens
+    alerts = queue.Queue()
+
+    def notify(message):
+        render(message)
+        alerts.put(message)
+    session.notify = notify
+
     while(1):    
+        while not alerts.empty():
+            speak_text(alerts.get())
         
         # Exception handling to handle
         # exceptions at the runtime
@@ -46,7 +60,7 @@ def main_speech_to_text():
                 r.adjust_for_ambient_noise(source2, duration=0.2)
                 
                 #listens for the user's input 
-                audio2 = r.listen(source2)
+                audio2 = r.listen(source2, timeout=ALERT_POLL)
                 
                 # Using google to recognize audio
                 query = r.recognize_google(audio2)
@@ -57,44 +71,24 @@ def main_speech_to_text():
                     break
 
                 # print(query)
-                if combined.search(query):
-                    handled, idx, output = handle_step_query(query, recipe_data, idx, True)
+                if combined.search(query) and not (STEP_SEARCH_PAT.search(query) or TIMER_PAT.search(query)):
+                    step, start = session.idx, time.perf_counter()
+                    handled, output = handle_step_query(query, session, True)
                     if handled:
-                        print(output)
+                        event_log.record_query(session, query, "navigation", output,
+                                               time.perf_counter() - start, step)
+                        render(output)
                         speak_text(output)
                         continue
                 else:
-                    if not handled:
-                        if (contains_vague_term(query)):
-                            handled, output = handle_vague_query(query, idx, True)
-                            # print("vague: " + output + ":")
-
-                    if not handled:
-                        handled, output = handle_temp_query(query, True)
-                        # print(output)
-                    
-                    if not handled:
-                        handled, output = handle_substitution_query(query, idx, True)
-                        # print("sub: " + output + ":")
-
-                    if not handled:
-                        handled, idx, output = handle_step_query(query, recipe_data, idx, True)
-                        # print("step: " + output + ":")
-
-                    if not handled:
-                        handled, output = handle_info_query(query, True, idx)
-                        # print("info: " + output + ":")
-                    
-                    if not handled:
-                        output = "Sorry, I didn't understand that. Please try again."
-                        handled = True
-                        # slow_print("Sorry, I didn't understand that. Please try again.")
-
-                    if handled:
-                        print(output)
-                        speak_text(output)
-                        continue
+                    output = answer_query(query, session, True)
+                    render(output)
+                    speak_text(output)
+                    continue
                         
+        except sr.WaitTimeoutError:
+            continue  # nobody spoke; go speak any alerts that came in
+
         except sr.RequestError as e:
             print("Could not request results {0}".format(e))
             
@@ -102,22 +96,22 @@ def main_speech_to_text():
             print("Didn't recognize that, please repeat")
 
 if __name__ == "__main__":
-    startup_base()
-    slow_print("Would you like to interact with this recipe?")
+    session = startup_base()
+    render("Would you like to interact with this recipe?")
     yes_or_no = input(" y/n : ")
     yes_or_no = yes_or_no.strip()
     if yes_or_no.lower() in ['y', 'yes', 'sure', 'yeah']:
-        slow_print("Would you like to use speech to text (microphone required)?")
+        render("Would you like to use speech to text (microphone required)?")
         yes_or_no = input(" y/n : ")
         yes_or_no = yes_or_no.strip()
         if yes_or_no.lower() in ['y', 'yes', 'sure', 'yeah']:
-            main_speech_to_text()
+            main_speech_to_text(session)
         elif yes_or_no.lower() in ['n', 'no', 'nah', 'nope']:
-            query_handler()
+            query_handler(session)
         else:
             print("Invalid input. Please enter 'y' or 'n'.")
     elif yes_or_no.lower() in ['n', 'no', 'nah', 'nope']:
-        slow_print("Alright! Enjoy your cooking!")
+        render("Alright! Enjoy your cooking!")
     else:
         print("Invalid input. Please enter 'y' or 'n'.")
 
@@ -0,0 +1,236 @@
+"""
+Step dependency graph and parallel schedule for a parsed recipe.
+
+A step depends on
+  - the last earlier step that used one of its ingredients or tools,
+  - the preheat step, if it bakes/roasts in the oven,
+  - the step right before it, when it carries on with the same dish
+    ("add", "drain", "cover", ...) or introduces no new ingredients,
+unless it starts with "meanwhile"/"while", which only keeps the first rule.
+
+Each step's duration is its own extracted time (the parsed "time" field is
+carried over from earlier steps, so it is re-extracted from the description),
+or a default. Hands-off steps (preheating, baking, boiling, resting, ...)
+don't occupy a cook. The schedule is a critical-path list schedule: whenever
+a cook is free, the ready step with the longest remaining path goes first.
+"""
+import re
+import sys
+import heapq
+import argparse
+import recipe_store
+from parser_1 import extract_time, parse_duration_seconds
+from context_tracker import build_ingredient_lookup
+
+DEFAULT_STEP_SECONDS = 5 * 60
+DEFAULT_PASSIVE_SECONDS = {"preheat": 10 * 60, "boil": 10 * 60}
+
+PASSIVE_VERBS = {"preheat", "bake", "roast", "boil", "simmer", "stand", "rest", "chill", "refrigerate",
+                 "cool", "marinate", "rise", "soak", "freeze", "allow", "let"}
+OVEN_VERBS = {"bake", "roast", "broil"}
+CONTINUE_WORDS = {"add", "stir", "drain", "pour", "return", "transfer", "cover", "remove", "repeat",
+                  "reduce", "continue", "turn", "let", "allow", "serve", "top", "flip", "uncover", "then"}
+PARALLEL_WORDS = {"meanwhile", "while"}
+# Used all over a recipe; sharing them doesn't make two steps dependent
+STAPLES = {"salt", "pepper", "black pepper", "ground black pepper", "salt and pepper", "water",
+           "oil", "olive oil", "vegetable oil", "cooking spray"}
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def step_ingredients(step, lookup) -> set:
+    """Ingredients a step touches: parsed ones plus recipe ingredients named in its text."""
+    names = {name.lower() for action in step.get("actions", []) for name in action.get("ingredients", [])}
+    names.update(item["name"].lower() for item in step.get("ingredients", []))
+    names.update(lookup[w] for w in _WORD.findall(step["description"].lower()) if w in lookup)
+    return names
+
+
+def step_verbs(step) -> list:
+    verbs = [a["verb"] for a in step.get("actions", []) if a.get("verb")]
+    words = _WORD.findall(step["description"].lower())
+    return verbs or words[:1]
+
+
+class StepGraph:
+    def __init__(self, steps, recipe=None):
+        lookup = build_ingredient_lookup(recipe) if recipe else {}
+        self.steps = {s["step_number"]: s for s in steps}
+        self.order = [s["step_number"] for s in steps]
+        self.deps = {n: set() for n in self.order}
+        self.duration = {}
+        self.passive = {}
+
+        last_use = {}       # ingredient / tool -> last step number using it
+        preheat = None
+        prev = None
+        seen_ingredients = set()  # including staples
+        for n in self.order:
+            step = self.steps[n]
+            desc = step["description"].lower()
+            words = _WORD.findall(desc)
+            verbs = step_verbs(step)
+            first_verb = verbs[0] if verbs else ""
+            last_verb = verbs[-1] if verbs else ""
+            all_ingredients = step_ingredients(step, lookup)
+            ingredients = all_ingredients - STAPLES
+            tools = {a["tool"] for a in step.get("actions", []) if a.get("tool")}
+
+            for key in ingredients | {("tool", t) for t in tools}:
+                if key in last_use:
+                    self.deps[n].add(last_use[key])
+            if preheat and (set(verbs) & OVEN_VERBS or "preheated" in words):
+                self.deps[n].add(preheat)
+            if prev is not None and not (words and words[0] in PARALLEL_WORDS):
+                continues = (words and words[0] in CONTINUE_WORDS) or first_verb in CONTINUE_WORDS
+                if continues or prev in self.deps[n] or not all_ingredients - seen_ingredients:
+                    self.deps[n].add(prev)
+
+            own_time = extract_time(step["description"]).get("duration", "")
+            self.passive[n] = last_verb in PASSIVE_VERBS or (words and words[0] in PASSIVE_VERBS)
+            self.duration[n] = (parse_duration_seconds(own_time)
+                                or DEFAULT_PASSIVE_SECONDS.get(first_verb, DEFAULT_STEP_SECONDS))
+
+            for key in ingredients | {("tool", t) for t in tools}:
+                last_use[key] = n
+            if "preheat" in verbs:
+                preheat = n
+            seen_ingredients |= all_ingredients
+            prev = n
+
+        self.succs = {n: set() for n in self.order}
+        for n, deps in self.deps.items():
+            for d in deps:
+                self.succs[d].add(n)
+
+        # Longest path from each step to the end (its "rank"); deps always come earlier
+        self.rank = {}
+        for n in reversed(self.order):
+            self.rank[n] = self.duration[n] + max((self.rank[s] for s in self.succs[n]), default=0)
+        self._schedules = {}
+
+    @property
+    def sequential_seconds(self) -> int:
+        return sum(self.duration.values())
+
+    def critical_path(self) -> list:
+        """Step numbers on the longest dependency chain."""
+        if not self.order:
+            return []
+        n = max(self.order, key=lambda s: (self.rank[s], -s))
+        path = [n]
+        while self.succs[n]:
+            n = max(self.succs[n], key=lambda s: (self.rank[s], -s))
+            path.append(n)
+        return path
+
+    def schedule(self, cooks=1) -> list:
+        """
+        List-schedule the steps for `cooks` people (or burners). Returns
+        [{"step_number", "start", "end", "cook"}] sorted by start time;
+        hands-off steps have cook None.
+        """
+        cooks = max(1, cooks)
+        if cooks in self._schedules:
+            return self._schedules[cooks]
+
+        waiting = {n: len(self.deps[n]) for n in self.order}
+        ready = [(-self.rank[n], n) for n in self.order if not waiting[n]]
+        heapq.heapify(ready)
+        running = []                       # (end, step number, cook)
+        free_cooks = list(range(cooks))
+        now = 0
+        result = []
+
+        while ready or running:
+            blocked = []
+            while ready:
+                item = heapq.heappop(ready)
+                n = item[1]
+                if self.passive[n]:
+                    cook = None
+                elif free_cooks:
+                    cook = free_cooks.pop(0)
+                else:
+                    blocked.append(item)
+                    continue
+                end = now + self.duration[n]
+                heapq.heappush(running, (end, n, cook))
+                result.append({"step_number": n, "start": now, "end": end, "cook": cook})
+            for item in blocked:
+                heapq.heappush(ready, item)
+
+            now, n, cook = heapq.heappop(running)
+            finished = [(n, cook)]
+            while running and running[0][0] == now:
+                _, n, cook = heapq.heappop(running)
+                finished.append((n, cook))
+            for n, cook in finished:
+                if cook is not None:
+                    free_cooks.append(cook)
+                    free_cooks.sort()
+                for s in self.succs[n]:
+                    waiting[s] -= 1
+                    if not waiting[s]:
+                        heapq.heappush(ready, (-self.rank[s], s))
+
+        result.sort(key=lambda r: (r["start"], r["step_number"]))
+        self._schedules[cooks] = result
+        return result
+
+    def makespan(self, cooks=1) -> int:
+        return max((r["end"] for r in self.schedule(cooks)), default=0)
+
+
+def get_step_graph(entry) -> StepGraph:
+    """Per-recipe step graph, built once and cached on the store entry."""
+    graph = entry.derived.get("step_graph")
+    if graph is None:
+        graph = StepGraph(entry.steps, entry.recipe)
+        entry.derived["step_graph"] = graph
+    return graph
+
+
+def _clock(seconds) -> str:
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}"
+
+
+def describe_schedule(graph: StepGraph, cooks=1) -> str:
+    """Read-out of the optimized step order."""
+    who = "1 cook" if cooks == 1 else f"{cooks} cooks"
+    lines = [f"With {who} this takes about {round(graph.makespan(cooks) / 60)} minutes "
+             f"instead of {round(graph.sequential_seconds / 60)} doing one step at a time:"]
+    for r in graph.schedule(cooks):
+        step = graph.steps[r["step_number"]]
+        minutes = round((r["end"] - r["start"]) / 60)
+        how = "hands-off" if r["cook"] is None else ("" if cooks == 1 else f"cook {r['cook'] + 1}")
+        detail = f"{minutes} min" + (f", {how}" if how else "")
+        lines.append(f"  {_clock(r['start'])}  Step {step['step_number']}: {step['description']} ({detail})")
+    return "\n".join(lines)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Print a recipe's step graph, critical path and schedule")
+    arg_parser.add_argument("recipe_id", nargs="?", default=recipe_store.LEGACY_ID)
+    arg_parser.add_argument("--cooks", type=int, default=1, help="number of cooks / burners")
+    args = arg_parser.parse_args()
+
+    try:
+        entry = recipe_store.get_store().get(args.recipe_id)
+    except KeyError:
+        sys.exit(f"unknown recipe id {args.recipe_id}")
+    graph = get_step_graph(entry)
+
+    for n in graph.order:
+        deps = ", ".join(str(d) for d in sorted(graph.deps[n])) or "-"
+        kind = "hands-off" if graph.passive[n] else "attended"
+        print(f"step {n:2d}  {graph.duration[n] // 60:3d} min  {kind:9s}  after: {deps}")
+    path = graph.critical_path()
+    if path:
+        print("critical path: " + " -> ".join(str(n) for n in path) + f" ({round(graph.rank[path[0]] / 60)} min)")
+    print()
+    print(describe_schedule(graph, args.cooks))
+
+
+if __name__ == "__main__":
+    main()
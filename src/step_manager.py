@@ -1,19 +1,20 @@
-import json
+import recipe_store
+import step_records
 
 
 steps = []
 curr_step = 1
 
-def get_steps():
+def get_steps(recipe_id=recipe_store.LEGACY_ID):
     """
-    Load all parsed recipe steps from 'parsed_recipes.json'.
+    Load all parsed recipe steps of a stored recipe (default: the legacy
+    parsed_recipes.json).
 
     Returns:
         list: List of parsed step dictionaries for the recipe.
     """
     global steps
-    with open("src/parsed_recipes.json", "r") as f:
-        steps = json.load(f)
+    steps = step_records.steps_to_json(recipe_store.get_store().get(recipe_id).steps)
     return steps
 
 def get_current_step(steps, curr_step):
@@ -53,19 +54,24 @@ def set_prev_step():
     global curr_step
     curr_step -= 1
 
-def get_temperature():
+def get_temperature(step_list=None, step_number=None):
     """
     Get all temperature settings for the current step.
 
+    Args:
+        step_list (list): Parsed steps (defaults to the steps from get_steps()).
+        step_number (int): Step number (defaults to the global curr_step).
+
     Returns:
         str: Formatted temperatures, or message if not present.
     """
-    temperatures = []
-    i = 0
-    while steps[i]["step_number"] == curr_step:
-        temperatures.append(steps[i]["temperature"])
-        i += 1
-        
+    if step_list is None:
+        step_list = steps
+    if step_number is None:
+        step_number = curr_step
+    temperatures = [step["temperature"] for step in step_list
+                    if step["step_number"] == step_number and step["temperature"]]
+
     if len(temperatures) == 0:
         return "no temperatures to give"
     
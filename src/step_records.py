@@ -0,0 +1,246 @@
+"""
+Compact in-memory form of parsed steps.
+
+parsed_recipes.json steps are dicts of dicts and lists: every action repeats
+the step's ingredient list, every step copies full {qty, unit, name} dicts
+from recipe.json, and time/temperature dicts are carried from step to step.
+Here the same data is held in slotted, frozen records:
+
+  - short strings (names, verbs, units, quantities, tools) are interned,
+  - equal Ingredient, Action and time/temperature map records are built once
+    and shared, across steps and across recipes,
+  - descriptions and notes are kept as they are (they're unique anyway).
+
+The interner only holds weak references, so a shared record is freed as
+soon as the last recipe using it is evicted from the store.
+
+Records are read-only and answer step["key"] / step.get("key") like the
+dicts they replace, so handlers work on either form. to_dict() gives back
+exactly the JSON the parser wrote.
+"""
+import sys
+import json
+import time
+import weakref
+import tracemalloc
+from dataclasses import dataclass
+from typing import Optional, Tuple, Mapping
+
+
+
+class _ReadOnlyMapping:
+    """dict-style read access to record fields."""
+    __slots__ = ()
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+
+class _FrozenMap(dict):
+    """Read-only dict (unlike MappingProxyType it can be weakly referenced)."""
+    __slots__ = ("__weakref__",)
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("parsed step maps are read-only")
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+    __ior__ = _read_only
+
+
+_EMPTY_MAP = _FrozenMap()
+
+
+@dataclass(frozen=True)
+class Ingredient(_ReadOnlyMapping):
+    # slots spelled out: weakref_slot=True needs Python 3.11, the env pins 3.10
+    __slots__ = ("qty", "unit", "name", "__weakref__")
+    qty: str
+    unit: str
+    name: str
+
+    def to_dict(self):
+        return {"qty": self.qty, "unit": self.unit, "name": self.name}
+
+    def __reduce__(self):
+        return Ingredient, (self.qty, self.unit, self.name)
+
+
+@dataclass(frozen=True)
+class Action(_ReadOnlyMapping):
+    __slots__ = ("verb", "ingredients", "tool", "__weakref__")
+    verb: Optional[str]
+    ingredients: Tuple[str, ...]
+    tool: Optional[str]
+
+    def to_dict(self):
+        return {"verb": self.verb, "ingredients": list(self.ingredients), "tool": self.tool}
+
+    def __reduce__(self):
+        return Action, (self.verb, self.ingredients, self.tool)
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedStep(_ReadOnlyMapping):
+    step_number: int
+    description: str
+    actions: Tuple[Action, ...]
+    time: Mapping[str, str]
+    temperature: Mapping[str, str]
+    actionable: bool
+    notes: Tuple[str, ...]
+    ingredients: Tuple[Ingredient, ...]
+    substep_number: Optional[str] = None
+
+    def to_dict(self):
+        d = {
+            "step_number": self.step_number,
+            "description": self.description,
+            "actions": [a.to_dict() for a in self.actions],
+            "time": dict(self.time),
+            "temperature": dict(self.temperature),
+            "actionable": self.actionable,
+            "notes": list(self.notes),
+            "ingredients": [i.to_dict() for i in self.ingredients],
+        }
+        if self.substep_number is not None:
+            d["substep_number"] = self.substep_number
+        return d
+
+
+class Interner:
+    """Canonical copies of strings, ingredients, actions and small maps, held weakly."""
+
+    def __init__(self):
+        self._ingredients = weakref.WeakValueDictionary()
+        self._actions = weakref.WeakValueDictionary()
+        self._maps = weakref.WeakValueDictionary()
+
+    @staticmethod
+    def string(s):
+        return sys.intern(s) if isinstance(s, str) else s
+
+    def names(self, names) -> Tuple[str, ...]:
+        return tuple(self.string(n) for n in names)
+
+    def ingredient(self, d) -> Ingredient:
+        key = (d.get("qty", ""), d.get("unit", ""), d["name"])
+        ing = self._ingredients.get(key)
+        if ing is None:
+            ing = self._ingredients.setdefault(key, Ingredient(*(self.string(v) for v in key)))
+        return ing
+
+    def action(self, d) -> Action:
+        key = (d.get("verb"), self.names(d.get("ingredients", ())), d.get("tool"))
+        act = self._actions.get(key)
+        if act is None:
+            act = self._actions.setdefault(key, Action(self.string(key[0]), key[1], self.string(key[2])))
+        return act
+
+    def mapping(self, d) -> Mapping[str, str]:
+        if not d:
+            return _EMPTY_MAP
+        key = tuple((self.string(k), self.string(v)) for k, v in d.items())
+        m = self._maps.get(key)
+        if m is None:
+            m = self._maps.setdefault(key, _FrozenMap(key))
+        return m
+
+    def __len__(self):
+        """Shared records still in use."""
+        return len(self._ingredients) + len(self._actions) + len(self._maps)
+
+
+_interner = Interner()
+
+
+def step_from_dict(d, interner=None) -> ParsedStep:
+    interner = interner or _interner
+    return ParsedStep(
+        step_number=d["step_number"],
+        description=d["description"],
+        actions=tuple(interner.action(a) for a in d.get("actions", ())),
+        time=interner.mapping(d.get("time")),
+        temperature=interner.mapping(d.get("temperature")),
+        actionable=d.get("actionable", True),
+        notes=tuple(d.get("notes", ())),
+        ingredients=tuple(interner.ingredient(i) for i in d.get("ingredients", ())),
+        substep_number=interner.string(d.get("substep_number")),
+    )
+
+
+def steps_from_json(steps, interner=None) -> list:
+    """Parsed-step dicts (as in parsed_recipes.json) -> ParsedStep records."""
+    return [step_from_dict(d, interner) for d in steps]
+
+
+def steps_to_json(steps) -> list:
+    """ParsedStep records (or dicts, passed through) -> JSON-ready dicts."""
+    return [s.to_dict() if isinstance(s, ParsedStep) else s for s in steps]
+
+
+def _corpus(n, sources):
+    """
+    n distinct recipes as JSON text, cycling through the parsed source files.
+    Every copy gets its own descriptions, quantities, times and one ingredient
+    of its own in each action, so records are only shared where real recipes
+    would share them (ingredient names, verbs, units, tools).
+    """
+    texts = []
+    for i in range(n):
+        steps = sources[i % len(sources)]
+        copy = []
+        for s in steps:
+            s = dict(s, description=f"{s['description']} #{i}")
+            s["ingredients"] = [dict(ing, qty=f"{ing.get('qty', '')} {i}".strip()) for ing in s.get("ingredients", [])]
+            s["actions"] = [dict(a, ingredients=a.get("ingredients", []) + [f"ingredient {i}"]) for a in s.get("actions", [])]
+            if s.get("time"):
+                s["time"] = dict(s["time"], duration=f"{i} minutes")
+            copy.append(s)
+        texts.append(json.dumps(copy))
+    return texts
+
+
+def _measure(texts, convert):
+    tracemalloc.start()
+    start = time.perf_counter()
+    held = [convert(json.loads(t)) for t in texts]
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return size, elapsed
+
+
+def main():
+    import os
+    import glob
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    paths = [os.path.join(src_dir, "parsed_recipes.json")] + sorted(glob.glob(os.path.join(src_dir, "library", "parsed", "*.json")))
+    sources = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            sources.append(json.load(f))
+    for steps in sources:
+        assert steps_to_json(steps_from_json(steps)) == steps, "round trip changed the steps"
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    texts = _corpus(n, sources)
+    print(f"{n} recipes from {len(sources)} parsed source file(s)")
+    interner = Interner()  # fresh, so the round-trip check above doesn't pre-fill it
+    for label, convert in [("dicts", lambda steps: steps), ("records", lambda steps: steps_from_json(steps, interner))]:
+        size, elapsed = _measure(texts, convert)
+        print(f"  {label:8s} {size / 2**20:8.1f} MiB  ({size / n / 1024:.1f} KiB/recipe, loaded in {elapsed:.1f}s)")
+    print(f"  shared records left after the recipes are dropped: {len(interner)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Semantic step search: "which step has the cheese mixture", "go to where I
+bake it".
+
+Each recipe's steps are embedded once into a row-normalized NumPy matrix
+(cached on the recipe store entry); a query is embedded the same way and
+answered with a single matrix-vector product. Embeddings are either
+
+  - "vectors": mean of the spaCy model's static word vectors, when the
+    configured model ships them (e.g. en_core_web_md), or
+  - "hashed": TF-IDF weighted, hashed bag of lightly-stemmed words, which
+    needs no model at all.
+
+Both are fully offline. en_core_web_sm has no static vectors, so the
+default install uses the hashed features.
+"""
+import re
+import time
+import zlib
+import numpy as np
+import nlp_pool
+
+HASH_DIM = 1 << 12
+MIN_SCORE = 0.1
+
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "of", "to", "in", "on", "into", "with", "for", "at", "by",
+    "it", "that", "this", "them", "is", "was", "i", "do", "did", "where", "which", "what",
+    "step", "go", "back", "take", "me", "jump", "skip", "has", "have", "uses", "use", "used",
+    "until", "about", "over", "then", "my", "we", "you", "am", "were",
+}
+_WORD = re.compile(r"[a-z]+")
+_SUFFIXES = ("ture", "ing", "ed", "es", "s")
+
+
+def stem(word: str) -> str:
+    """Crude suffix stripping so mixture/mixing/mixed all meet at "mix"."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text: str):
+    return [stem(w) for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+
+
+def step_text(step) -> str:
+    """Everything that identifies a step: its text, verbs, ingredients and notes."""
+    parts = [step.get("description", "")]
+    for action in step.get("actions", []):
+        parts.append(action.get("verb") or "")
+        parts.extend(action.get("ingredients", []))
+    parts.extend(i.get("name", "") for i in step.get("ingredients", []))
+    parts.extend(step.get("notes", []))
+    return " ".join(parts)
+
+
+def _bucket(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8")) & (HASH_DIM - 1)
+
+
+class StepIndex:
+    def __init__(self, steps, backend=None):
+        texts = [step_text(step) for step in steps]
+        if backend is None:
+            backend = "vectors" if self._model_has_vectors() else "hashed"
+        self.backend = backend
+
+        if backend == "vectors":
+            self.nlp = nlp_pool.get_nlp()
+            matrix = np.vstack([self._mean_vector(t) for t in texts])
+        else:
+            counts = [self._counts(t) for t in texts]
+            df = np.zeros(HASH_DIM, dtype=np.float32)
+            for c in counts:
+                df[list(c)] += 1
+            self.idf = np.log((1 + len(texts)) / (1 + df)).astype(np.float32) + 1
+            matrix = np.vstack([self._hashed_vector(c) for c in counts]) if counts else np.zeros((0, HASH_DIM), np.float32)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = (matrix / np.where(norms == 0, 1, norms)).astype(np.float32)
+
+    @staticmethod
+    def _model_has_vectors() -> bool:
+        try:
+            return nlp_pool.get_nlp().vocab.vectors.shape[0] > 0
+        except OSError:
+            return False  # model not installed: hashed features need none
+
+    @staticmethod
+    def _counts(text) -> dict:
+        counts = {}
+        for term in terms(text):
+            b = _bucket(term)
+            counts[b] = counts.get(b, 0) + 1
+        return counts
+
+    def _hashed_vector(self, counts):
+        vec = np.zeros(HASH_DIM, dtype=np.float32)
+        if counts:
+            idx = np.fromiter(counts.keys(), dtype=np.int64)
+            vec[idx] = np.fromiter(counts.values(), dtype=np.float32) * self.idf[idx]
+        return vec
+
+    def _mean_vector(self, text):
+        vectors = [self.nlp.vocab[w].vector for w in _WORD.findall(text.lower())
+                   if w not in STOPWORDS and self.nlp.vocab.has_vector(w)]
+        if not vectors:
+            return np.zeros(self.nlp.vocab.vectors_length, dtype=np.float32)
+        return np.mean(vectors, axis=0)
+
+    def embed(self, query: str):
+        vec = self._mean_vector(query) if self.backend == "vectors" else self._hashed_vector(self._counts(query))
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def search(self, query: str, top=1):
+        """Return [(step index (0-based), score)] best first; empty when nothing matches."""
+        if not len(self.matrix):
+            return []
+        scores = self.matrix @ self.embed(query)
+        order = np.argsort(-scores)[:top]
+        return [(int(i), float(scores[i])) for i in order if scores[i] >= MIN_SCORE]
+
+
+def get_step_index(entry) -> StepIndex:
+    """Per-recipe step index, built once and cached on the store entry."""
+    index = entry.derived.get("step_search")
+    if index is None:
+        index = StepIndex(entry.steps)
+        entry.derived["step_search"] = index
+    return index
+
+
+def main():
+    import recipe_store
+    entry = recipe_store.get_store().get(recipe_store.LEGACY_ID)
+    start = time.perf_counter()
+    index = get_step_index(entry)
+    print(f"{index.backend} index of {len(entry.steps)} steps built in {(time.perf_counter() - start) * 1000:.2f} ms")
+
+    queries = ["which step has the cheese mixture", "go to where I bake it", "where do I boil the noodles",
+               "which step uses mozzarella"]
+    for q in queries:
+        hits = index.search(q)
+        print(f"  {q!r} -> " + (f"step {hits[0][0] + 1} ({hits[0][1]:.2f})" if hits else "no match"))
+
+    n = 2000
+    start = time.perf_counter()
+    for i in range(n):
+        index.search(queries[i % len(queries)])
+    print(f"{(time.perf_counter() - start) / n * 1e6:.1f} us per query")
+
+
+if __name__ == "__main__":
+    main()
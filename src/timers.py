@@ -0,0 +1,178 @@
+"""
+Kitchen timers. One asyncio event loop on a background thread serves every
+session: timers sit in a single heap ordered by deadline and one coroutine
+sleeps until the earliest one, so a thousand timers cost no more threads
+than one. Handlers call the thread-safe TimerManager methods; when a timer
+fires its session's notify callback runs in the loop's executor so a slow
+callback never delays other timers (speech mode only queues the alert; its
+main loop does the speaking, since pyttsx3 must stay on one thread).
+Fired and cancelled timers are dropped from the per-session lists, and
+end_session() forgets a session altogether.
+"""
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+
+
+class Timer:
+    __slots__ = ("timer_id", "session_id", "label", "seconds", "deadline", "notify", "cancelled", "done")
+
+    def __init__(self, timer_id, session_id, label, seconds, notify):
+        self.timer_id = timer_id
+        self.session_id = session_id
+        self.label = label
+        self.seconds = seconds
+        self.deadline = time.monotonic() + seconds
+        self.notify = notify
+        self.cancelled = False
+        self.done = False
+
+    @property
+    def active(self):
+        return not (self.cancelled or self.done)
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic()) if self.active else 0.0
+
+
+def format_seconds(seconds) -> str:
+    seconds = int(round(seconds))
+    minutes, secs = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    parts = []
+    if hours:
+        parts.append(f"{hours} hour" + ("s" if hours != 1 else ""))
+    if minutes:
+        parts.append(f"{minutes} minute" + ("s" if minutes != 1 else ""))
+    if secs or not parts:
+        parts.append(f"{secs} second" + ("s" if secs != 1 else ""))
+    return " ".join(parts)
+
+
+class TimerManager:
+    def __init__(self):
+        self._heap = []              # (deadline, timer id, Timer); cancelled timers are skipped lazily
+        self._timers = {}            # session id -> [active Timer]
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._wakeup = None
+        self._ready = threading.Event()
+        threading.Thread(target=self._run_loop, name="timers", daemon=True).start()
+        self._ready.wait()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._wakeup = asyncio.Event()
+        self._loop.create_task(self._scheduler())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _scheduler(self):
+        while True:
+            with self._lock:
+                while self._heap and not self._heap[0][2].active:
+                    heapq.heappop(self._heap)
+                delay = self._heap[0][0] - time.monotonic() if self._heap else None
+            if delay is not None and delay <= 0:
+                self._fire_due()
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _fire_due(self):
+        now = time.monotonic()
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                timer = heapq.heappop(self._heap)[2]
+                if timer.active:
+                    timer.done = True
+                    self._forget(timer)
+                    due.append(timer)
+        for timer in due:
+            if timer.notify:
+                message = f"Timer done: {timer.label} ({format_seconds(timer.seconds)})."
+                self._loop.run_in_executor(None, timer.notify, message)
+
+    def start(self, session_id, seconds, label="timer", notify=None) -> Timer:
+        """Start a timer; `notify(message)` is called when it goes off."""
+        with self._lock:
+            timer = Timer(next(self._ids), session_id, label, seconds, notify)
+            heapq.heappush(self._heap, (timer.deadline, timer.timer_id, timer))
+            self._timers.setdefault(session_id, []).append(timer)
+            earliest = self._heap[0][2] is timer
+        if earliest:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return timer
+
+    def _forget(self, timer):
+        # caller holds the lock; an empty session entry is removed so finished sessions don't pile up
+        timers = self._timers.get(timer.session_id)
+        if timers and timer in timers:
+            timers.remove(timer)
+            if not timers:
+                del self._timers[timer.session_id]
+
+    def cancel(self, timer):
+        # the scheduler drops cancelled timers when they reach the top of the heap
+        with self._lock:
+            timer.cancelled = True
+            self._forget(timer)
+
+    def active(self, session_id) -> list:
+        """The session's running timers, soonest first."""
+        with self._lock:
+            timers = [t for t in self._timers.get(session_id, []) if t.active]
+        return sorted(timers, key=lambda t: t.deadline)
+
+    def cancel_all(self, session_id) -> int:
+        with self._lock:
+            timers = self._timers.pop(session_id, [])
+            for timer in timers:
+                timer.cancelled = True
+        return len(timers)
+
+    def __len__(self):
+        """Sessions with running timers."""
+        return len(self._timers)
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_timer_manager() -> TimerManager:
+    """Process-wide timer manager; its loop thread starts on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = TimerManager()
+    return _manager
+
+
+def end_session(session_id):
+    """Cancel a finished session's timers (no-op if no timer was ever started in this process)."""
+    if _manager is not None:
+        _manager.cancel_all(session_id)
+
+
+def main():
+    manager = get_timer_manager()
+    fired = []
+    n = 10000
+    start = time.perf_counter()
+    for i in range(n):
+        manager.start(f"s{i % 100}", 0.5 + (i % 50) / 100, notify=fired.append)
+    print(f"started {n} timers in {(time.perf_counter() - start) * 1000:.1f} ms on {threading.active_count()} threads")
+    time.sleep(1.5)
+    print(f"{len(fired)} fired, {len(manager)} sessions still tracked")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Crawl the fixture mirror in src/fixtures/crawl_mirror end to end:
+discovery through the sitemap and category page, robots.txt, per-host
+rate limiting, and the recipes that end up in the store.
+
+Run from the repository root with `python -m pytest tests`.
+"""
+import os
+import sys
+import time
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+sys.path.insert(0, SRC_DIR)
+
+pytest.importorskip("en_core_web_sm")  # the parser needs the spaCy model
+
+import ingredient_catalog
+import recipe_crawler
+import recipe_store
+
+MIRROR = os.path.join(SRC_DIR, "fixtures", "crawl_mirror")
+DELAY = 0.05
+
+
+@pytest.fixture
+def crawl(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingredient_catalog, "_catalog",
+                        ingredient_catalog.IngredientCatalog(str(tmp_path / "catalog" / "ingredients.json")))
+    server, base = recipe_crawler.serve_mirror(MIRROR)
+    store = recipe_store.RecipeStore(library_dir=str(tmp_path / "library"))
+    crawler = recipe_crawler.Crawler([base + "sitemap.xml"], store=store, delay=DELAY, scrapers=2)
+
+    fetched = []
+    get = crawler.http.get
+
+    def recording_get(url, *args, **kwargs):
+        fetched.append((time.monotonic(), url))
+        return get(url, *args, **kwargs)
+
+    crawler.http.get = recording_get
+    yield crawler, store, base, fetched
+    server.shutdown()
+
+
+def test_crawl_fixture_mirror(crawl):
+    crawler, store, base, fetched = crawl
+    stats = crawler.run()
+
+    paths = [url[len(base) - 1:] for _, url in fetched]
+    assert paths[0] == "/robots.txt"
+    assert paths.count("/robots.txt") == 1
+    assert "/sitemap.xml" in paths and "/recipes/10" in paths
+    # both recipe pages once each, through the print view; the disallowed one never
+    assert sorted(p for p in paths if p.startswith("/recipe/")) == ["/recipe/1?print=", "/recipe/2?print="]
+
+    times = [t for t, _ in fetched]
+    assert all(b - a >= DELAY * 0.9 for a, b in zip(times, times[1:]))
+
+    assert stats["pages"] == 2
+    assert stats["discovered"] == 3
+    assert stats["blocked"] == 1
+    assert stats["duplicates"] == 0
+    assert stats["stored"] == 2 and stats["failed"] == 0
+
+    ids = sorted(recipe_store.recipe_id_for_url(base + f"recipe/{n}") for n in (1, 2))
+    assert sorted(store.record_ids()) == ids
+    titles = sorted(store.get_record(recipe_id)["title"] for recipe_id in ids)
+    assert titles == ["Recipe 1", "Recipe 2"]
+    assert all(store.get(recipe_id).steps for recipe_id in ids)
+
+
+def test_recrawl_skips_stored_recipes(crawl):
+    crawler, store, base, fetched = crawl
+    crawler.run()
+    again = recipe_crawler.Crawler([base + "sitemap.xml"], store=store, delay=0)
+    stats = again.run()
+    assert stats["skipped"] == 2
+    assert stats["scraped"] == 0 and stats["stored"] == 0